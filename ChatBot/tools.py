@@ -1,4 +1,5 @@
 # tools.py
+import json
 import sys
 from pathlib import Path
 
@@ -7,21 +8,17 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from agno.tools import tool
 from typing import Optional
-from Dados.analises import AnaliseDados
+from Dados.analises import AnaliseDados, formatar_moeda
+from Dados.snapshot import obter_snapshot
 import pandas as pd
 
 
 # -------------------------------------------
-# Instância global das análises (reutiliza conexão)
+# Snapshot compartilhado das análises (reutiliza conexão)
 # -------------------------------------------
-_analise_instance = None
-
-def get_analise():
-    """Singleton para reutilizar conexão com MongoDB"""
-    global _analise_instance
-    if _analise_instance is None:
-        _analise_instance = AnaliseDados()
-    return _analise_instance
+def get_analise() -> AnaliseDados:
+    """Snapshot atual das análises; cada tool usa a mesma referência do início ao fim"""
+    return obter_snapshot()
 
 
 # -------------------------------------------
@@ -33,7 +30,13 @@ def analisar_clientes(tipo: str, top_n: int = 10) -> str:
     Realiza análises sobre clientes da ConectaBeauty.
     
     Args:
-        tipo: Tipo de análise - 'sexo', 'regiao', 'canal_venda', 'valiosos'
+        tipo: Tipo de análise - 'sexo', 'regiao', 'estados', 'cidades', 'canal_venda', 'valiosos', 'clv', 'abc', 'rfm', 'retencao'
+            ('regiao' conta clientes por cidade; 'estados' e 'cidades' trazem clientes, pedidos e faturamento por UF/cidade)
+            ('abc' classifica os clientes na curva ABC: A = 80% do faturamento, B = até 95%, C = restante)
+            ('clv' ordena os clientes pelo valor do cliente: histórico + valor esperado nos próximos 12 meses)
+            ('rfm' resume os segmentos de recência, frequência e valor: Campeões, Em Risco, etc.)
+            ('retencao' mostra o % de clientes de cada coorte que voltou a comprar nos meses seguintes;
+             top_n limita a quantidade de meses exibidos)
         top_n: Número de resultados (para análises com ranking)
     
     Returns:
@@ -49,6 +52,10 @@ def analisar_clientes(tipo: str, top_n: int = 10) -> str:
         df = analise.analise_clientes_por_regiao().head(top_n)
         return df.to_string(index=False)
     
+    elif tipo in ('estados', 'cidades'):
+        df = analise.analise_vendas_por_regiao('estado' if tipo == 'estados' else 'cidade', top_n=top_n)
+        return df.to_string(index=False)
+    
     elif tipo == 'canal_venda':
         df = analise.analise_compras_por_canal_cliente().head(top_n)
         return df.to_string(index=False)
@@ -57,21 +64,43 @@ def analisar_clientes(tipo: str, top_n: int = 10) -> str:
         df = analise.analise_clientes_mais_valiosos(top_n)
         return df.to_string(index=False)
     
+    elif tipo == 'clv':
+        df = analise.analise_clientes_mais_valiosos(top_n, ordenar_por='clv')
+        return df.to_string(index=False)
+    
+    elif tipo == 'abc':
+        resumo = analise.analise_resumo_abc('clientes')
+        df = analise.analise_curva_abc('clientes').head(top_n)
+        return resumo.to_string(index=False) + "\n\n" + df.to_string(index=False)
+    
+    elif tipo == 'rfm':
+        df = analise.analise_segmentos_rfm()
+        return df.to_string(index=False)
+    
+    elif tipo == 'retencao':
+        df = analise.analise_coortes_retencao()
+        df = df[['clientes'] + [c for c in df.columns if c != 'clientes'][:top_n + 1]]
+        return df.to_string(na_rep='-')
+    
     else:
-        return f"Tipo '{tipo}' não reconhecido. Use: sexo, regiao, canal_venda, valiosos"
+        return f"Tipo '{tipo}' não reconhecido. Use: sexo, regiao, estados, cidades, canal_venda, valiosos, clv, abc, rfm, retencao"
 
 
 # -------------------------------------------
 # 2. ANÁLISES DE PRODUTOS
 # -------------------------------------------
 @tool
-def analisar_produtos(tipo: str, top_n: int = 10) -> str:
+def analisar_produtos(tipo: str, top_n: int = 10, grupo: Optional[str] = None) -> str:
     """
     Realiza análises sobre produtos da ConectaBeauty.
     
     Args:
-        tipo: Tipo de análise - 'top_vendidos', 'segmento', 'cores', 'cosmeticos', 'cadeiras', 'rentabilidade'
+        tipo: Tipo de análise - 'top_vendidos', 'segmento', 'cores', 'cosmeticos', 'cadeiras', 'rentabilidade', 'abc',
+            'grupos', 'grupo'
+            ('abc' classifica os produtos na curva ABC: A = 80% do faturamento, B = até 95%, C = restante)
+            ('grupos' lista os grupos de categoria; 'grupo' traz os mais vendidos do grupo informado em 'grupo')
         top_n: Quantidade de resultados
+        grupo: Chave do grupo de categoria (tipo='grupo'), ex.: 'cosmeticos', 'cadeiras_lavatorios'
     
     Returns:
         String com dados formatados
@@ -99,7 +128,25 @@ def analisar_produtos(tipo: str, top_n: int = 10) -> str:
         return df.to_string(index=False)
     
     elif tipo == 'rentabilidade':
-        df = analise.analise_rentabilidade_produtos().head(top_n)
+        df = analise.analise_rentabilidade_produtos(top_n)
+        return df.to_string(index=False)
+    
+    elif tipo == 'abc':
+        resumo = analise.analise_resumo_abc('produtos')
+        df = analise.analise_curva_abc('produtos').head(top_n)
+        return resumo.to_string(index=False) + "\n\n" + df.to_string(index=False)
+    
+    elif tipo == 'grupos':
+        df = analise.analise_grupos_categoria()
+        return df.to_string(index=False)
+    
+    elif tipo == 'grupo':
+        if not grupo:
+            return "Informe o grupo (use tipo='grupos' para ver os disponíveis)"
+        try:
+            df = analise.analise_top_produtos_grupo(grupo, top_n)
+        except ValueError as e:
+            return str(e)
         return df.to_string(index=False)
     
     else:
@@ -110,7 +157,9 @@ def analisar_produtos(tipo: str, top_n: int = 10) -> str:
 # 3. ANÁLISES DE VENDAS
 # -------------------------------------------
 @tool
-def analisar_vendas(tipo: str, ano: Optional[int] = None, mes: Optional[int] = None) -> str:
+def analisar_vendas(tipo: str, ano: Optional[int] = None, mes: Optional[int] = None,
+                    data_inicio: Optional[str] = None, data_fim: Optional[str] = None,
+                    granularidade: str = 'mes', dimensao: Optional[str] = None, horizonte: int = 6) -> str:
     """
     Realiza análises sobre vendas da ConectaBeauty.
     
@@ -123,9 +172,24 @@ def analisar_vendas(tipo: str, ano: Optional[int] = None, mes: Optional[int] = N
             - 'representante': Vendas por representante
             - 'total': Totalizadores gerais (OBRIGATÓRIO passar 'ano' para filtrar)
             - 'sazonalidade': Análise de padrões sazonais
-            - 'comparar_meses': Comparar mesmo mês entre anos (requer 'mes')
+            - 'perfil_sazonal': Índice sazonal médio de cada mês entre os anos, com faixa de confiança
+            - 'comparar_meses': Comparar mesmo mês entre anos (requer 'mes'; 'ano' compara com o ano anterior)
+            - 'variacao': Variação de faturamento contra o mês anterior e contra o mesmo mês do ano anterior,
+              por 'total', 'canal', 'forma_pagamento' ou 'categoria' (use dimensao; filtre com ano/mes)
+            - 'periodo': Vendas entre data_inicio e data_fim agrupadas por granularidade
+            - 'previsao': Previsão de faturamento dos próximos meses (total, por categoria e por canal)
+            - 'anomalias': Dias com faturamento fora do esperado nos últimos 30 dias (quedas e picos) por canal e pagamento
+            - 'decomposicao': Receita bruta, descontos e receita líquida por 'produto', 'categoria', 'canal' ou 'periodo' (use dimensao)
+            - 'conciliacao': Pedidos cujo Valor Total não bate com a soma dos itens
         ano: Ano para filtro (número inteiro: 2021-2025). CRÍTICO para tipo='total' e tipo='mensal'
-        mes: Mês para filtro (número 1-12). Usado em tipo='canal' e tipo='comparar_meses'
+        mes: Mês para filtro (número 1-12). Usado em tipo='canal', tipo='comparar_meses' e tipo='variacao'
+        data_inicio: Data inicial 'AAAA-MM-DD' (tipo='periodo'; vazio = início do histórico)
+        data_fim: Data final 'AAAA-MM-DD', inclusiva (tipo='periodo'; vazio = fim do histórico)
+        granularidade: 'dia', 'semana', 'mes', 'trimestre' ou 'ano' (tipo='periodo')
+        dimensao: 'total', 'categoria' ou 'canal' (tipo='previsao'; vazio = todas);
+            'produto', 'categoria', 'canal' ou 'periodo' (tipo='decomposicao'; vazio = categoria);
+            'total', 'canal', 'forma_pagamento' ou 'categoria' (tipo='variacao'; vazio = total)
+        horizonte: Quantidade de meses a prever, de 1 a 12 (tipo='previsao')
     
     Returns:
         String com dados formatados
@@ -135,6 +199,8 @@ def analisar_vendas(tipo: str, ano: Optional[int] = None, mes: Optional[int] = N
         analisar_vendas(tipo='mensal', ano=2022) → vendas mês a mês de 2022
         analisar_vendas(tipo='ano') → vendas por ano (todos os anos)
         analisar_vendas(tipo='canal', ano=2023, mes=5) → vendas por canal em maio/2023
+        analisar_vendas(tipo='periodo', data_inicio='2024-01-01', data_fim='2024-03-31', granularidade='semana')
+        analisar_vendas(tipo='previsao', dimensao='total', horizonte=6) → previsão dos próximos 6 meses
     """
     analise = get_analise()
     
@@ -169,10 +235,67 @@ def analisar_vendas(tipo: str, ano: Optional[int] = None, mes: Optional[int] = N
         df = analise.analise_sazonalidade()
         return df.to_string(index=False)
     
+    elif tipo == 'perfil_sazonal':
+        df = analise.analise_perfil_sazonal()
+        return df.to_string(index=False)
+    
     elif tipo == 'comparar_meses':
         if not mes:
             return "Para comparar meses, forneça o parâmetro 'mes' (1-12)"
-        df = analise.comparar_meses_entre_anos(mes)
+        # Com 'ano', compara com o ano anterior; sem 'ano', usa o último ano com vendas no mês
+        dados = analise.comparar_meses_entre_anos(mes, ano2=ano)
+        return "\n".join(
+            f"{periodo}: " + ", ".join(f"{k}: {v}" for k, v in valores.items()) for periodo, valores in dados.items()
+        )
+    
+    elif tipo == 'variacao':
+        try:
+            df = analise.analise_comparacao_periodos(dimensao or 'total', ano=ano, mes=mes)
+        except ValueError as e:
+            return str(e)
+        if df.empty:
+            return "Nenhuma venda encontrada para os filtros informados."
+        return df.to_string(index=False)
+    
+    elif tipo == 'periodo':
+        try:
+            df = analise.analise_vendas_periodo(data_inicio, data_fim, granularidade)
+        except ValueError as e:
+            return str(e)
+        if df.empty:
+            return "Nenhuma venda encontrada no período informado."
+        return df.drop(columns=['periodo']).to_string(index=False)
+    
+    elif tipo == 'previsao':
+        try:
+            df = analise.analise_previsao_vendas(horizonte, dimensao)
+        except ValueError as e:
+            return str(e)
+        if df.empty:
+            return "Não há histórico de vendas suficiente para prever."
+        return df.drop(columns=['periodo']).to_string(index=False)
+    
+    elif tipo == 'decomposicao':
+        try:
+            df = analise.analise_decomposicao_receita(dimensao or 'categoria', top_n=15)
+        except ValueError as e:
+            return str(e)
+        return df.drop(columns=['periodo'], errors='ignore').to_string(index=False)
+    
+    elif tipo == 'conciliacao':
+        df = analise.analise_conciliacao_pedidos(formatar=False)
+        resposta = f"Pedidos com divergência: {(df['status'] == 'divergente').sum()}\n"
+        resposta += f"Pedidos sem itens: {(df['status'] == 'sem_itens').sum()}\n"
+        resposta += f"Diferença total: {formatar_moeda(df['diferenca'].sum())}\n\n"
+        df = df.reindex(df['diferenca'].abs().sort_values(ascending=False).index).head(15)
+        for coluna in ['valor_total', 'soma_subtotais', 'diferenca']:
+            df[coluna] = df[coluna].apply(formatar_moeda)
+        return resposta + df.to_string(index=False)
+    
+    elif tipo == 'anomalias':
+        df = analise.analise_anomalias_vendas(dias=30)
+        if df.empty:
+            return "Nenhuma anomalia no faturamento diário no período."
         return df.to_string(index=False)
     
     else:
@@ -198,7 +321,7 @@ def recomendar_campanha(categoria: Optional[str] = None, periodo: str = "trimest
     
     # Coleta dados para recomendação
     top_produtos = analise.analise_top_produtos_mais_vendidos(5)
-    sazonalidade = analise.analise_sazonalidade()
+    perfil_sazonal = analise.analise_perfil_sazonal(formatar=False)
     vendas_canal = analise.analise_vendas_por_canal()
     clientes_sexo = analise.analise_clientes_por_sexo()
     
@@ -214,6 +337,13 @@ def recomendar_campanha(categoria: Optional[str] = None, periodo: str = "trimest
     recomendacao += vendas_canal.head(3).to_string(index=False)
     recomendacao += "\n\n"
     
+    # Meses mais fortes (índice sazonal médio entre os anos)
+    recomendacao += "📅 MESES MAIS FORTES (índice sazonal médio, 100 = mês típico):\n"
+    recomendacao += perfil_sazonal.dropna(subset=['indice_medio']).nlargest(3, 'indice_medio')[
+        ['mes_nome', 'indice_medio', 'anos_observados']
+    ].round(2).to_string(index=False)
+    recomendacao += "\n\n"
+    
     # Perfil do cliente
     recomendacao += "👥 PERFIL DOS CLIENTES:\n"
     recomendacao += clientes_sexo.to_string(index=False)
@@ -233,20 +363,110 @@ def recomendar_campanha(categoria: Optional[str] = None, periodo: str = "trimest
 # 5. MIX DE PRODUTOS
 # -------------------------------------------
 @tool
-def analisar_mix_produtos(top_n: int = 10) -> str:
+def analisar_mix_produtos(top_n: int = 10, ordenar_por: str = 'pedidos_juntos') -> str:
     """
     Analisa os mixes de produtos mais comuns nos pedidos.
     Útil para criar combos e estratégias de cross-sell.
     
     Args:
         top_n: Quantidade de combinações a retornar
+        ordenar_por: 'pedidos_juntos' (pares mais frequentes) ou 'lift' (pares com maior afinidade)
     
     Returns:
         String com dados formatados
     """
     analise = get_analise()
-    df = analise.analise_mix_produtos_por_pedido().head(top_n)
-    return df.to_string(index=False)
+    try:
+        pares = analise.analise_cesta_produtos(top_n, ordenar_por=ordenar_por)
+    except ValueError as e:
+        return str(e)
+    _, stats = analise.analise_mix_produtos_por_pedido()
+    
+    resposta = "🛒 PRODUTOS COMPRADOS JUNTOS:\n"
+    resposta += pares.drop(columns=['id_produto_a', 'id_produto_b']).to_string(index=False)
+    resposta += "\n\n📦 MIX POR PEDIDO:\n"
+    resposta += "\n".join([f"{k}: {v}" for k, v in stats.items()])
+    return resposta
+
+
+@tool
+def recomendar_produtos_relacionados(nome_produto: Optional[str] = None, id_produto: Optional[int] = None,
+                                     top_n: int = 5) -> str:
+    """
+    Lista os produtos mais comprados junto com um produto ("quem comprou também levou").
+    Útil para sugerir itens complementares numa venda.
+    
+    Args:
+        nome_produto: Nome do produto (busca parcial, case-insensitive)
+        id_produto: ID exato do produto
+        top_n: Quantidade de produtos relacionados (máx. 10)
+    
+    Returns:
+        String com dados formatados
+    """
+    analise = get_analise()
+    produtos_df = analise.df_produtos
+    
+    if id_produto is not None:
+        produto = produtos_df[produtos_df['id_produto'] == id_produto]
+    elif nome_produto:
+        produto = produtos_df[produtos_df['nome_produto'].str.contains(nome_produto, case=False, na=False)]
+    else:
+        return "Erro: Forneça o nome_produto ou id_produto."
+    
+    if produto.empty:
+        busca = nome_produto if nome_produto else f"ID {id_produto}"
+        return f"Produto não encontrado: {busca}"
+    
+    p = produto.iloc[0]
+    df = analise.recomendar_produtos(p['id_produto'], top_n)
+    if df.empty:
+        return f"Não há pedidos com outros produtos junto de '{p['nome_produto']}'."
+    
+    resposta = f"🛒 COMPRADOS JUNTO COM {p['nome_produto']} (ID {p['id_produto']}):\n"
+    resposta += df.drop(columns=['id_produto']).to_string(index=False)
+    return resposta
+
+
+@tool
+def consultar_dados(metricas: str, por: str = "", filtros: str = "", top: int = 20,
+                    ordenar_por: Optional[str] = None) -> str:
+    """
+    Consulta livre sobre as vendas quando nenhuma análise pronta responde a pergunta.
+    Combina métricas, agrupamentos e filtros (ex.: receita e pedidos por canal e ano em 2023).
+    
+    Args:
+        metricas: Métricas separadas por vírgula: 'receita', 'quantidade', 'itens', 'pedidos',
+                  'clientes', 'produtos', 'ticket_medio', 'preco_medio'
+        por: Dimensões separadas por vírgula: 'ano', 'mes', 'canal_venda', 'forma_pagamento', 'id_cliente',
+             'nome_cliente', 'sexo', 'uf', 'estado', 'cidade', 'id_produto', 'nome_produto', 'categoria',
+             'grupo_categoria', 'fornecedor', 'nome_cor' (vazio = total geral)
+        filtros: JSON {dimensão: valor | [valores] | {operador: valor}}; operadores '==', '!=', '>', '>=',
+                 '<', '<=', 'em', 'fora'. Ex.: '{"ano": 2023, "data_pedido": {">=": "2023-03-01"}}'
+        top: Quantidade máxima de linhas (as de maior valor em ordenar_por)
+        ordenar_por: Métrica de ordenação (padrão: a primeira)
+    
+    Returns:
+        String com dados formatados
+    """
+    try:
+        onde = json.loads(filtros) if filtros else {}
+    except json.JSONDecodeError as e:
+        return f"Erro: filtros deve ser um JSON válido ({e})"
+    lista_metricas = [m.strip() for m in metricas.split(',') if m.strip()]
+    lista_por = [d.strip() for d in por.split(',') if d.strip()]
+    
+    try:
+        df = get_analise().consulta(lista_metricas, por=lista_por, onde=onde, top=top, ordenar_por=ordenar_por)
+    except ValueError as e:
+        return str(e)
+    if df.empty:
+        return "Nenhuma venda encontrada para esses filtros."
+    
+    resposta = f"🔎 CONSULTA ({', '.join(lista_metricas)}"
+    resposta += f" por {', '.join(lista_por)})" if lista_por else ")"
+    resposta += ":\n" + df.to_string(index=False)
+    return resposta
 
 
 # -------------------------------------------
@@ -381,6 +601,8 @@ def get_tool_router():
         analisar_vendas,
         recomendar_campanha,
         analisar_mix_produtos,
+        recomendar_produtos_relacionados,
+        consultar_dados,
         obter_cotacao_produto,
         buscar_produto,
     ]
@@ -1,8 +1,107 @@
 import pandas as pd
 import numpy as np
 from .transformacao import Transformacao
+from .relatorio import executar_relatorio, imprimir_relatorio
+from .cesta import pares_de_produtos
+from .recomendacao import IndiceRecomendacao
+from .previsao import holt_winters, intervalo_previsao
+from .anomalias import DetectorAnomalias
+from .kernels import agregar, codificar, contar_distintos
+from .sketches import HyperLogLog, DDSketch, estimar_registros
+from .geografia import DimensaoGeografica
+from .categorias import carregar_grupos, resolver_grupos, nomes_grupos
+from .consulta import (METRICAS_MOEDA, validar_consulta, assinatura_consulta, codificar_dimensao,
+                       executar_consulta)
+from .sql import MotorSQL, executar_consulta_sql, importar_duckdb
 from datetime import datetime
 from typing import Dict, Any
+import os
+import threading
+import itertools
+
+
+# Granularidades aceitas por analise_vendas_periodo
+GRANULARIDADES = ('dia', 'semana', 'mes', 'trimestre', 'ano')
+
+# Dimensões de analise_previsao_vendas; a previsão é calculada uma vez até o horizonte máximo
+DIMENSOES_PREVISAO = ('total', 'categoria', 'canal')
+HORIZONTE_MAXIMO_PREVISAO = 12
+
+
+# CLV: valor futuro esperado nos próximos meses
+HORIZONTE_CLV_MESES = 12
+DIAS_POR_MES = 30.4375
+
+
+# Curva ABC: limites de participação acumulada (%) das classes A e B; o restante é C
+LIMITES_ABC = (80.0, 95.0)
+ENTIDADES_ABC = ('clientes', 'produtos')
+
+
+# Dimensões da decomposição da receita (receita bruta, desconto e líquida)
+DIMENSOES_DECOMPOSICAO = ('produto', 'categoria', 'canal', 'periodo')
+
+
+# Comparações entre períodos: dimensões e medidas das matrizes série × mês
+DIMENSOES_COMPARACAO = ('total', 'canal', 'forma_pagamento', 'categoria')
+MEDIDAS_COMPARACAO = ('receita', 'pedidos', 'clientes', 'ticket_medio')
+
+# Nomes dos meses (índice 0 = janeiro) e z da faixa de confiança do perfil sazonal médio
+NOMES_MESES = ('Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+               'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro')
+Z_PERFIL_SAZONAL = 1.96
+MEDIDAS_SAZONAIS = ('receita', 'pedidos', 'clientes', 'ticket_medio', 'indice')
+
+# Níveis da dimensão geográfica
+NIVEIS_REGIAO = ('estado', 'cidade')
+
+# Modo aproximado: precisão do HyperLogLog (2^p registradores) e erro relativo do DDSketch
+PRECISAO_HLL = 12
+ERRO_QUANTIL = 0.01
+
+
+# Visões consolidadas: colunas de cada tabela que um grupo de análises precisa.
+# A junção parte sempre dos itens (vendas) e segue a ordem pedidos → produtos → cor_produto → clientes.
+VISOES = {
+    'produtos': {
+        'vendas': ['id_pedido', 'id_produto', 'quantidade', 'subtotal'],
+        'produtos': ['id_produto', 'nome_produto', 'categoria', 'valor_unitario'],
+    },
+    'cores': {
+        'vendas': ['id_pedido', 'id_cor', 'quantidade', 'subtotal'],
+        'cor_produto': ['id_cor', 'nome_cor'],
+    },
+    'clientes': {
+        'vendas': ['id_pedido', 'quantidade', 'subtotal'],
+        'pedidos': ['id_pedido', 'id_cliente', 'canal_venda'],
+        'clientes': ['id_cliente', 'nome', 'sexo', 'cidade'],
+    },
+}
+
+# Chave de junção de cada tabela dimensão com os itens
+_CHAVES_JUNCAO = {
+    'pedidos': 'id_pedido',
+    'produtos': 'id_produto',
+    'cor_produto': 'id_cor',
+    'clientes': 'id_cliente',
+}
+
+# Segmentos RFM: (nome, faixa do score R, faixa da média dos scores F e M), avaliados em ordem
+SEGMENTOS_RFM = [
+    ('Campeões', (4, 5), (4, 5)),
+    ('Clientes Fiéis', (3, 5), (3, 5)),
+    ('Promissores', (4, 5), (1, 3)),
+    ('Precisam de Atenção', (3, 3), (1, 3)),
+    ('Em Risco', (1, 2), (3, 5)),
+    ('Hibernando', (2, 2), (1, 3)),
+    ('Perdidos', (1, 1), (1, 3)),
+]
+
+# Motores das consultas declarativas; CONECTA_MOTOR_CONSULTA escolhe o padrão
+MOTORES_CONSULTA = ('pandas', 'duckdb')
+
+# Sequência de versões de dados (cada instância de AnaliseDados é uma versão)
+_versoes_dados = itertools.count(1)
 
 
 def formatar_moeda(valor):
@@ -12,43 +111,331 @@ def formatar_moeda(valor):
     return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 
+def _variacao_percentual(atual: np.ndarray, anterior: np.ndarray) -> np.ndarray:
+    """Variação percentual elemento a elemento (NaN quando o valor anterior é zero ou ausente)"""
+    return np.divide((atual - anterior) * 100, anterior, out=np.full(np.shape(atual), np.nan),
+                     where=np.nan_to_num(anterior) > 0)
+
+
+def _formatar_erro(erro_relativo: float) -> str:
+    """Formata o erro relativo de uma estimativa do modo aproximado (±1.6%)"""
+    return f"±{erro_relativo * 100:.1f}%"
+
+
+def selecionar_top(df: pd.DataFrame, coluna: str, top_n: int) -> pd.DataFrame:
+    """
+    Retorna as top_n linhas de maior valor em coluna, em ordem decrescente, via seleção parcial
+    (sempre um frame novo: o chamador pode alterá-lo sem afetar o original, que pode estar em cache)
+    """
+    if top_n is None or top_n >= len(df):
+        return df.sort_values(coluna, ascending=False, kind='stable')
+    if top_n <= 0:
+        return df.iloc[:0].copy()
+    
+    # np.partition acha o corte (top_n-ésimo maior valor) em O(n); só as linhas que o alcançam
+    # são ordenadas, de forma estável, para que empates sigam a ordem original como no sort completo
+    valores = df[coluna].to_numpy(dtype=float)
+    validos = valores[~np.isnan(valores)]
+    if len(validos) < top_n:
+        return df.sort_values(coluna, ascending=False, kind='stable').head(top_n)
+    corte = np.partition(validos, len(validos) - top_n)[len(validos) - top_n]
+    candidatos = df[valores >= corte]
+    return candidatos.sort_values(coluna, ascending=False, kind='stable').head(top_n)
+
+
 class AnaliseDados:
     """Classe para análise de dados de vendas, produtos e clientes"""
     
-    def __init__(self):
-        """Inicializa a classe e carrega todos os dados transformados"""
-        self.transformacao = Transformacao()
-        self._carregar_dados()
-        self._preparar_dados()
+    def __init__(self, transformacao: Transformacao = None):
+        """Inicializa a classe; cada coleção é carregada e preparada apenas no primeiro acesso"""
+        self._transformacao = transformacao
+        self.versao_dados = next(_versoes_dados)
+        self.motor_consulta = os.getenv('CONECTA_MOTOR_CONSULTA', 'pandas')
+        if self.motor_consulta not in MOTORES_CONSULTA:
+            raise ValueError(f"CONECTA_MOTOR_CONSULTA '{self.motor_consulta}' inválido. Use: {', '.join(MOTORES_CONSULTA)}")
+        if self.motor_consulta == 'duckdb':
+            importar_duckdb()  # falha já na criação, não na primeira consulta
+        self._cache = {}
+        self._indices_herdados = {}
+        self._travas = {}
+        self._trava = threading.Lock()
+    
+    @classmethod
+    def de_dataframes(cls, clientes: pd.DataFrame, produtos: pd.DataFrame, cor_produto: pd.DataFrame,
+                      pedidos: pd.DataFrame, vendas: pd.DataFrame, posicao_pedido_item: np.ndarray = None,
+                      inicio_itens: np.ndarray = None) -> 'AnaliseDados':
+        """
+        Instância sem banco a partir das tabelas já preparadas (df_clientes, df_produtos, ...)
+
+        Com posicao_pedido_item e inicio_itens (de um snapshot exportado), vendas já está agrupada
+        por pedido e é usada como está, sem reordenar (nem copiar) os itens.
+        """
+        analise = cls()
+        analise._cache.update({
+            'clientes': (clientes, DimensaoGeografica(clientes)),
+            'produtos': produtos,
+            'cor_produto': cor_produto,
+            'pedidos': pedidos,
+        })
+        if posicao_pedido_item is None or inicio_itens is None:
+            analise._cache['vendas'] = analise._agrupar_vendas(vendas)
+        else:
+            analise._cache['vendas'] = (vendas, posicao_pedido_item, inicio_itens)
+        return analise
+    
+    @property
+    def transformacao(self) -> Transformacao:
+        """Acesso ao MongoDB (a conexão só é aberta quando alguma coleção precisa ser carregada)"""
+        if self._transformacao is None:
+            with self._trava:
+                if self._transformacao is None:
+                    self._transformacao = Transformacao()
+        return self._transformacao
+    
+    def _obter(self, chave: str, construtor):
+        """
+        Retorna o objeto em cache, construindo-o uma única vez no primeiro acesso
+        (compartilhado por todas as chamadas do snapshot: copie antes de alterar)
+        """
+        try:
+            return self._cache[chave]
+        except KeyError:
+            pass
+        
+        # Uma trava por chave: construções de chaves diferentes podem ocorrer em paralelo
+        with self._trava:
+            trava = self._travas.setdefault(chave, threading.RLock())
+        with trava:
+            if chave not in self._cache:
+                self._cache[chave] = construtor()
+            return self._cache[chave]
     
-    def _carregar_dados(self):
-        """Carrega todos os dados das coleções"""
+    def carregar_tudo(self):
+        """Força o carregamento de todas as coleções e do dataframe consolidado"""
         print("Carregando dados...")
-        self.df_clientes = self.transformacao.transformar_clientes()
-        self.df_vendas = self.transformacao.transformar_vendas()
-        self.df_produtos = self.transformacao.transformar_produtos()
-        self.df_cor_produto = self.transformacao.transformar_cor_produto()
-        self.df_pedidos = self.transformacao.transformar_pedidos()
+        self.df_completo
         print("Dados carregados com sucesso!\n")
     
-    def _preparar_dados(self):
-        """Prepara e normaliza os dados para análise"""
-        # Padronizar nomes de colunas
-        self.df_produtos.columns = ['id_produto', 'nome_produto', 'categoria', 'fornecedor', 'valor_unitario']
-        self.df_cor_produto.columns = ['id_cor', 'nome_cor']
-        self.df_pedidos.columns = ['id_pedido', 'id_cliente', 'data_pedido', 'valor_total', 'forma_pagamento', 'canal_venda']
+    # ==================== CARREGAMENTO SOB DEMANDA ====================
+    
+    @property
+    def df_clientes(self) -> pd.DataFrame:
+        """Clientes (coleção Clientes) com os códigos de UF e cidade normalizados"""
+        return self._obter('clientes', self._carregar_clientes)[0]
+    
+    @property
+    def geografia(self) -> DimensaoGeografica:
+        """Dimensão geográfica (UF e cidade normalizadas) dos clientes"""
+        return self._obter('clientes', self._carregar_clientes)[1]
+    
+    @property
+    def df_produtos(self) -> pd.DataFrame:
+        """Produtos com nomes de colunas padronizados e grupo de categoria"""
+        return self._obter('produtos', self._carregar_produtos)
+    
+    @property
+    def grupos_categoria(self) -> Dict[str, Dict]:
+        """Grupos de categoria configurados (lidos uma vez por snapshot)"""
+        return self._obter('grupos_categoria', carregar_grupos)
+    
+    @property
+    def df_cor_produto(self) -> pd.DataFrame:
+        """Cores de produto com nomes de colunas padronizados"""
+        return self._obter('cor_produto', self._carregar_cor_produto)
+    
+    @property
+    def df_pedidos(self) -> pd.DataFrame:
+        """Pedidos preparados e ordenados por data"""
+        return self._obter('pedidos', self._carregar_pedidos)
+    
+    @property
+    def df_vendas(self) -> pd.DataFrame:
+        """Itens de pedido agrupados contiguamente na ordem de df_pedidos"""
+        return self._obter('vendas', self._carregar_vendas)[0]
+    
+    @property
+    def df_completo(self) -> pd.DataFrame:
+        """Dataframe consolidado (vendas + pedidos + produtos + clientes + cores)"""
+        return self._obter('completo', self._criar_dataframe_consolidado)
+    
+    def visao(self, nome: str) -> pd.DataFrame:
+        """Visão consolidada com apenas as colunas e junções que um grupo de análises usa"""
+        if nome not in VISOES:
+            raise ValueError(f"Visão '{nome}' não existe. Use: {', '.join(VISOES)}")
+        return self._obter(f"visao:{nome}:{self.versao_dados}", lambda: self._criar_visao(VISOES[nome]))
+    
+    def _criar_visao(self, especificacao: Dict[str, list]) -> pd.DataFrame:
+        """Junta aos itens somente as tabelas e colunas da especificação"""
+        df = self.df_vendas[especificacao['vendas']]
+        for tabela, chave in _CHAVES_JUNCAO.items():
+            if tabela in especificacao:
+                dimensao = getattr(self, f"df_{tabela}")[especificacao[tabela]]
+                df = df.merge(dimensao, on=chave, how='left')
+        return df
+    
+    @property
+    def _datas_pedidos(self) -> np.ndarray:
+        """Datas dos pedidos datados, em ordem crescente (pedidos sem data ficam fora das buscas)"""
+        return self._obter('datas_pedidos', self._extrair_datas_pedidos)
+    
+    @property
+    def _posicao_pedido_item(self) -> np.ndarray:
+        """Posição em df_pedidos do pedido de cada item (itens sem pedido apontam para o final)"""
+        return self._obter('vendas', self._carregar_vendas)[1]
+    
+    @property
+    def _inicio_itens(self) -> np.ndarray:
+        """Itens do pedido i ocupam as linhas [_inicio_itens[i], _inicio_itens[i + 1]) de df_vendas"""
+        return self._obter('vendas', self._carregar_vendas)[2]
+    
+    @property
+    def _codigos_periodo(self) -> Dict[str, np.ndarray]:
+        """Código inteiro do período de cada pedido datado, por granularidade"""
+        return self._obter('codigos_periodo', self._calcular_codigos_periodo)
+    
+    @property
+    def _codigo_cliente_pedido(self) -> np.ndarray:
+        """Código denso do cliente de cada pedido"""
+        return self._obter('codigos_cliente', self._codificar_clientes_pedidos)[0]
+    
+    @property
+    def _clientes_pedidos(self) -> np.ndarray:
+        """id_cliente correspondente a cada código de cliente"""
+        return self._obter('codigos_cliente', self._codificar_clientes_pedidos)[1]
+    
+    @property
+    def _n_clientes_pedidos(self) -> int:
+        """Quantidade de clientes distintos com pedidos"""
+        return len(self._clientes_pedidos)
+    
+    def _carregar_clientes(self):
+        """Carrega clientes e normaliza a geografia uma única vez (códigos codigo_uf e codigo_cidade)"""
+        df = self.transformacao.transformar_clientes()
+        geografia = DimensaoGeografica(df)
+        df['codigo_uf'] = geografia.codigo_uf_cliente
+        df['codigo_cidade'] = geografia.codigo_cidade_cliente
+        return df, geografia
+    
+    def _carregar_produtos(self) -> pd.DataFrame:
+        """Carrega produtos e padroniza nomes de colunas"""
+        df = self.transformacao.transformar_produtos()
+        df.columns = ['id_produto', 'nome_produto', 'categoria', 'fornecedor', 'valor_unitario']
+        df['grupo_categoria'] = resolver_grupos(df['categoria'], self.grupos_categoria)
+        return df
+    
+    def _carregar_cor_produto(self) -> pd.DataFrame:
+        """Carrega cores e padroniza nomes de colunas"""
+        df = self.transformacao.transformar_cor_produto()
+        df.columns = ['id_cor', 'nome_cor']
+        return df
+    
+    def _carregar_pedidos(self) -> pd.DataFrame:
+        """Carrega pedidos, extrai informações de data e ordena por data (NaT ao final)"""
+        df = self.transformacao.transformar_pedidos()
+        df.columns = ['id_pedido', 'id_cliente', 'data_pedido', 'valor_total', 'forma_pagamento', 'canal_venda']
         
         # Converter data_pedido para datetime
-        self.df_pedidos['data_pedido'] = pd.to_datetime(self.df_pedidos['data_pedido'], errors='coerce')
+        df['data_pedido'] = pd.to_datetime(df['data_pedido'], errors='coerce')
         
         # Extrair informações de data
-        self.df_pedidos['ano'] = self.df_pedidos['data_pedido'].dt.year
-        self.df_pedidos['mes'] = self.df_pedidos['data_pedido'].dt.month
-        self.df_pedidos['mes_nome'] = self.df_pedidos['data_pedido'].dt.strftime('%B')
-        self.df_pedidos['ano_mes'] = self.df_pedidos['data_pedido'].dt.to_period('M')
+        df['ano'] = df['data_pedido'].dt.year
+        df['mes'] = df['data_pedido'].dt.month
+        df['mes_nome'] = df['data_pedido'].dt.strftime('%B')
+        df['ano_mes'] = df['data_pedido'].dt.to_period('M')
+        
+        # Ordenar por data permite fatiar períodos com searchsorted
+        return df.sort_values('data_pedido', kind='mergesort', na_position='last').reset_index(drop=True)
+    
+    def _carregar_vendas(self):
+        """Carrega itens e os agrupa contiguamente por pedido, na ordem de df_pedidos"""
+        return self._agrupar_vendas(self.transformacao.transformar_vendas())
+    
+    def _agrupar_vendas(self, df: pd.DataFrame):
+        """Ordena os itens por posição do pedido em df_pedidos e calcula os deslocamentos de cada pedido"""
+        # Posição do pedido de cada item (itens sem pedido vão para o final)
+        n_pedidos = len(self.df_pedidos)
+        posicao = pd.Index(self.df_pedidos['id_pedido']).get_indexer(df['id_pedido'])
+        posicao = np.where(posicao < 0, n_pedidos, posicao)
         
-        # Criar dataframe consolidado (vendas + pedidos + produtos + clientes + cores)
-        self.df_completo = self._criar_dataframe_consolidado()
+        ordem = np.argsort(posicao, kind='stable')
+        inicio_itens = np.concatenate(
+            ([0], np.cumsum(np.bincount(posicao, minlength=n_pedidos + 1)))
+        )
+        return df.iloc[ordem].reset_index(drop=True), posicao[ordem], inicio_itens
+    
+    def _extrair_datas_pedidos(self) -> np.ndarray:
+        """Extrai as datas válidas (prefixo ordenado) de df_pedidos"""
+        datas = self.df_pedidos['data_pedido']
+        return datas.values[:int(datas.notna().sum())]
+    
+    @staticmethod
+    def _intervalo_ano_mes(ano: int, mes: int = None):
+        """Converte ano (e mês opcional) no intervalo de datas [inicio, fim)"""
+        if mes is None:
+            return pd.Timestamp(int(ano), 1, 1), pd.Timestamp(int(ano) + 1, 1, 1)
+        inicio = pd.Timestamp(int(ano), int(mes), 1)
+        return inicio, inicio + pd.DateOffset(months=1)
+    
+    def _calcular_codigos_periodo(self) -> Dict[str, np.ndarray]:
+        """Pré-calcula, para cada pedido datado, o código inteiro do seu período em cada granularidade"""
+        datas = self._datas_pedidos
+        dias = datas.astype('datetime64[D]').astype(np.int64)
+        meses = datas.astype('datetime64[M]').astype(np.int64)
+        
+        # Códigos crescentes com a data: semanas começam na segunda-feira (01/01/1970 foi quinta)
+        return {
+            'dia': dias,
+            'semana': (dias + 3) // 7,
+            'mes': meses,
+            'trimestre': meses // 3,
+            'ano': datas.astype('datetime64[Y]').astype(np.int64),
+        }
+    
+    def _codificar_clientes_pedidos(self):
+        """Código denso do cliente de cada pedido (para contagem de clientes únicos por período)"""
+        codigos, clientes = pd.factorize(self.df_pedidos['id_cliente'])
+        return codigos, np.asarray(clientes)
+    
+    @staticmethod
+    def _inicio_do_periodo(codigos: np.ndarray, granularidade: str) -> pd.DatetimeIndex:
+        """Converte códigos de período na data de início de cada período"""
+        if granularidade == 'dia':
+            datas = codigos.astype('datetime64[D]')
+        elif granularidade == 'semana':
+            datas = (codigos * 7 - 3).astype('datetime64[D]')
+        elif granularidade == 'mes':
+            datas = codigos.astype('datetime64[M]')
+        elif granularidade == 'trimestre':
+            datas = (codigos * 3).astype('datetime64[M]')
+        else:
+            datas = codigos.astype('datetime64[Y]')
+        return pd.DatetimeIndex(datas.astype('datetime64[ns]'))
+    
+    @staticmethod
+    def _rotular_periodos(inicios: pd.DatetimeIndex, granularidade: str) -> pd.Index:
+        """Rótulo legível de cada período a partir da data de início"""
+        if granularidade in ('dia', 'semana'):
+            return inicios.strftime('%d/%m/%Y')
+        if granularidade == 'mes':
+            return inicios.strftime('%m/%Y')
+        if granularidade == 'trimestre':
+            return pd.Index([f"T{t}/{a}" for t, a in zip(inicios.quarter, inicios.year)])
+        return inicios.strftime('%Y')
+    
+    def _posicoes_periodo(self, inicio=None, fim=None):
+        """Retorna as posições [i, j) dos pedidos com data em [inicio, fim) no índice ordenado"""
+        datas = self._datas_pedidos
+        i = 0 if inicio is None else int(datas.searchsorted(pd.Timestamp(inicio).to_datetime64(), side='left'))
+        j = len(datas) if fim is None else int(datas.searchsorted(pd.Timestamp(fim).to_datetime64(), side='left'))
+        return i, max(i, j)
+    
+    def _fatiar_periodo(self, inicio, fim):
+        """Retorna (pedidos, itens) com data em [inicio, fim) como fatias contíguas, sem cópia"""
+        i, j = self._posicoes_periodo(inicio, fim)
+        return (
+            self.df_pedidos.iloc[i:j],
+            self.df_vendas.iloc[self._inicio_itens[i]:self._inicio_itens[j]]
+        )
     
     def _criar_dataframe_consolidado(self) -> pd.DataFrame:
         """Cria um dataframe consolidado com todas as informações"""
@@ -84,6 +471,9 @@ class AnaliseDados:
             how='left'
         )
         
+        # Itens de clientes fora do cadastro recebem os códigos de UF/cidade não informadas
+        df['codigo_uf'], df['codigo_cidade'] = self.geografia.codigos(df['id_cliente'])
+        
         return df
     
     # ==================== ANÁLISES DE CLIENTES ====================
@@ -97,59 +487,396 @@ class AnaliseDados:
         return analise
     
     def analise_clientes_por_regiao(self) -> pd.DataFrame:
-        """Análise de distribuição de clientes por região/cidade"""
-        analise = self.df_clientes.groupby(['estado2', 'cidade']).size().reset_index(name='quantidade')
-        analise = analise.sort_values('quantidade', ascending=False)
+        """Análise de distribuição de clientes por região/cidade (UF e cidade normalizadas)"""
+        analise = self._regioes['cidade']
+        analise = analise.loc[analise['clientes'] > 0, ['uf', 'estado', 'cidade', 'clientes']]
+        analise = analise.rename(columns={'clientes': 'quantidade'})
+        analise = analise.sort_values('quantidade', ascending=False, kind='stable')
         analise['percentual'] = (analise['quantidade'] / analise['quantidade'].sum() * 100).round(2)
         analise['percentual'] = analise['percentual'].apply(lambda x: f"{x:.2f}%")
         return analise
     
+    def analise_vendas_por_regiao(self, nivel: str = 'estado', uf: str = None, top_n: int = None,
+                                  formatar: bool = True) -> pd.DataFrame:
+        """Clientes, pedidos e receita por estado ou cidade (opcionalmente só as cidades de uma UF)"""
+        if nivel not in NIVEIS_REGIAO:
+            raise ValueError(f"Nível '{nivel}' inválido. Use: {', '.join(NIVEIS_REGIAO)}")
+        analise = self._regioes[nivel]
+        if uf is not None:
+            analise = analise[analise['uf'] == str(uf).strip().upper()]
+        analise = analise[(analise['clientes'] > 0) | (analise['pedidos'] > 0)]
+        analise = selecionar_top(analise, 'receita', top_n).reset_index(drop=True)
+        analise = analise.drop(columns=['codigo_uf', 'codigo_cidade'], errors='ignore')
+        
+        if formatar:
+            analise['receita'] = analise['receita'].apply(formatar_moeda)
+            analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
+            analise['percentual_receita'] = analise['percentual_receita'].apply(lambda x: f"{x:.2f}%")
+        return analise
+    
+    @property
+    def _regioes(self) -> Dict[str, pd.DataFrame]:
+        """Totais pré-calculados por estado e por cidade (uma linha por código da dimensão)"""
+        return self._obter(f"regioes:{self.versao_dados}", self._calcular_regioes)
+    
+    def _calcular_regioes(self) -> Dict[str, pd.DataFrame]:
+        """Clientes cadastrados, compradores, pedidos e receita por código de UF e de cidade"""
+        geografia = self.geografia
+        pedidos = self.df_pedidos
+        uf_pedido, cidade_pedido = geografia.codigos(pedidos['id_cliente'])
+        valores = np.nan_to_num(pedidos['valor_total'].to_numpy(dtype=float))
+        receita_total = valores.sum()
+        
+        regioes = {}
+        for nivel, dimensao, codigos_cliente, codigos_pedido in (
+            ('estado', geografia.ufs, geografia.codigo_uf_cliente, uf_pedido),
+            ('cidade', geografia.cidades, geografia.codigo_cidade_cliente, cidade_pedido),
+        ):
+            n = len(dimensao)
+            contagem = np.bincount(codigos_pedido, minlength=n)
+            receita = np.bincount(codigos_pedido, weights=valores, minlength=n)
+            regioes[nivel] = dimensao.assign(
+                clientes=np.bincount(codigos_cliente, minlength=n),
+                clientes_compradores=contar_distintos(codigos_pedido, n, pedidos['id_cliente']),
+                pedidos=contagem,
+                receita=receita,
+                ticket_medio=np.round(np.divide(receita, contagem, out=np.zeros(n), where=contagem > 0), 2),
+                percentual_receita=np.round(receita / receita_total * 100, 2) if receita_total else np.zeros(n),
+            )
+        return regioes
+    
     def analise_compras_por_canal_cliente(self) -> pd.DataFrame:
         """Análise de compras por canal (loja física ou instagram) por cliente"""
-        analise = self.df_completo.groupby(['id_cliente', 'nome', 'sexo', 'canal_venda']).agg({
-            'id_pedido': 'nunique',
-            'subtotal': 'sum'
-        }).reset_index()
+        analise = self.consulta(['pedidos', 'receita'], por=['id_cliente', 'nome_cliente', 'sexo', 'canal_venda'],
+                                ordenar_por='receita', formatar=False)
         analise.columns = ['id_cliente', 'nome', 'sexo', 'canal_venda', 'total_pedidos', 'valor_total']
-        analise = analise.sort_values('valor_total', ascending=False)
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         return analise
     
     def analise_tipo_mercadoria_por_cliente(self) -> pd.DataFrame:
         """Análise de preferência de categoria de produtos por cliente"""
-        analise = self.df_completo.groupby(['id_cliente', 'nome', 'sexo', 'categoria']).agg({
-            'quantidade': 'sum',
-            'subtotal': 'sum'
-        }).reset_index()
+        analise = self.consulta(['quantidade', 'receita'], por=['id_cliente', 'nome_cliente', 'sexo', 'categoria'],
+                                formatar=False)
         analise.columns = ['id_cliente', 'nome', 'sexo', 'categoria', 'qtd_itens', 'valor_total']
         analise = analise.sort_values(['id_cliente', 'valor_total'], ascending=[True, False])
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         return analise
     
-    def analise_clientes_mais_valiosos(self, top_n: int = 20) -> pd.DataFrame:
-        """Identifica os clientes mais valiosos (maior valor de compras)"""
-        analise = self.df_completo.groupby(['id_cliente', 'nome', 'sexo', 'cidade']).agg({
-            'id_pedido': 'nunique',
-            'subtotal': 'sum',
-            'quantidade': 'sum'
-        }).reset_index()
-        analise.columns = ['id_cliente', 'nome', 'sexo', 'cidade', 'total_pedidos', 'valor_total', 'itens_comprados']
+    def analise_clientes_mais_valiosos(self, top_n: int = 20, ordenar_por: str = 'valor_total') -> pd.DataFrame:
+        """Identifica os clientes mais valiosos (maior valor de compras ou maior CLV)"""
+        if ordenar_por not in ('valor_total', 'clv'):
+            raise ValueError("ordenar_por deve ser 'valor_total' ou 'clv'")
+        # Cópia: o agregado em cache é compartilhado por todas as chamadas do snapshot
+        analise = self._obter(f"agregado_clientes:{self.versao_dados}", self._agregar_vendas_por_cliente).copy()
+        
+        if ordenar_por == 'clv':
+            clv = self.analise_clv(formatar=False).set_index('id_cliente')
+            analise['valor_futuro'] = analise['id_cliente'].map(clv['valor_futuro']).fillna(0.0)
+            analise['clv'] = analise['id_cliente'].map(clv['clv']).fillna(analise['valor_total'])
+        
+        analise = selecionar_top(analise, ordenar_por, top_n)
         analise['ticket_medio'] = (analise['valor_total'] / analise['total_pedidos']).round(2)
-        analise = analise.sort_values('valor_total', ascending=False).head(top_n)
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
+        if ordenar_por == 'clv':
+            analise['valor_futuro'] = analise.pop('valor_futuro').apply(formatar_moeda)
+            analise['clv'] = analise.pop('clv').apply(formatar_moeda)
+        return analise
+    
+    def _agregar_vendas_por_cliente(self) -> pd.DataFrame:
+        """Pedidos, valor e itens por cliente direto dos itens (cliente herdado do pedido), sem junção"""
+        vendas = self.df_vendas
+        id_cliente = np.append(self.df_pedidos['id_cliente'].to_numpy(dtype=float), np.nan)[self._posicao_pedido_item]
+        analise = agregar(
+            id_cliente, 'id_cliente',
+            somas={'valor_total': vendas['subtotal'], 'itens_comprados': vendas['quantidade']},
+            distintos={'total_pedidos': vendas['id_pedido']}
+        )
+        analise['id_cliente'] = analise['id_cliente'].astype(self.df_pedidos['id_cliente'].dtype)
+        analise['itens_comprados'] = analise['itens_comprados'].astype(np.int64)
+        
+        # Como no groupby por (id_cliente, nome, sexo, cidade): clientes sem cadastro ficam de fora
+        cadastro = self.df_clientes.drop_duplicates('id_cliente').set_index('id_cliente')
+        for posicao, coluna in enumerate(['nome', 'sexo', 'cidade'], start=1):
+            analise.insert(posicao, coluna, analise['id_cliente'].map(cadastro[coluna]))
+        analise = analise.dropna(subset=['nome', 'sexo', 'cidade']).reset_index(drop=True)
+        return analise[['id_cliente', 'nome', 'sexo', 'cidade', 'total_pedidos', 'valor_total', 'itens_comprados']]
+    
+    def analise_rfm(self, data_referencia=None, formatar: bool = True) -> pd.DataFrame:
+        """Recência, frequência e valor monetário por cliente, com scores de quintil (1-5) e segmento"""
+        if data_referencia is None:
+            rfm = self._obter(f"rfm:{self.versao_dados}", self._calcular_rfm).copy()
+        else:
+            rfm = self._calcular_rfm(data_referencia)
+        
+        if formatar:
+            rfm['valor_monetario'] = rfm['valor_monetario'].apply(formatar_moeda)
+        return rfm
+    
+    def _calcular_rfm(self, data_referencia=None) -> pd.DataFrame:
+        """Calcula o RFM de todos os clientes em uma passada vetorizada sobre os pedidos datados"""
+        n = len(self._datas_pedidos)
+        codigos = self._codigo_cliente_pedido[:n]
+        n_clientes = self._n_clientes_pedidos
+        
+        if data_referencia is None:
+            referencia = self._datas_pedidos[-1].astype('datetime64[D]') + 1 if n else np.datetime64('today')
+        else:
+            referencia = np.datetime64(pd.Timestamp(data_referencia).date(), 'D')
+        dias = self._codigos_periodo['dia']
+        
+        frequencia = np.bincount(codigos, minlength=n_clientes)
+        monetario = np.bincount(
+            codigos, weights=self.df_pedidos['valor_total'].to_numpy(dtype=float)[:n], minlength=n_clientes
+        )
+        ultimo_dia = np.full(n_clientes, np.iinfo(np.int64).min)
+        np.maximum.at(ultimo_dia, codigos, dias)
+        
+        # Apenas clientes com ao menos um pedido datado
+        ativos = frequencia > 0
+        rfm = pd.DataFrame({
+            'id_cliente': self._clientes_pedidos[ativos],
+            'recencia_dias': referencia.astype(np.int64) - ultimo_dia[ativos],
+            'frequencia': frequencia[ativos],
+            'valor_monetario': monetario[ativos],
+        })
+        
+        # Scores por quintil do ranking percentual (empates recebem o mesmo score)
+        def quintil(serie, ascendente=True):
+            return np.clip(np.ceil(serie.rank(pct=True, ascending=ascendente) * 5), 1, 5).astype(np.int64)
+        
+        rfm['r_score'] = quintil(rfm['recencia_dias'], ascendente=False)
+        rfm['f_score'] = quintil(rfm['frequencia'])
+        rfm['m_score'] = quintil(rfm['valor_monetario'])
+        rfm['rfm'] = (rfm['r_score'] * 100 + rfm['f_score'] * 10 + rfm['m_score']).astype(str)
+        
+        r = rfm['r_score'].to_numpy()
+        fm = (rfm['f_score'].to_numpy() + rfm['m_score'].to_numpy()) / 2
+        condicoes = [
+            (r >= r_min) & (r <= r_max) & (fm >= fm_min) & (fm <= fm_max)
+            for _, (r_min, r_max), (fm_min, fm_max) in SEGMENTOS_RFM
+        ]
+        rfm['segmento'] = np.select(condicoes, [nome for nome, _, _ in SEGMENTOS_RFM], default='Outros')
+        
+        nomes = self.df_clientes.drop_duplicates('id_cliente').set_index('id_cliente')['nome']
+        rfm.insert(1, 'nome', rfm['id_cliente'].map(nomes))
+        return rfm
+    
+    def analise_segmentos_rfm(self) -> pd.DataFrame:
+        """Resumo dos segmentos RFM: clientes, participação e valor por segmento"""
+        rfm = self.analise_rfm(formatar=False)
+        analise = rfm.groupby('segmento').agg({
+            'id_cliente': 'count',
+            'valor_monetario': 'sum',
+            'recencia_dias': 'mean',
+            'frequencia': 'mean'
+        }).reset_index()
+        analise.columns = ['segmento', 'clientes', 'valor_total', 'recencia_media_dias', 'frequencia_media']
+        analise = analise.sort_values('valor_total', ascending=False)
+        analise['percentual_clientes'] = (analise['clientes'] / analise['clientes'].sum() * 100).round(2)
+        analise['percentual_valor'] = (analise['valor_total'] / analise['valor_total'].sum() * 100).round(2)
+        analise['recencia_media_dias'] = analise['recencia_media_dias'].round(1)
+        analise['frequencia_media'] = analise['frequencia_media'].round(2)
+        analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
+        analise['percentual_clientes'] = analise['percentual_clientes'].apply(lambda x: f"{x:.2f}%")
+        analise['percentual_valor'] = analise['percentual_valor'].apply(lambda x: f"{x:.2f}%")
         return analise
     
+    def analise_curva_abc(self, entidade: str = 'clientes', formatar: bool = True) -> pd.DataFrame:
+        """Curva ABC (Pareto) de todos os clientes ou produtos: participação acumulada e classe A/B/C"""
+        if entidade not in ENTIDADES_ABC:
+            raise ValueError(f"Entidade '{entidade}' inválida. Use: {', '.join(ENTIDADES_ABC)}")
+        curva = self._obter(f"abc:{entidade}:{self.versao_dados}", lambda: self._calcular_curva_abc(entidade)).copy()
+        
+        if formatar:
+            curva['valor_total'] = curva['valor_total'].apply(formatar_moeda)
+            curva['percentual'] = curva['percentual'].apply(lambda x: f"{x:.2f}%")
+            curva['percentual_acumulado'] = curva['percentual_acumulado'].apply(lambda x: f"{x:.2f}%")
+        return curva
+    
+    def analise_resumo_abc(self, entidade: str = 'clientes') -> pd.DataFrame:
+        """Quantidade e participação no faturamento de cada classe da curva ABC"""
+        curva = self.analise_curva_abc(entidade, formatar=False)
+        analise = curva.groupby('classe').agg({'ranking': 'count', 'valor_total': 'sum'}).reindex(['A', 'B', 'C'])
+        analise = analise.fillna(0).reset_index()
+        analise.columns = ['classe', 'quantidade', 'valor_total']
+        analise['quantidade'] = analise['quantidade'].astype(np.int64)
+        total_quantidade, total_valor = analise['quantidade'].sum(), analise['valor_total'].sum()
+        analise['percentual_quantidade'] = (analise['quantidade'] / total_quantidade * 100 if total_quantidade else 0.0)
+        analise['percentual_valor'] = (analise['valor_total'] / total_valor * 100 if total_valor else 0.0)
+        analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
+        analise['percentual_quantidade'] = analise['percentual_quantidade'].apply(lambda x: f"{x:.2f}%")
+        analise['percentual_valor'] = analise['percentual_valor'].apply(lambda x: f"{x:.2f}%")
+        return analise
+    
+    def _calcular_curva_abc(self, entidade: str) -> pd.DataFrame:
+        """Soma o faturamento dos itens por entidade com bincount e classifica com uma ordenação + cumsum"""
+        vendas = self.df_vendas
+        subtotal = vendas['subtotal'].to_numpy(dtype=float)
+        
+        if entidade == 'clientes':
+            # Cliente de cada item via o pedido (itens sem pedido ficam fora)
+            com_pedido = self._posicao_pedido_item < len(self.df_pedidos)
+            codigos = self._codigo_cliente_pedido[self._posicao_pedido_item[com_pedido]]
+            subtotal = subtotal[com_pedido]
+            ids, coluna_id = self._clientes_pedidos, 'id_cliente'
+            nomes = self.df_clientes.drop_duplicates('id_cliente').set_index('id_cliente')['nome']
+        else:
+            codigos, ids = pd.factorize(vendas['id_produto'])
+            subtotal = subtotal[codigos >= 0]
+            codigos = codigos[codigos >= 0]
+            ids, coluna_id = np.asarray(ids), 'id_produto'
+            nomes = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')['nome_produto']
+        
+        valores = np.bincount(codigos, weights=np.nan_to_num(subtotal), minlength=len(ids))
+        ordem = np.argsort(-valores, kind='stable')
+        valores = valores[ordem]
+        total = valores.sum()
+        percentual = valores / total * 100 if total else np.zeros(len(valores))
+        acumulado = np.cumsum(percentual)
+        
+        # A classe vem da participação acumulada ANTES da entidade: quem cruza o limite ainda entra nele
+        anterior = acumulado - percentual
+        classe = np.select([anterior < LIMITES_ABC[0], anterior < LIMITES_ABC[1]], ['A', 'B'], default='C')
+        
+        curva = pd.DataFrame({
+            'ranking': np.arange(1, len(valores) + 1),
+            coluna_id: ids[ordem],
+            'valor_total': valores,
+            'percentual': percentual.round(4),
+            'percentual_acumulado': acumulado.round(4),
+            'classe': classe,
+        })
+        curva.insert(2, 'nome', curva[coluna_id].map(nomes))
+        return curva
+    
+    def analise_clv(self, formatar: bool = True) -> pd.DataFrame:
+        """Valor do cliente (CLV): valor histórico + valor esperado nos próximos HORIZONTE_CLV_MESES meses"""
+        clv = self._obter(f"clv:{self.versao_dados}", self._calcular_clv).copy()
+        if formatar:
+            for coluna in ['ticket_medio', 'valor_historico', 'valor_futuro', 'clv']:
+                clv[coluna] = clv[coluna].apply(formatar_moeda)
+            clv['probabilidade_ativo'] = (clv['probabilidade_ativo'] * 100).apply(lambda x: f"{x:.2f}%")
+        return clv
+    
+    def _calcular_clv(self) -> pd.DataFrame:
+        """
+        Calcula o CLV de todos os clientes em lote a partir do RFM
+        
+        Taxa de compra = pedidos / meses desde a 1ª compra; a chance de o cliente seguir ativo
+        decai com a recência medida nessa taxa (exp(-taxa × recência)).
+        """
+        rfm = self._obter(f"rfm:{self.versao_dados}", self._calcular_rfm)
+        n = len(self._datas_pedidos)
+        codigos = self._codigo_cliente_pedido[:n]
+        
+        # Primeiro dia de compra de cada cliente (mesma ordem de clientes do RFM)
+        primeiro_dia = np.full(self._n_clientes_pedidos, np.iinfo(np.int64).max)
+        np.minimum.at(primeiro_dia, codigos, self._codigos_periodo['dia'])
+        primeiro_dia = primeiro_dia[np.bincount(codigos, minlength=self._n_clientes_pedidos) > 0]
+        
+        referencia = self._datas_pedidos[-1].astype('datetime64[D]').astype(np.int64) + 1 if n else 0
+        frequencia = rfm['frequencia'].to_numpy(dtype=float)
+        historico = rfm['valor_monetario'].to_numpy(dtype=float)
+        ticket = historico / frequencia
+        
+        meses_cliente = np.maximum((referencia - primeiro_dia) / DIAS_POR_MES, 1.0)
+        taxa_mensal = frequencia / meses_cliente
+        probabilidade = np.exp(-taxa_mensal * rfm['recencia_dias'].to_numpy() / DIAS_POR_MES)
+        compras_esperadas = taxa_mensal * HORIZONTE_CLV_MESES * probabilidade
+        futuro = compras_esperadas * ticket
+        
+        clv = pd.DataFrame({
+            'id_cliente': rfm['id_cliente'].to_numpy(),
+            'nome': rfm['nome'].to_numpy(),
+            'frequencia': rfm['frequencia'].to_numpy(),
+            'ticket_medio': ticket.round(2),
+            'valor_historico': historico,
+            'probabilidade_ativo': probabilidade.round(4),
+            'compras_esperadas': compras_esperadas.round(2),
+            'valor_futuro': futuro.round(2),
+            'clv': (historico + futuro).round(2),
+        })
+        return clv.sort_values('clv', ascending=False, kind='mergesort').reset_index(drop=True)
+    
+    def analise_coortes_retencao(self, percentual: bool = True) -> pd.DataFrame:
+        """Matriz coorte (mês da 1ª compra) × meses desde a 1ª compra com a retenção de clientes"""
+        matriz = self._obter(f"coortes:{self.versao_dados}", self._calcular_coortes).copy()
+        if percentual:
+            offsets = [c for c in matriz.columns if c != 'clientes']
+            matriz[offsets] = (matriz[offsets].div(matriz['clientes'], axis=0) * 100).round(2)
+        return matriz
+    
+    def _calcular_coortes(self) -> pd.DataFrame:
+        """Conta clientes ativos por (coorte, deslocamento em meses) com um único bincount 2D"""
+        n = len(self._datas_pedidos)
+        if n == 0:
+            return pd.DataFrame(columns=['clientes'])
+        codigos = self._codigo_cliente_pedido[:n]
+        meses = self._codigos_periodo['mes']
+        mes_min, mes_max = int(meses[0]), int(meses[-1])
+        
+        # Mês da primeira compra de cada cliente e deslocamento de cada pedido em relação a ele
+        primeiro_mes = np.full(self._n_clientes_pedidos, mes_max)
+        np.minimum.at(primeiro_mes, codigos, meses)
+        deslocamento = meses - primeiro_mes[codigos]
+        
+        # Pares (cliente, deslocamento) distintos: cada cliente conta uma vez por mês
+        largura = mes_max - mes_min + 1
+        pares = np.unique(codigos.astype(np.int64) * largura + deslocamento)
+        cliente, deslocamento = pares // largura, pares % largura
+        coorte = primeiro_mes[cliente] - mes_min
+        
+        contagem = np.bincount(coorte * largura + deslocamento, minlength=largura * largura)
+        contagem = contagem.reshape(largura, largura).astype(float)
+        
+        # Meses ainda não observados para a coorte ficam vazios (NaN), não zero
+        fora_do_historico = np.add.outer(np.arange(largura), np.arange(largura)) >= largura
+        contagem[fora_do_historico] = np.nan
+        
+        matriz = pd.DataFrame(
+            contagem,
+            index=self._rotular_periodos(self._inicio_do_periodo(np.arange(mes_min, mes_max + 1), 'mes'), 'mes'),
+            columns=range(largura)
+        )
+        matriz.index.name = 'coorte'
+        matriz.insert(0, 'clientes', matriz[0].astype(np.int64))
+        return matriz[matriz['clientes'] > 0]
+    
     # ==================== ANÁLISES DE PRODUTOS ====================
     
+    def _agregar_vendas_por_produto(self) -> pd.DataFrame:
+        """Quantidade e faturamento por produto direto dos itens, com nome, categoria e preço do cadastro"""
+        vendas = self.df_vendas
+        analise = agregar(
+            vendas['id_produto'], 'id_produto',
+            somas={'qtd_vendida': vendas['quantidade'], 'valor_total': vendas['subtotal']}
+        )
+        analise['qtd_vendida'] = analise['qtd_vendida'].astype(np.int64)
+        
+        # Como no groupby por (id_produto, nome_produto, categoria): produtos sem cadastro ficam de fora
+        cadastro = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')
+        for posicao, coluna in enumerate(['nome_produto', 'categoria', 'valor_unitario'], start=1):
+            analise.insert(posicao, coluna, analise['id_produto'].map(cadastro[coluna]))
+        grupos = cadastro['grupo_categoria']
+        analise['grupo_categoria'] = pd.Categorical.from_codes(
+            grupos.cat.codes.to_numpy()[cadastro.index.get_indexer(analise['id_produto'])], grupos.cat.categories
+        )
+        return analise.dropna(subset=['nome_produto', 'categoria']).reset_index(drop=True)
+    
+    def _vendas_por_produto(self, grupo: str = None) -> pd.DataFrame:
+        """Agregado por produto (cacheado por versão), opcionalmente só os produtos de um grupo de categoria"""
+        analise = self._obter(f"agregado_produtos:{self.versao_dados}", self._agregar_vendas_por_produto)
+        if grupo is not None:
+            grupos = analise['grupo_categoria'].cat.categories
+            if grupo not in grupos:
+                raise ValueError(f"Grupo '{grupo}' não existe. Use: {', '.join(grupos)}")
+            analise = analise[analise['grupo_categoria'].cat.codes.to_numpy() == grupos.get_loc(grupo)]
+        return analise[['id_produto', 'nome_produto', 'categoria', 'qtd_vendida', 'valor_total']]
+    
     def analise_top_produtos_mais_vendidos(self, top_n: int = 10) -> pd.DataFrame:
         """Top N produtos mais vendidos"""
-        analise = self.df_completo.groupby(['id_produto', 'nome_produto', 'categoria']).agg({
-            'quantidade': 'sum',
-            'subtotal': 'sum'
-        }).reset_index()
-        analise.columns = ['id_produto', 'nome_produto', 'categoria', 'qtd_vendida', 'valor_total']
-        analise = analise.sort_values('qtd_vendida', ascending=False).head(top_n)
+        analise = selecionar_top(self._vendas_por_produto(), 'qtd_vendida', top_n)
         analise['percentual_vendas'] = (analise['qtd_vendida'] / analise['qtd_vendida'].sum() * 100).round(2)
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         analise['percentual_vendas'] = analise['percentual_vendas'].apply(lambda x: f"{x:.2f}%")
@@ -157,13 +884,14 @@ class AnaliseDados:
     
     def analise_vendas_por_segmento(self) -> pd.DataFrame:
         """Total de vendas por segmento/categoria"""
-        analise = self.df_completo.groupby('categoria').agg({
-            'quantidade': 'sum',
-            'subtotal': 'sum',
-            'id_produto': 'nunique',
-            'id_pedido': 'nunique'
-        }).reset_index()
-        analise.columns = ['categoria', 'qtd_itens_vendidos', 'valor_total', 'produtos_diferentes', 'pedidos']
+        vendas = self.df_vendas
+        categorias = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')['categoria']
+        analise = agregar(
+            vendas['id_produto'].map(categorias), 'categoria',
+            somas={'qtd_itens_vendidos': vendas['quantidade'], 'valor_total': vendas['subtotal']},
+            distintos={'produtos_diferentes': vendas['id_produto'], 'pedidos': vendas['id_pedido']}
+        )
+        analise['qtd_itens_vendidos'] = analise['qtd_itens_vendidos'].astype(np.int64)
         analise = analise.sort_values('valor_total', ascending=False)
         analise['percentual_faturamento'] = (analise['valor_total'] / analise['valor_total'].sum() * 100).round(2)
         analise['ticket_medio'] = (analise['valor_total'] / analise['pedidos']).round(2)
@@ -174,57 +902,54 @@ class AnaliseDados:
     
     def analise_cores_mais_vendidas(self) -> pd.DataFrame:
         """Análise das cores mais vendidas"""
-        analise = self.df_completo.groupby('nome_cor').agg({
-            'quantidade': 'sum',
-            'subtotal': 'sum',
-            'id_pedido': 'nunique'
-        }).reset_index()
-        analise.columns = ['cor', 'qtd_vendida', 'valor_total', 'pedidos']
+        vendas = self.df_vendas
+        cores = self.df_cor_produto.drop_duplicates('id_cor').set_index('id_cor')['nome_cor']
+        analise = agregar(
+            vendas['id_cor'].map(cores), 'cor',
+            somas={'qtd_vendida': vendas['quantidade'], 'valor_total': vendas['subtotal']},
+            distintos={'pedidos': vendas['id_pedido']}
+        )
+        analise['qtd_vendida'] = analise['qtd_vendida'].astype(np.int64)
         analise = analise.sort_values('qtd_vendida', ascending=False)
         analise['percentual'] = (analise['qtd_vendida'] / analise['qtd_vendida'].sum() * 100).round(2)
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         analise['percentual'] = analise['percentual'].apply(lambda x: f"{x:.2f}%")
         return analise
     
-    def analise_top_cosmeticos(self, top_n: int = 5) -> pd.DataFrame:
-        """Top N produtos de cosméticos mais vendidos"""
-        df_cosmeticos = self.df_completo[
-            self.df_completo['categoria'].str.contains('Cosm|Colora|Cabelo|Beleza', case=False, na=False)
-        ]
-        
-        analise = df_cosmeticos.groupby(['id_produto', 'nome_produto', 'categoria']).agg({
-            'quantidade': 'sum',
-            'subtotal': 'sum'
-        }).reset_index()
-        analise.columns = ['id_produto', 'nome_produto', 'categoria', 'qtd_vendida', 'valor_total']
-        analise = analise.sort_values('valor_total', ascending=False).head(top_n)
+    def analise_top_produtos_grupo(self, grupo: str, top_n: int = 5) -> pd.DataFrame:
+        """Top N produtos mais vendidos (por faturamento) de um grupo de categoria"""
+        analise = self._vendas_por_produto(grupo)
+        analise = selecionar_top(analise, 'valor_total', top_n)
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         return analise
     
+    def analise_grupos_categoria(self) -> pd.DataFrame:
+        """Grupos de categoria configurados com as categorias de cada um"""
+        produtos = self.df_produtos.drop_duplicates('categoria').dropna(subset=['categoria'])
+        categorias = produtos.groupby('grupo_categoria', observed=False)['categoria'].agg(lambda c: ', '.join(sorted(c)))
+        nomes = nomes_grupos(self.grupos_categoria)
+        return pd.DataFrame({
+            'grupo': categorias.index.astype(str),
+            'nome': [nomes.get(grupo, 'Outros') for grupo in categorias.index],
+            'categorias': categorias.to_numpy(),
+        })
+    
+    def analise_top_cosmeticos(self, top_n: int = 5) -> pd.DataFrame:
+        """Top N produtos de cosméticos mais vendidos"""
+        return self.analise_top_produtos_grupo('cosmeticos', top_n)
+    
     def analise_top_cadeiras_lavatorios(self, top_n: int = 5) -> pd.DataFrame:
         """Top N produtos de cadeiras e lavatórios mais vendidos"""
-        df_filtrado = self.df_completo[
-            self.df_completo['categoria'].str.contains('Cadeira|Lavat|Mobili', case=False, na=False)
-        ]
-        
-        analise = df_filtrado.groupby(['id_produto', 'nome_produto', 'categoria']).agg({
-            'quantidade': 'sum',
-            'subtotal': 'sum'
-        }).reset_index()
-        analise.columns = ['id_produto', 'nome_produto', 'categoria', 'qtd_vendida', 'valor_total']
-        analise = analise.sort_values('valor_total', ascending=False).head(top_n)
-        analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
-        return analise
+        return self.analise_top_produtos_grupo('cadeiras_lavatorios', top_n)
     
-    def analise_rentabilidade_produtos(self) -> pd.DataFrame:
-        """Análise de rentabilidade: produtos com maior valor de vendas"""
-        analise = self.df_completo.groupby(['id_produto', 'nome_produto', 'categoria', 'valor_unitario']).agg({
-            'quantidade': 'sum',
-            'subtotal': 'sum'
-        }).reset_index()
+    def analise_rentabilidade_produtos(self, top_n: int = None) -> pd.DataFrame:
+        """Análise de rentabilidade: produtos com maior valor de vendas (top_n opcional)"""
+        analise = self._obter(f"agregado_produtos:{self.versao_dados}", self._agregar_vendas_por_produto)
+        analise = analise.dropna(subset=['valor_unitario'])
+        analise = analise[['id_produto', 'nome_produto', 'categoria', 'valor_unitario', 'qtd_vendida', 'valor_total']]
         analise.columns = ['id_produto', 'nome_produto', 'categoria', 'preco_unitario', 'qtd_vendida', 'faturamento']
         analise['percentual_faturamento'] = (analise['faturamento'] / analise['faturamento'].sum() * 100).round(2)
-        analise = analise.sort_values('faturamento', ascending=False)
+        analise = selecionar_top(analise, 'faturamento', top_n)
         analise['preco_unitario'] = analise['preco_unitario'].apply(formatar_moeda)
         analise['faturamento'] = analise['faturamento'].apply(formatar_moeda)
         analise['percentual_faturamento'] = analise['percentual_faturamento'].apply(lambda x: f"{x:.2f}%")
@@ -232,14 +957,57 @@ class AnaliseDados:
     
     # ==================== ANÁLISES DE VENDAS ====================
     
-    def analise_vendas_por_ano(self) -> pd.DataFrame:
-        """Análise de vendas totais por ano"""
-        analise = self.df_pedidos.groupby('ano').agg({
-            'id_pedido': 'count',
-            'valor_total': 'sum',
-            'id_cliente': 'nunique'
-        }).reset_index()
-        analise.columns = ['ano', 'total_pedidos', 'valor_total', 'clientes_unicos']
+    def _agregar_pedidos(self, coluna: str, aproximado: bool = False) -> pd.DataFrame:
+        """Pedidos, valor e clientes únicos por valor da coluna (clientes exatos ou por HyperLogLog)"""
+        pedidos = self.df_pedidos
+        if not aproximado:
+            analise = agregar(
+                pedidos[coluna], coluna, contagem='total_pedidos',
+                somas={'valor_total': pedidos['valor_total']}, distintos={'clientes_unicos': pedidos['id_cliente']}
+            )
+        else:
+            analise = agregar(pedidos[coluna], coluna, contagem='total_pedidos',
+                              somas={'valor_total': pedidos['valor_total']})
+            codigos, _ = codificar(pedidos[coluna])
+            registros = HyperLogLog.por_grupo(codigos, len(analise), pedidos['id_cliente'], PRECISAO_HLL)
+            analise['clientes_unicos'] = np.round(estimar_registros(registros)).astype(np.int64)
+        return analise[[coluna, 'total_pedidos', 'valor_total', 'clientes_unicos']]
+    
+    @property
+    def _sketch_clientes_mensal(self) -> np.ndarray:
+        """Registradores HyperLogLog dos clientes de cada mês (linha i = mês i desde o primeiro pedido datado; última linha = pedidos sem data)"""
+        return self._obter(f"sketch_clientes_mes:{self.versao_dados}", self._calcular_sketch_clientes_mensal)
+    
+    def _calcular_sketch_clientes_mensal(self) -> np.ndarray:
+        """Um sketch por mês; qualquer intervalo de meses é a união (máximo) das linhas"""
+        meses = self._codigos_periodo['mes']
+        n_meses = int(meses[-1] - meses[0]) + 1 if len(meses) else 0
+        codigos = np.full(len(self.df_pedidos), n_meses, dtype=np.int64)
+        codigos[:len(meses)] = meses - (meses[0] if len(meses) else 0)
+        return HyperLogLog.por_grupo(codigos, n_meses + 1, self.df_pedidos['id_cliente'].to_numpy(), PRECISAO_HLL)
+    
+    def clientes_unicos_aproximados(self, inicio=None, fim=None) -> Dict[str, Any]:
+        """Clientes únicos com pedido em [inicio, fim) pela união dos sketches mensais (meses inteiros)"""
+        registros = self._sketch_clientes_mensal
+        meses = self._codigos_periodo['mes']
+        if inicio is None and fim is None:
+            linhas = registros
+        elif len(meses) == 0:
+            linhas = registros[:0]
+        else:
+            n_meses = len(registros) - 1
+            primeiro = 0 if inicio is None else int(np.datetime64(pd.Timestamp(inicio), 'M').astype(np.int64) - meses[0])
+            ultimo = n_meses if fim is None else int(
+                np.datetime64(pd.Timestamp(fim) - pd.Timedelta(days=1), 'M').astype(np.int64) - meses[0] + 1
+            )
+            linhas = registros[min(max(primeiro, 0), n_meses):min(max(ultimo, 0), n_meses)]
+        
+        hll = HyperLogLog(PRECISAO_HLL, linhas.max(axis=0) if len(linhas) else None)
+        return {'clientes_unicos': int(round(hll.estimar())), 'erro_relativo': hll.erro_relativo}
+    
+    def analise_vendas_por_ano(self, aproximado: bool = False) -> pd.DataFrame:
+        """Análise de vendas totais por ano (aproximado: clientes únicos por HyperLogLog)"""
+        analise = self._agregar_pedidos('ano', aproximado)
         analise['ticket_medio'] = (analise['valor_total'] / analise['total_pedidos']).round(2)
         
         # Calcular crescimento ano a ano
@@ -250,16 +1018,18 @@ class AnaliseDados:
         analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
         analise['crescimento_valor'] = analise['crescimento_valor'].apply(lambda x: f"{x:.2f}%" if pd.notna(x) else "-")
         analise['crescimento_pedidos'] = analise['crescimento_pedidos'].apply(lambda x: f"{x:.2f}%" if pd.notna(x) else "-")
+        if aproximado:
+            analise['erro_clientes_unicos'] = _formatar_erro(HyperLogLog(PRECISAO_HLL).erro_relativo)
         
         return analise
     
     def analise_vendas_mensal(self, ano: int = None) -> pd.DataFrame:
         """Análise de vendas por mês/ano (com filtro opcional por ano)"""
-        df = self.df_pedidos.copy()
+        df = self.df_pedidos
         
         # Filtrar por ano se fornecido
         if ano is not None:
-            df = df[df['ano'] == ano]
+            df, _ = self._fatiar_periodo(*self._intervalo_ano_mes(ano))
         
         analise = df.groupby(['ano', 'mes', 'mes_nome']).agg({
             'id_pedido': 'count',
@@ -273,48 +1043,238 @@ class AnaliseDados:
         analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
         return analise
     
-    def comparar_meses_entre_anos(self, mes: int, ano1: int, ano2: int) -> Dict[str, Any]:
-        """Compara vendas de um mês específico entre dois anos"""
-        df_ano1 = self.df_pedidos[(self.df_pedidos['ano'] == ano1) & (self.df_pedidos['mes'] == mes)]
-        df_ano2 = self.df_pedidos[(self.df_pedidos['ano'] == ano2) & (self.df_pedidos['mes'] == mes)]
+    def comparar_meses_entre_anos(self, mes: int, ano1: int = None, ano2: int = None) -> Dict[str, Any]:
+        """Compara vendas de um mês específico entre dois anos (padrão: último ano com vendas no mês e o anterior)"""
+        comparacoes = self._comparacoes
+        meses = comparacoes['meses']
+        if ano2 is None:
+            com_vendas = meses[(meses % 12 == int(mes) - 1) & (comparacoes['valores'][1, 0] > 0)]
+            ano2 = int(com_vendas[-1] // 12) + 1970 if len(com_vendas) else (int(meses[-1] // 12) + 1970 if len(meses) else 1970)
+        if ano1 is None:
+            ano1 = int(ano2) - 1
         
-        valor_total_ano1 = df_ano1['valor_total'].sum()
-        valor_total_ano2 = df_ano2['valor_total'].sum()
-        ticket_medio_ano1 = df_ano1['valor_total'].mean()
-        ticket_medio_ano2 = df_ano2['valor_total'].mean()
-        
-        resultado = {
-            f'{ano1}': {
-                'total_pedidos': len(df_ano1),
-                'valor_total': formatar_moeda(valor_total_ano1),
-                'ticket_medio': formatar_moeda(ticket_medio_ano1),
-                'clientes_unicos': df_ano1['id_cliente'].nunique()
-            },
-            f'{ano2}': {
-                'total_pedidos': len(df_ano2),
-                'valor_total': formatar_moeda(valor_total_ano2),
-                'ticket_medio': formatar_moeda(ticket_medio_ano2),
-                'clientes_unicos': df_ano2['id_cliente'].nunique()
+        resultado = {}
+        totais = {}
+        for ano in (ano1, ano2):
+            coluna = (int(ano) - 1970) * 12 + int(mes) - 1 - (meses[0] if len(meses) else 0)
+            if len(meses) and 0 <= coluna < len(meses):
+                receita, pedidos, clientes, ticket = comparacoes['valores'][:, 0, coluna]
+            else:
+                receita, pedidos, clientes, ticket = 0.0, 0, 0, np.nan
+            totais[ano] = (receita, int(pedidos), ticket)
+            resultado[f'{ano}'] = {
+                'total_pedidos': int(pedidos),
+                'valor_total': formatar_moeda(receita),
+                'ticket_medio': formatar_moeda(ticket),
+                'clientes_unicos': int(clientes)
             }
-        }
         
         # Calcular variação
+        (valor_total_ano1, pedidos_ano1, ticket_medio_ano1), (valor_total_ano2, pedidos_ano2, ticket_medio_ano2) = totais[ano1], totais[ano2]
         resultado['variacao'] = {
-            'pedidos_percentual': f"{((len(df_ano2) - len(df_ano1)) / len(df_ano1) * 100 if len(df_ano1) > 0 else 0):.2f}%",
+            'pedidos_percentual': f"{((pedidos_ano2 - pedidos_ano1) / pedidos_ano1 * 100 if pedidos_ano1 > 0 else 0):.2f}%",
             'valor_percentual': f"{((valor_total_ano2 - valor_total_ano1) / valor_total_ano1 * 100 if valor_total_ano1 > 0 else 0):.2f}%",
             'ticket_medio_percentual': f"{((ticket_medio_ano2 - ticket_medio_ano1) / ticket_medio_ano1 * 100 if ticket_medio_ano1 > 0 else 0):.2f}%"
         }
         
         return resultado
     
-    def analise_vendas_por_canal(self) -> pd.DataFrame:
-        """Análise de vendas por canal (Instagram vs Loja Física)"""
-        analise = self.df_pedidos.groupby('canal_venda').agg({
-            'id_pedido': 'count',
-            'valor_total': 'sum',
-            'id_cliente': 'nunique'
-        }).reset_index()
-        analise.columns = ['canal_venda', 'total_pedidos', 'valor_total', 'clientes_unicos']
+    def analise_comparacao_periodos(self, dimensao: str = 'total', medida: str = 'receita', ano: int = None,
+                                    mes: int = None, serie: str = None, formatar: bool = True) -> pd.DataFrame:
+        """
+        Variação mês contra mês anterior (MoM) e contra o mesmo mês do ano anterior (YoY) de cada série
+
+        Args:
+            dimensao: 'total', 'canal', 'forma_pagamento' ou 'categoria'
+            medida: 'receita', 'pedidos', 'clientes' ou 'ticket_medio'
+            ano, mes: Filtram os meses exibidos (as comparações usam todo o histórico)
+            serie: Filtra um valor da dimensão (ex.: 'Instagram')
+        """
+        if dimensao not in DIMENSOES_COMPARACAO:
+            raise ValueError(f"Dimensão '{dimensao}' inválida. Use: {', '.join(DIMENSOES_COMPARACAO)}")
+        if medida not in MEDIDAS_COMPARACAO:
+            raise ValueError(f"Medida '{medida}' inválida. Use: {', '.join(MEDIDAS_COMPARACAO)}")
+        
+        comparacoes = self._comparacoes
+        indice_medida = MEDIDAS_COMPARACAO.index(medida)
+        linhas = np.flatnonzero((comparacoes['rotulos']['dimensao'] == dimensao).to_numpy())
+        if serie is not None:
+            linhas = linhas[comparacoes['rotulos']['serie'].to_numpy()[linhas] == serie]
+        meses = comparacoes['meses']
+        colunas = np.ones(len(meses), dtype=bool)
+        if ano is not None:
+            colunas &= meses // 12 + 1970 == int(ano)
+        if mes is not None:
+            colunas &= meses % 12 == int(mes) - 1
+        colunas = np.flatnonzero(colunas)
+        
+        # Lookup nas matrizes pré-calculadas: uma linha por (série, mês)
+        grade_linhas, grade_colunas = np.repeat(linhas, len(colunas)), np.tile(colunas, len(linhas))
+        valor = comparacoes['valores'][indice_medida][grade_linhas, grade_colunas]
+        mes_anterior = comparacoes['mes_anterior'][indice_medida][grade_linhas, grade_colunas]
+        ano_anterior = comparacoes['ano_anterior'][indice_medida][grade_linhas, grade_colunas]
+        analise = pd.DataFrame({
+            'dimensao': dimensao,
+            'serie': comparacoes['rotulos']['serie'].to_numpy()[grade_linhas],
+            'ano': meses[grade_colunas] // 12 + 1970,
+            'mes': meses[grade_colunas] % 12 + 1,
+            'valor': valor,
+            'valor_mes_anterior': mes_anterior,
+            'variacao_mes': _variacao_percentual(valor, mes_anterior),
+            'valor_ano_anterior': ano_anterior,
+            'variacao_ano': _variacao_percentual(valor, ano_anterior),
+        })
+        
+        # Séries sem movimento no mês nem nos meses comparados ficam de fora
+        movimento = np.nan_to_num(valor) + np.nan_to_num(mes_anterior) + np.nan_to_num(ano_anterior)
+        analise = analise[movimento > 0].reset_index(drop=True)
+        
+        if formatar:
+            colunas_valor = ['valor', 'valor_mes_anterior', 'valor_ano_anterior']
+            if medida in ('receita', 'ticket_medio'):
+                for coluna in colunas_valor:
+                    analise[coluna] = analise[coluna].apply(lambda x: formatar_moeda(x) if pd.notna(x) else "-")
+            else:
+                for coluna in colunas_valor:
+                    analise[coluna] = analise[coluna].apply(lambda x: f"{int(x)}" if pd.notna(x) else "-")
+            for coluna in ['variacao_mes', 'variacao_ano']:
+                analise[coluna] = analise[coluna].apply(lambda x: f"{x:.2f}%" if pd.notna(x) else "-")
+        return analise
+    
+    @property
+    def _comparacoes(self) -> Dict[str, Any]:
+        """Matrizes série × mês e seus valores defasados (cacheados por versão dos dados)"""
+        return self._obter(f"comparacoes:{self.versao_dados}", self._calcular_comparacoes)
+    
+    def _calcular_comparacoes(self) -> Dict[str, Any]:
+        """
+        Receita, pedidos, clientes e ticket de todas as séries (total, canais, formas de pagamento e
+        categorias) em matrizes série × mês, com os valores de um mês e de doze meses antes
+        """
+        meses = self._codigos_periodo['mes']
+        n = len(meses)
+        relativo = (meses - meses[0]).astype(np.int64) if n else np.zeros(0, dtype=np.int64)
+        n_meses = int(relativo[-1]) + 1 if n else 0
+        
+        pedidos = self.df_pedidos.iloc[:n]
+        valores = np.nan_to_num(pedidos['valor_total'].to_numpy(dtype=float))
+        clientes = self._codigo_cliente_pedido[:n]
+        largura_pedidos, largura_clientes = max(n, 1), max(self._n_clientes_pedidos, 1)
+        
+        def empilhar(codigos, n_series, periodo, pesos, pedido, cliente):
+            """Receita, pedidos distintos e clientes distintos por (série, mês)"""
+            tamanho = n_series * n_meses
+            validos = codigos >= 0
+            celula = codigos[validos].astype(np.int64) * n_meses + periodo[validos]
+            receita = np.bincount(celula, weights=pesos[validos], minlength=tamanho)
+            pares_pedido = np.unique(celula * largura_pedidos + pedido[validos])
+            contagem = np.bincount(pares_pedido // largura_pedidos, minlength=tamanho)
+            cliente = cliente[validos]
+            pares_cliente = np.unique(celula[cliente >= 0] * largura_clientes + cliente[cliente >= 0])
+            distintos = np.bincount(pares_cliente // largura_clientes, minlength=tamanho)
+            return np.stack([receita, contagem, distintos]).reshape(3, n_series, n_meses)
+        
+        # Pedidos: total, canal e forma de pagamento
+        posicoes = np.arange(n)
+        blocos = [('total', ['Total'], empilhar(np.zeros(n, dtype=np.int64), 1, relativo, valores, posicoes, clientes))]
+        for dimensao, coluna in (('canal', 'canal_venda'), ('forma_pagamento', 'forma_pagamento')):
+            codigos, nomes = pd.factorize(pedidos[coluna])
+            blocos.append((dimensao, list(nomes), empilhar(codigos, len(nomes), relativo, valores, posicoes, clientes)))
+        
+        # Itens: categoria do cadastro; mês, pedido e cliente herdados do pedido
+        fim_itens = self._inicio_itens[n]
+        itens = self.df_vendas.iloc[:fim_itens]
+        posicao = self._posicao_pedido_item[:fim_itens]
+        categoria_produto = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')['categoria']
+        codigos, nomes = pd.factorize(itens['id_produto'].map(categoria_produto))
+        blocos.append(('categoria', list(nomes), empilhar(
+            codigos, len(nomes), relativo[posicao], itens['subtotal'].to_numpy(dtype=float), posicao, clientes[posicao]
+        )))
+        
+        receita, contagem, distintos = (np.vstack([bloco[2][i] for bloco in blocos]) for i in range(3))
+        ticket = np.divide(receita, contagem, out=np.full(receita.shape, np.nan), where=contagem > 0)
+        matrizes = np.stack([receita, contagem, distintos, ticket])
+        
+        def defasar(lag):
+            """Valor de lag meses antes (NaN antes do início do histórico)"""
+            defasado = np.full(matrizes.shape, np.nan)
+            if lag < n_meses:
+                defasado[:, :, lag:] = matrizes[:, :, :-lag]
+            return defasado
+        
+        return {
+            'rotulos': pd.DataFrame({
+                'dimensao': [dimensao for dimensao, nomes, _ in blocos for _ in nomes],
+                'serie': [nome for _, nomes, _ in blocos for nome in nomes],
+            }),
+            'meses': np.arange(n_meses, dtype=np.int64) + (int(meses[0]) if n else 0),
+            'valores': matrizes,
+            'mes_anterior': defasar(1),
+            'ano_anterior': defasar(12),
+        }
+    
+    def analise_vendas_periodo(self, inicio=None, fim=None, granularidade: str = 'mes',
+                               formatar: bool = True, aproximado: bool = False) -> pd.DataFrame:
+        """
+        Receita, pedidos, itens, clientes únicos e ticket médio por período entre inicio e fim (inclusive)
+
+        Com aproximado=True os clientes únicos vêm de um HyperLogLog por período (coluna erro_clientes_unicos)
+        """
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade '{granularidade}' inválida. Use: {', '.join(GRANULARIDADES)}")
+        
+        # fim é inclusivo: considera o dia inteiro
+        fim_exclusivo = None if fim is None else pd.Timestamp(fim).normalize() + pd.Timedelta(days=1)
+        i, j = self._posicoes_periodo(inicio, fim_exclusivo)
+        colunas = ['periodo', 'rotulo', 'receita', 'pedidos', 'itens', 'clientes_unicos', 'ticket_medio']
+        if i == j:
+            return pd.DataFrame(columns=colunas)
+        
+        # Códigos relativos ao primeiro período do intervalo (pedidos já estão ordenados por data)
+        codigos = self._codigos_periodo[granularidade][i:j]
+        relativo = codigos - codigos[0]
+        n_periodos = int(relativo[-1]) + 1
+        
+        valores = self.df_pedidos['valor_total'].to_numpy(dtype=float)[i:j]
+        receita = np.bincount(relativo, weights=valores, minlength=n_periodos)
+        pedidos = np.bincount(relativo, minlength=n_periodos)
+        
+        # Itens herdam o período do pedido (fatia contígua de df_vendas)
+        a, b = self._inicio_itens[i], self._inicio_itens[j]
+        periodo_item = relativo[self._posicao_pedido_item[a:b] - i]
+        quantidades = self.df_vendas['quantidade'].to_numpy(dtype=float)[a:b]
+        itens = np.bincount(periodo_item, weights=quantidades, minlength=n_periodos)
+        
+        # Clientes únicos: pares (período, cliente) distintos, ou um sketch por período
+        if aproximado:
+            registros = HyperLogLog.por_grupo(relativo.astype(np.int64), n_periodos,
+                                              self._codigo_cliente_pedido[i:j], PRECISAO_HLL)
+            clientes = np.round(estimar_registros(registros)).astype(np.int64)
+        else:
+            chave = relativo.astype(np.int64) * self._n_clientes_pedidos + self._codigo_cliente_pedido[i:j]
+            clientes = np.bincount(np.unique(chave) // self._n_clientes_pedidos, minlength=n_periodos)
+        
+        inicios = self._inicio_do_periodo(np.arange(n_periodos) + codigos[0], granularidade)
+        analise = pd.DataFrame({
+            'periodo': inicios,
+            'rotulo': self._rotular_periodos(inicios, granularidade),
+            'receita': receita,
+            'pedidos': pedidos,
+            'itens': itens.astype(np.int64),
+            'clientes_unicos': clientes,
+            'ticket_medio': np.round(np.divide(receita, pedidos, out=np.zeros(n_periodos), where=pedidos > 0), 2)
+        })
+        if aproximado:
+            analise['erro_clientes_unicos'] = _formatar_erro(HyperLogLog(PRECISAO_HLL).erro_relativo)
+        
+        if formatar:
+            analise['receita'] = analise['receita'].apply(formatar_moeda)
+            analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
+        return analise
+    
+    def analise_vendas_por_canal(self, aproximado: bool = False) -> pd.DataFrame:
+        """Análise de vendas por canal (Instagram vs Loja Física; aproximado: clientes únicos por HyperLogLog)"""
+        analise = self._agregar_pedidos('canal_venda', aproximado)
         analise['ticket_medio'] = (analise['valor_total'] / analise['total_pedidos']).round(2)
         analise['percentual_pedidos'] = (analise['total_pedidos'] / analise['total_pedidos'].sum() * 100).round(2)
         analise['percentual_valor'] = (analise['valor_total'] / analise['valor_total'].sum() * 100).round(2)
@@ -322,6 +1282,8 @@ class AnaliseDados:
         analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
         analise['percentual_pedidos'] = analise['percentual_pedidos'].apply(lambda x: f"{x:.2f}%")
         analise['percentual_valor'] = analise['percentual_valor'].apply(lambda x: f"{x:.2f}%")
+        if aproximado:
+            analise['erro_clientes_unicos'] = _formatar_erro(HyperLogLog(PRECISAO_HLL).erro_relativo)
         return analise
     
     def analise_vendas_canal_por_mes(self) -> pd.DataFrame:
@@ -335,14 +1297,9 @@ class AnaliseDados:
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         return analise
     
-    def analise_vendas_por_forma_pagamento(self) -> pd.DataFrame:
-        """Análise de vendas por forma de pagamento"""
-        analise = self.df_pedidos.groupby('forma_pagamento').agg({
-            'id_pedido': 'count',
-            'valor_total': 'sum',
-            'id_cliente': 'nunique'
-        }).reset_index()
-        analise.columns = ['forma_pagamento', 'total_pedidos', 'valor_total', 'clientes_unicos']
+    def analise_vendas_por_forma_pagamento(self, aproximado: bool = False) -> pd.DataFrame:
+        """Análise de vendas por forma de pagamento (aproximado: clientes únicos por HyperLogLog)"""
+        analise = self._agregar_pedidos('forma_pagamento', aproximado)
         analise['ticket_medio'] = (analise['valor_total'] / analise['total_pedidos']).round(2)
         analise['percentual_pedidos'] = (analise['total_pedidos'] / analise['total_pedidos'].sum() * 100).round(2)
         analise['percentual_valor'] = (analise['valor_total'] / analise['valor_total'].sum() * 100).round(2)
@@ -351,13 +1308,15 @@ class AnaliseDados:
         analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
         analise['percentual_pedidos'] = analise['percentual_pedidos'].apply(lambda x: f"{x:.2f}%")
         analise['percentual_valor'] = analise['percentual_valor'].apply(lambda x: f"{x:.2f}%")
+        if aproximado:
+            analise['erro_clientes_unicos'] = _formatar_erro(HyperLogLog(PRECISAO_HLL).erro_relativo)
         return analise
     
-    def analise_vendas_por_representante(self) -> pd.DataFrame:
-        """Análise de média de vendas por representante (baseado em clientes atendidos)"""
+    def analise_vendas_por_representante(self, aproximado: bool = False) -> pd.DataFrame:
+        """Análise de média de vendas por representante (baseado em clientes atendidos; aproximado: mediana por DDSketch)"""
         # Identificar possíveis representantes nos dados de clientes ou pedidos
         # Como não temos coluna de representante explícita, vamos analisar por região/vendedor
-        analise = self.df_completo.groupby(['id_cliente', 'nome']).agg({
+        analise = self.visao('clientes').groupby(['id_cliente', 'nome']).agg({
             'id_pedido': 'nunique',
             'subtotal': 'sum',
             'quantidade': 'sum'
@@ -367,7 +1326,10 @@ class AnaliseDados:
         
         # Estatísticas gerais
         media_valor = analise['valor_total'].mean()
-        mediana_valor = analise['valor_total'].median()
+        if aproximado:
+            mediana_valor = DDSketch(ERRO_QUANTIL).adicionar(analise['valor_total']).mediana()
+        else:
+            mediana_valor = analise['valor_total'].median()
         media_ticket = analise['ticket_medio'].mean()
         
         stats = {
@@ -376,40 +1338,39 @@ class AnaliseDados:
             'media_pedidos_cliente': f"{analise['total_pedidos'].mean():.2f}",
             'media_ticket': formatar_moeda(media_ticket)
         }
+        if aproximado:
+            stats['erro_mediana'] = _formatar_erro(ERRO_QUANTIL)
         
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
         
         return analise, stats
     
-    def analise_total_vendas_geral(self, ano: int = None, mes: int = None) -> Dict[str, Any]:
-        """Análise consolidada de vendas (com filtro opcional por ano e mês)"""
+    def analise_total_vendas_geral(self, ano: int = None, mes: int = None, aproximado: bool = False) -> Dict[str, Any]:
+        """Análise consolidada de vendas (com filtro opcional por ano e mês; aproximado: clientes por sketch mensal)"""
         # Filtrar dados se ano/mês fornecidos
-        df_pedidos = self.df_pedidos.copy()
-        df_vendas = self.df_vendas.copy()
+        df_pedidos = self.df_pedidos
+        df_vendas = self.df_vendas
         
+        # Pedidos e itens do período são fatias contíguas (mês só é aplicado junto com o ano)
         if ano is not None:
-            df_pedidos = df_pedidos[df_pedidos['ano'] == ano]
-            # Filtrar vendas pelos pedidos do ano
-            pedidos_ids = df_pedidos['id_pedido'].unique()
-            df_vendas = df_vendas[df_vendas['id_pedido'].isin(pedidos_ids)]
-        
-        if mes is not None and ano is not None:
-            df_pedidos = df_pedidos[df_pedidos['mes'] == mes]
-            # Filtrar vendas pelos pedidos do mês
-            pedidos_ids = df_pedidos['id_pedido'].unique()
-            df_vendas = df_vendas[df_vendas['id_pedido'].isin(pedidos_ids)]
+            df_pedidos, df_vendas = self._fatiar_periodo(*self._intervalo_ano_mes(ano, mes))
         
         # Calcular métricas
         total_vendas = df_pedidos['valor_total'].sum()
         total_pedidos = len(df_pedidos)
         total_itens = df_vendas['quantidade'].sum() if len(df_vendas) > 0 else 0
         ticket_medio = df_pedidos['valor_total'].mean() if total_pedidos > 0 else 0
-        clientes_unicos = df_pedidos['id_cliente'].nunique()
+        if aproximado:
+            inicio, fim = self._intervalo_ano_mes(ano, mes) if ano is not None else (None, None)
+            estimativa = self.clientes_unicos_aproximados(inicio, fim)
+            clientes_unicos = estimativa['clientes_unicos']
+        else:
+            clientes_unicos = df_pedidos['id_cliente'].nunique()
         produtos_diferentes = df_vendas['id_produto'].nunique() if len(df_vendas) > 0 else 0
         media_itens = (total_itens / total_pedidos) if total_pedidos > 0 else 0
         
-        return {
+        resultado = {
             'valor_total_vendas': formatar_moeda(total_vendas),
             'total_pedidos': total_pedidos,
             'total_itens_vendidos': int(total_itens),
@@ -418,11 +1379,126 @@ class AnaliseDados:
             'produtos_diferentes_vendidos': produtos_diferentes,
             'media_itens_por_pedido': f"{media_itens:.2f}"
         }
+        if aproximado:
+            resultado['erro_clientes_unicos'] = _formatar_erro(estimativa['erro_relativo'])
+        return resultado
+    
+    def analise_decomposicao_receita(self, dimensao: str = 'categoria', top_n: int = None,
+                                     formatar: bool = True) -> pd.DataFrame:
+        """Receita bruta (quantidade × preço unitário), desconto e receita líquida por produto, categoria, canal ou mês"""
+        if dimensao not in DIMENSOES_DECOMPOSICAO:
+            raise ValueError(f"Dimensão '{dimensao}' inválida. Use: {', '.join(DIMENSOES_DECOMPOSICAO)}")
+        decomposicao = self._obter(f"decomposicao:{self.versao_dados}", self._calcular_decomposicao)
+        analise = decomposicao[dimensao]
+        analise = analise.copy() if dimensao == 'periodo' else selecionar_top(analise, 'receita_liquida', top_n)
+        
+        if formatar:
+            for coluna in ['receita_bruta', 'desconto', 'receita_liquida']:
+                analise[coluna] = analise[coluna].apply(formatar_moeda)
+            analise['percentual_desconto'] = analise['percentual_desconto'].apply(lambda x: f"{x:.2f}%")
+        return analise
+    
+    def analise_conciliacao_pedidos(self, apenas_divergentes: bool = True, tolerancia: float = 0.01,
+                                    formatar: bool = True) -> pd.DataFrame:
+        """Confere, por pedido, o Valor Total contra a soma dos subtotais dos itens"""
+        conciliacao = self._obter(f"decomposicao:{self.versao_dados}", self._calcular_decomposicao)['pedidos'].copy()
+        conciliacao['status'] = np.select(
+            [conciliacao['itens'] == 0, conciliacao['diferenca'].abs() <= tolerancia],
+            ['sem_itens', 'ok'], default='divergente'
+        )
+        if apenas_divergentes:
+            conciliacao = conciliacao[conciliacao['status'] != 'ok'].reset_index(drop=True)
+        
+        if formatar:
+            for coluna in ['valor_total', 'soma_subtotais', 'diferenca']:
+                conciliacao[coluna] = conciliacao[coluna].apply(formatar_moeda)
+        return conciliacao
+    
+    def _calcular_decomposicao(self) -> Dict[str, pd.DataFrame]:
+        """
+        Decompõe a receita dos itens em uma passada: as colunas bruto/desconto/líquido são calculadas
+        uma vez e cada dimensão é um bincount sobre um código inteiro por item
+        """
+        vendas = self.df_vendas
+        quantidade = vendas['quantidade'].to_numpy(dtype=float)
+        bruto = quantidade * vendas['preco_unitario'].to_numpy(dtype=float)
+        desconto = vendas['desconto'].to_numpy(dtype=float)
+        liquido = vendas['subtotal'].to_numpy(dtype=float)
+        pesos = {'receita_bruta': bruto, 'desconto': desconto, 'receita_liquida': liquido, 'qtd_itens': quantidade}
+        
+        def somar(codigos, n):
+            validos = codigos >= 0
+            colunas = {nome: np.bincount(codigos[validos], weights=valores[validos], minlength=n)
+                       for nome, valores in pesos.items()}
+            colunas['linhas_divergentes'] = np.bincount(codigos[validos & divergente], minlength=n)
+            analise = pd.DataFrame(colunas)
+            analise['qtd_itens'] = analise['qtd_itens'].astype(np.int64)
+            analise['percentual_desconto'] = np.round(np.divide(
+                analise['desconto'], analise['receita_bruta'],
+                out=np.zeros(n), where=analise['receita_bruta'].to_numpy() > 0) * 100, 2)
+            return analise
+        
+        # Linhas em que bruto - desconto não bate com o subtotal gravado
+        divergente = np.abs(bruto - desconto - liquido) > 0.01
+        
+        # Produto e categoria: código por item
+        codigos_produto, produtos = pd.factorize(vendas['id_produto'])
+        cadastro = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')
+        por_produto = somar(codigos_produto, len(produtos))
+        por_produto.insert(0, 'id_produto', np.asarray(produtos))
+        por_produto.insert(1, 'nome_produto', por_produto['id_produto'].map(cadastro['nome_produto']))
+        
+        codigos_categoria, categorias = pd.factorize(vendas['id_produto'].map(cadastro['categoria']).fillna('Sem categoria'))
+        por_categoria = somar(codigos_categoria, len(categorias))
+        por_categoria.insert(0, 'categoria', np.asarray(categorias))
+        
+        # Canal e mês: o item herda o código do seu pedido (itens sem pedido ficam com -1)
+        n_pedidos = len(self.df_pedidos)
+        posicao = self._posicao_pedido_item
+        codigos_canal, canais = pd.factorize(self.df_pedidos['canal_venda'])
+        codigos_canal = np.append(codigos_canal, -1)[posicao]
+        por_canal = somar(codigos_canal, len(canais))
+        por_canal.insert(0, 'canal_venda', np.asarray(canais))
+        
+        meses = self._codigos_periodo['mes']
+        if len(meses):
+            relativo = np.full(n_pedidos + 1, -1, dtype=np.int64)
+            relativo[:len(meses)] = meses - meses[0]
+            n_meses = int(meses[-1] - meses[0]) + 1
+            por_periodo = somar(relativo[posicao], n_meses)
+            inicios = self._inicio_do_periodo(np.arange(n_meses) + meses[0], 'mes')
+            por_periodo.insert(0, 'periodo', inicios)
+            por_periodo.insert(1, 'rotulo', self._rotular_periodos(inicios, 'mes'))
+        else:
+            por_periodo = somar(np.empty(0, dtype=np.int64), 0)
+            por_periodo.insert(0, 'periodo', pd.DatetimeIndex([]))
+            por_periodo.insert(1, 'rotulo', [])
+        
+        # Conciliação por pedido: itens são contíguos, então a soma por pedido é um bincount da posição
+        soma_subtotais = np.bincount(posicao, weights=liquido, minlength=n_pedidos + 1)[:n_pedidos]
+        itens = np.diff(self._inicio_itens)[:n_pedidos]
+        valor_total = self.df_pedidos['valor_total'].to_numpy(dtype=float)
+        pedidos = pd.DataFrame({
+            'id_pedido': self.df_pedidos['id_pedido'].to_numpy(),
+            'data_pedido': self.df_pedidos['data_pedido'].to_numpy(),
+            'itens': itens,
+            'valor_total': valor_total,
+            'soma_subtotais': soma_subtotais,
+            'diferenca': np.round(valor_total - soma_subtotais, 2),
+        })
+        
+        return {
+            'produto': por_produto.sort_values('receita_liquida', ascending=False, kind='mergesort').reset_index(drop=True),
+            'categoria': por_categoria.sort_values('receita_liquida', ascending=False, kind='mergesort').reset_index(drop=True),
+            'canal': por_canal.sort_values('receita_liquida', ascending=False, kind='mergesort').reset_index(drop=True),
+            'periodo': por_periodo,
+            'pedidos': pedidos,
+        }
     
     def analise_top3_por_segmento(self) -> pd.DataFrame:
         """Top 3 produtos de cada segmento com valor total de vendas"""
         # Agrupar por categoria e produto
-        df_ranking = self.df_completo.groupby(['categoria', 'id_produto', 'nome_produto']).agg({
+        df_ranking = self.visao('produtos').groupby(['categoria', 'id_produto', 'nome_produto']).agg({
             'quantidade': 'sum',
             'subtotal': 'sum'
         }).reset_index()
@@ -446,36 +1522,217 @@ class AnaliseDados:
         
         return top3
     
-    def analise_sazonalidade(self) -> pd.DataFrame:
-        """Análise de sazonalidade das vendas por mês e ano"""
-        analise = self.df_pedidos.groupby(['ano', 'mes']).agg({
-            'valor_total': ['sum', 'mean', 'count'],
-            'id_cliente': 'nunique'
-        }).reset_index()
+    def analise_sazonalidade(self, formatar: bool = True) -> pd.DataFrame:
+        """Análise de sazonalidade das vendas por mês e ano (índice = receita do mês / média mensal do ano × 100)"""
+        perfil = self.perfil_sazonal
+        anos, meses = np.nonzero(perfil['presente'])
+        analise = pd.DataFrame({
+            'ano': perfil['anos'][anos],
+            'mes': meses + 1,
+            'valor_total': perfil['receita'][anos, meses],
+            'ticket_medio': perfil['ticket_medio'][anos, meses],
+            'total_pedidos': perfil['pedidos'][anos, meses],
+            'clientes_unicos': perfil['clientes'][anos, meses],
+            'mes_nome': np.asarray(NOMES_MESES, dtype=object)[meses],
+            'indice_sazonalidade': np.round(perfil['indice'][anos, meses], 2),
+        })
         
-        analise.columns = ['ano', 'mes', 'valor_total', 'ticket_medio', 'total_pedidos', 'clientes_unicos']
+        if formatar:
+            analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
+            analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
+            analise['indice_sazonalidade'] = analise['indice_sazonalidade'].apply(lambda x: f"{x:.2f}")
+        return analise
+    
+    def analise_perfil_sazonal(self, formatar: bool = True) -> pd.DataFrame:
+        """Perfil sazonal médio entre os anos: índice médio de cada mês com faixa de confiança de 95%"""
+        perfil = self.perfil_sazonal
+        analise = pd.DataFrame({
+            'mes': np.arange(1, 13),
+            'mes_nome': NOMES_MESES,
+            'indice_medio': perfil['indice_medio'],
+            'limite_inferior': perfil['limite_inferior'],
+            'limite_superior': perfil['limite_superior'],
+            'desvio_entre_anos': perfil['desvio'],
+            'anos_observados': perfil['anos_observados'],
+        })
         
-        # Adicionar nome do mês
-        meses = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho',
-                 7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
-        analise['mes_nome'] = analise['mes'].map(meses)
+        if formatar:
+            for coluna in ('indice_medio', 'limite_inferior', 'limite_superior', 'desvio_entre_anos'):
+                analise[coluna] = analise[coluna].apply(lambda x: f"{x:.2f}" if pd.notna(x) else "-")
+        return analise
+    
+    def matriz_sazonal(self, medida: str = 'receita') -> pd.DataFrame:
+        """Matriz mês × ano de uma medida do perfil sazonal ('receita', 'pedidos', 'clientes', 'ticket_medio' ou 'indice')"""
+        perfil = self.perfil_sazonal
+        if medida not in MEDIDAS_SAZONAIS:
+            raise ValueError(f"Medida '{medida}' inválida. Use: {', '.join(MEDIDAS_SAZONAIS)}")
+        return pd.DataFrame(perfil[medida].T, index=pd.Index(NOMES_MESES, name='mes_nome'),
+                            columns=pd.Index(perfil['anos'], name='ano'))
+    
+    @property
+    def perfil_sazonal(self) -> Dict[str, np.ndarray]:
+        """Matrizes ano × mês e perfil médio (cacheados por versão dos dados)"""
+        return self._obter(f"perfil_sazonal:{self.versao_dados}", self._calcular_perfil_sazonal)
+    
+    def _calcular_perfil_sazonal(self) -> Dict[str, np.ndarray]:
+        """
+        Receita, pedidos, clientes e ticket em matrizes ano × mês (um bincount por medida), índice
+        de sazonalidade normalizado pela média dos meses com pedidos de cada ano e perfil médio
+        entre os anos com faixa de confiança da média
+        """
+        meses = self._codigos_periodo['mes']
+        primeiro_ano = int(meses[0] // 12) if len(meses) else 0
+        n_anos = int(meses[-1] // 12) - primeiro_ano + 1 if len(meses) else 0
+        celula = (meses - primeiro_ano * 12).astype(np.int64)
+        formato, n_celulas = (n_anos, 12), n_anos * 12
         
-        # Calcular índice de sazonalidade por ano (média do mês / média geral do ano)
-        analise['indice_sazonalidade'] = analise.groupby('ano')['valor_total'].transform(
-            lambda x: (x / x.mean() * 100).round(2)
-        )
+        valores = np.nan_to_num(self.df_pedidos['valor_total'].to_numpy(dtype=float)[:len(meses)])
+        receita = np.bincount(celula, weights=valores, minlength=n_celulas).reshape(formato)
+        pedidos = np.bincount(celula, minlength=n_celulas).reshape(formato)
+        pares = np.unique(celula * self._n_clientes_pedidos + self._codigo_cliente_pedido[:len(meses)])
+        clientes = np.bincount(pares // max(self._n_clientes_pedidos, 1), minlength=n_celulas).reshape(formato)
         
-        # Ordenar por ano e mês
-        analise = analise.sort_values(['ano', 'mes'])
+        # Normalização por ano: só os meses com pedidos entram na média (como no groupby por ano/mês)
+        presente = pedidos > 0
+        meses_ano = presente.sum(axis=1, keepdims=True)
+        media_ano = np.divide(receita.sum(axis=1, keepdims=True), meses_ano,
+                              out=np.full((n_anos, 1), np.nan), where=meses_ano > 0)
+        indice = np.full(formato, np.nan)
+        np.divide(receita * 100, media_ano, out=indice, where=presente & (media_ano > 0))
         
-        analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
-        analise['ticket_medio'] = analise['ticket_medio'].apply(formatar_moeda)
-        analise['indice_sazonalidade'] = analise['indice_sazonalidade'].apply(lambda x: f"{x:.2f}")
+        # Perfil médio entre anos e faixa de confiança da média (z · desvio / √anos)
+        anos_observados = np.isfinite(indice).sum(axis=0)
+        soma = np.nansum(indice, axis=0)
+        indice_medio = np.divide(soma, anos_observados, out=np.full(12, np.nan), where=anos_observados > 0)
+        desvios = np.where(np.isfinite(indice), indice - indice_medio, 0.0)
+        desvio = np.sqrt(np.divide((desvios ** 2).sum(axis=0), anos_observados - 1,
+                                   out=np.full(12, np.nan), where=anos_observados > 1))
+        margem = Z_PERFIL_SAZONAL * np.divide(desvio, np.sqrt(np.maximum(anos_observados, 1)))
+        
+        return {
+            'anos': np.arange(primeiro_ano, primeiro_ano + n_anos) + 1970,
+            'receita': receita,
+            'pedidos': pedidos,
+            'clientes': clientes,
+            'ticket_medio': np.divide(receita, pedidos, out=np.zeros(formato), where=presente),
+            'presente': presente,
+            'indice': indice,
+            'indice_medio': indice_medio,
+            'desvio': desvio,
+            'limite_inferior': np.maximum(indice_medio - margem, 0),
+            'limite_superior': indice_medio + margem,
+            'anos_observados': anos_observados,
+        }
+    
+    def analise_previsao_vendas(self, horizonte: int = 6, dimensao: str = None,
+                                formatar: bool = True) -> pd.DataFrame:
+        """Previsão de receita dos próximos meses (total, por categoria e por canal) com faixa de confiança"""
+        if dimensao is not None and dimensao not in DIMENSOES_PREVISAO:
+            raise ValueError(f"Dimensão '{dimensao}' inválida. Use: {', '.join(DIMENSOES_PREVISAO)}")
+        horizonte = max(1, min(int(horizonte), HORIZONTE_MAXIMO_PREVISAO))
+        
+        previsoes = self._obter(f"previsao:{self.versao_dados}", self._calcular_previsoes)
+        analise = previsoes[previsoes['passo'] <= horizonte]
+        if dimensao is not None:
+            analise = analise[analise['dimensao'] == dimensao]
+        analise = analise.drop(columns='passo').reset_index(drop=True)
+        
+        if formatar:
+            for coluna in ['previsao', 'limite_inferior', 'limite_superior']:
+                analise[coluna] = analise[coluna].apply(formatar_moeda)
+        return analise
+    
+    def _series_mensais(self):
+        """Receita mensal empilhada (total, categorias e canais) na linha do tempo dos pedidos datados"""
+        meses = self._codigos_periodo['mes']
+        if len(meses) == 0:
+            return pd.DataFrame(columns=['dimensao', 'serie']), np.empty((0, 0)), None
+        relativo = meses - meses[0]
+        n_meses = int(relativo[-1]) + 1
+        
+        def empilhar(codigos, n_series, periodo, pesos):
+            validos = codigos >= 0
+            chave = codigos[validos].astype(np.int64) * n_meses + periodo[validos]
+            return np.bincount(chave, weights=pesos[validos], minlength=n_series * n_meses).reshape(n_series, n_meses)
         
+        # Pedidos: total e canal
+        pedidos = self.df_pedidos.iloc[:len(meses)]
+        valores = pedidos['valor_total'].to_numpy(dtype=float)
+        canais, nomes_canais = pd.factorize(pedidos['canal_venda'])
+        
+        # Itens herdam o mês do pedido; categoria vem do cadastro de produtos
+        fim_itens = self._inicio_itens[len(meses)]
+        itens = self.df_vendas.iloc[:fim_itens]
+        categoria_produto = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')['categoria']
+        categorias, nomes_categorias = pd.factorize(itens['id_produto'].map(categoria_produto))
+        
+        matriz = np.vstack([
+            np.bincount(relativo, weights=valores, minlength=n_meses)[None, :],
+            empilhar(categorias, len(nomes_categorias), relativo[self._posicao_pedido_item[:fim_itens]],
+                     itens['subtotal'].to_numpy(dtype=float)),
+            empilhar(canais, len(nomes_canais), relativo, valores),
+        ])
+        rotulos = pd.DataFrame({
+            'dimensao': ['total'] + ['categoria'] * len(nomes_categorias) + ['canal'] * len(nomes_canais),
+            'serie': ['Total'] + list(nomes_categorias) + list(nomes_canais),
+        })
+        return rotulos, matriz, meses[0]
+    
+    def _calcular_previsoes(self) -> pd.DataFrame:
+        """Ajusta todas as séries mensais numa única passada e guarda a previsão até o horizonte máximo"""
+        rotulos, matriz, primeiro_mes = self._series_mensais()
+        colunas = ['dimensao', 'serie', 'passo', 'periodo', 'rotulo', 'previsao', 'limite_inferior', 'limite_superior']
+        if len(rotulos) == 0:
+            return pd.DataFrame(columns=colunas)
+        
+        h = HORIZONTE_MAXIMO_PREVISAO
+        previsao, desvio = holt_winters(matriz, h)
+        previsao = np.maximum(previsao, 0)
+        inferior, superior = intervalo_previsao(previsao, desvio)
+        
+        inicios = self._inicio_do_periodo(primeiro_mes + matriz.shape[1] + np.arange(h), 'mes')
+        n_series = len(rotulos)
+        return pd.DataFrame({
+            'dimensao': np.repeat(rotulos['dimensao'].to_numpy(), h),
+            'serie': np.repeat(rotulos['serie'].to_numpy(), h),
+            'passo': np.tile(np.arange(1, h + 1), n_series),
+            'periodo': np.tile(inicios, n_series),
+            'rotulo': np.tile(self._rotular_periodos(inicios, 'mes'), n_series),
+            'previsao': previsao.ravel().round(2),
+            'limite_inferior': inferior.ravel().round(2),
+            'limite_superior': superior.ravel().round(2),
+        })[colunas]
+    
+    @property
+    def detector_anomalias(self) -> DetectorAnomalias:
+        """Detector EWMA do faturamento diário, inicializado com o histórico e alimentado pelos pedidos novos"""
+        return self._obter(f"anomalias:{self.versao_dados}", lambda: DetectorAnomalias.a_partir_de_pedidos(self.df_pedidos))
+    
+    def registrar_pedido(self, data_pedido, valor_total: float, forma_pagamento: str = None,
+                         canal_venda: str = None):
+        """Repassa um pedido recém-gravado ao detector de anomalias (único estado que muda no snapshot)"""
+        # Pedidos ainda não carregados virão do banco já com o pedido novo: registrar contaria em dobro
+        if 'pedidos' not in self._cache:
+            return
+        self.detector_anomalias.registrar_pedido(data_pedido, valor_total, forma_pagamento, canal_venda)
+    
+    def analise_anomalias_vendas(self, dias: int = 30, formatar: bool = True) -> pd.DataFrame:
+        """Dias com faturamento fora da faixa esperada (total, canal e forma de pagamento) nos últimos dias"""
+        detector = self.detector_anomalias
+        situacao = detector.situacao()
+        desde = None
+        if not situacao.empty and dias is not None:
+            desde = situacao['dia'].max() - np.timedelta64(int(dias), 'D')
+        analise = detector.listar_alertas(desde)
+        
+        if formatar:
+            for coluna in ['valor', 'esperado', 'limite_inferior', 'limite_superior']:
+                analise[coluna] = analise[coluna].apply(formatar_moeda)
+            analise['dia'] = analise['dia'].dt.strftime('%d/%m/%Y')
         return analise
     
-    def analise_mix_produtos_por_pedido(self) -> pd.DataFrame:
-        """Análise do mix de produtos por pedido"""
+    def analise_mix_produtos_por_pedido(self, aproximado: bool = False) -> pd.DataFrame:
+        """Análise do mix de produtos por pedido (aproximado: medianas por DDSketch)"""
         analise = self.df_vendas.groupby('id_pedido').agg({
             'id_produto': 'count',
             'quantidade': 'sum',
@@ -486,97 +1743,159 @@ class AnaliseDados:
         # Estatísticas do mix
         media_valor = analise['valor_total'].mean()
         
+        if aproximado:
+            mediana_produtos = DDSketch(ERRO_QUANTIL).adicionar(analise['produtos_diferentes']).mediana()
+        else:
+            mediana_produtos = analise['produtos_diferentes'].median()
+        
         stats = {
             'media_produtos_por_pedido': f"{analise['produtos_diferentes'].mean():.2f}",
-            'mediana_produtos_por_pedido': f"{analise['produtos_diferentes'].median():.2f}",
+            'mediana_produtos_por_pedido': f"{mediana_produtos:.2f}",
             'media_quantidade_por_pedido': f"{analise['quantidade_total'].mean():.2f}",
             'media_valor_por_pedido': formatar_moeda(media_valor)
         }
+        if aproximado:
+            stats['erro_mediana'] = _formatar_erro(ERRO_QUANTIL)
         
         analise['valor_total'] = analise['valor_total'].apply(formatar_moeda)
         
         return analise, stats
     
-    def fechar_conexao(self):
-        """Fecha a conexão com o banco de dados"""
-        self.transformacao.fechar_conexao()
-    
-    def executar_todas_analises(self):
-        """Executa todas as análises e exibe os resultados"""
-        print("=" * 80)
-        print("ANÁLISES DE CLIENTES".center(80))
-        print("=" * 80)
-        
-        print("\n1. Distribuição por Sexo:")
-        print(self.analise_clientes_por_sexo())
-        
-        print("\n2. Distribuição por Região (Top 10):")
-        print(self.analise_clientes_por_regiao().head(10))
-        
-        print("\n3. Compras por Canal:")
-        print(self.analise_compras_por_canal_cliente().head(10))
-        
-        print("\n4. Top 20 Clientes Mais Valiosos:")
-        print(self.analise_clientes_mais_valiosos(20))
-        
-        print("\n" + "=" * 80)
-        print("ANÁLISES DE PRODUTOS".center(80))
-        print("=" * 80)
-        
-        print("\n5. Top 10 Produtos Mais Vendidos:")
-        print(self.analise_top_produtos_mais_vendidos(10))
-        
-        print("\n6. Vendas por Segmento:")
-        print(self.analise_vendas_por_segmento())
-        
-        print("\n7. Cores Mais Vendidas:")
-        print(self.analise_cores_mais_vendidas())
-        
-        print("\n8. Top 5 Cosméticos:")
-        print(self.analise_top_cosmeticos(5))
-        
-        print("\n9. Top 5 Cadeiras e Lavatórios:")
-        print(self.analise_top_cadeiras_lavatorios(5))
-        
-        print("\n" + "=" * 80)
-        print("ANÁLISES DE VENDAS".center(80))
-        print("=" * 80)
-        
-        print("\n10. Vendas por Ano:")
-        print(self.analise_vendas_por_ano())
-        
-        print("\n11. Vendas por Canal:")
-        print(self.analise_vendas_por_canal())
-        
-        print("\n12. Vendas por Forma de Pagamento:")
-        print(self.analise_vendas_por_forma_pagamento())
-        
-        print("\n13. Totais Gerais:")
-        totais = self.analise_total_vendas_geral()
-        for key, value in totais.items():
-            print(f"{key}: {value}")
-        
-        print("\n14. Top 3 por Segmento:")
-        print(self.analise_top3_por_segmento())
+    def analise_cesta_produtos(self, top_n: int = 10, ordenar_por: str = 'pedidos_juntos',
+                               suporte_minimo: int = 2, formatar: bool = True) -> pd.DataFrame:
+        """Pares de produtos mais comprados juntos (suporte, confiança e lift) para combos e cross-sell"""
+        pares = self._obter(
+            f"cesta:{suporte_minimo}:{self.versao_dados}",
+            lambda: pares_de_produtos(self.df_vendas['id_pedido'], self.df_vendas['id_produto'], suporte_minimo)
+        )
+        if ordenar_por not in ('pedidos_juntos', 'suporte', 'lift', 'confianca_a_b'):
+            raise ValueError("ordenar_por deve ser 'pedidos_juntos', 'suporte', 'lift' ou 'confianca_a_b'")
         
-        print("\n15. Sazonalidade por Ano e Mês:")
-        df_sazonalidade = self.analise_sazonalidade()
+        analise = selecionar_top(pares, ordenar_por, top_n)
+        nomes = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')['nome_produto']
+        analise.insert(1, 'produto_a', analise['id_produto_a'].map(nomes))
+        analise.insert(3, 'produto_b', analise['id_produto_b'].map(nomes))
+        analise['lift'] = analise['lift'].round(2)
         
-        # Exibir de forma organizada por ano
-        anos_disponiveis = df_sazonalidade['ano'].unique()
-        for ano in sorted(anos_disponiveis):
-            if pd.notna(ano):
-                print(f"\n--- Ano {int(ano)} ---")
-                df_ano = df_sazonalidade[df_sazonalidade['ano'] == ano]
-                print(df_ano.to_string(index=False))
+        if formatar:
+            for coluna in ['suporte', 'confianca_a_b', 'confianca_b_a']:
+                analise[coluna] = (analise[coluna] * 100).apply(lambda x: f"{x:.2f}%")
+        return analise
+    
+    @property
+    def indice_recomendacao(self) -> IndiceRecomendacao:
+        """Índice "comprados juntos" da versão de dados atual"""
+        return self._obter(f"recomendacao:{self.versao_dados}", self._construir_indice_recomendacao)
+    
+    def herdar_indices(self, anterior: 'AnaliseDados'):
+        """Reaproveita índices já construídos por um snapshot anterior para atualizá-los incrementalmente"""
+        indice = anterior._cache.get(f"recomendacao:{anterior.versao_dados}")
+        if indice is not None:
+            self._indices_herdados['recomendacao'] = indice
+    
+    def _construir_indice_recomendacao(self) -> IndiceRecomendacao:
+        """Atualiza o índice herdado com os pedidos novos ou, se o histórico mudou, reconstrói do zero"""
+        vendas = self.df_vendas
+        anterior = self._indices_herdados.pop('recomendacao', None)
+        if anterior is not None:
+            ja_indexados = vendas['id_pedido'].isin(anterior.pedidos).to_numpy()
+            antigos = vendas[ja_indexados]
+            # Só é incremental se as linhas dos pedidos já indexados não mudaram
+            if anterior.cobre(antigos['id_pedido'], antigos['id_produto']):
+                novos = vendas[~ja_indexados]
+                return anterior.atualizar(novos['id_pedido'], novos['id_produto'])
+        return IndiceRecomendacao.construir(vendas['id_pedido'], vendas['id_produto'])
+    
+    def recomendar_produtos(self, id_produto: int, top_n: int = 5, formatar: bool = True) -> pd.DataFrame:
+        """Produtos mais comprados junto com o produto informado (consulta ao índice pré-calculado)"""
+        analise = self.indice_recomendacao.consultar(id_produto, top_n)
+        produtos = self.df_produtos.drop_duplicates('id_produto').set_index('id_produto')
+        analise.insert(1, 'nome_produto', analise['id_produto'].map(produtos['nome_produto']))
+        analise.insert(2, 'categoria', analise['id_produto'].map(produtos['categoria']))
+        analise['lift'] = analise['lift'].astype(float).round(2)
         
-        print("\n" + "=" * 80)
+        if formatar:
+            analise['confianca'] = (analise['confianca'] * 100).apply(lambda x: f"{x:.2f}%")
+        return analise
+    
+    # ==================== CONSULTAS DECLARATIVAS ====================
+    
+    def consulta(self, metricas, por=None, onde: Dict[str, Any] = None, top: int = None,
+                 ordenar_por: str = None, motor: str = None, formatar: bool = True) -> pd.DataFrame:
+        """
+        Consulta declarativa sobre os itens vendidos, sem método dedicado por pergunta
+
+        Args:
+            metricas: Métricas (METRICAS_CONSULTA), ex.: ['receita', 'pedidos']
+            por: Dimensões de agrupamento (DIMENSOES_CONSULTA), ex.: ['canal_venda', 'ano']
+            onde: Filtros {dimensão: valor | [valores] | {operador: valor}}; 'data_pedido' aceita
+                {'>=': '2024-01-01', '<': '2024-07-01'} ou [início, fim]
+            top: Mantém só os top grupos por ordenar_por
+            ordenar_por: Métrica de ordenação decrescente (padrão: a primeira, quando há top)
+            motor: 'pandas' (kernels numpy) ou 'duckdb' (SQL embutido); padrão: motor_consulta
+
+        Returns:
+            DataFrame com as dimensões de por e uma coluna por métrica (resultado em cache por versão)
+        """
+        metricas = [metricas] if isinstance(metricas, str) else list(metricas)
+        por = [por] if isinstance(por, str) else list(por or [])
+        onde = dict(onde or {})
+        validar_consulta(metricas, por, onde)
+        if ordenar_por is None and top is not None:
+            ordenar_por = metricas[0]
+        if ordenar_por is not None and ordenar_por not in metricas:
+            raise ValueError(f"ordenar_por deve ser uma das métricas: {', '.join(metricas)}")
+        motor = motor or self.motor_consulta
+        if motor not in MOTORES_CONSULTA:
+            raise ValueError(f"Motor '{motor}' inválido. Use: {', '.join(MOTORES_CONSULTA)}")
+    
+        assinatura = assinatura_consulta(metricas, por, onde, top, ordenar_por)
+        analise = self._obter(f"consulta:{motor}:{assinatura}:{self.versao_dados}",
+                              lambda: self._executar_consulta(metricas, por, onde, top, ordenar_por, motor)).copy()
+    
+        if formatar:
+            for metrica in metricas:
+                if metrica in METRICAS_MOEDA:
+                    analise[metrica] = analise[metrica].apply(formatar_moeda)
+        return analise
+    
+    def _executar_consulta(self, metricas, por, onde, top, ordenar_por, motor) -> pd.DataFrame:
+        """Executa a consulta no motor escolhido e aplica ordenação e top"""
+        if motor == 'duckdb':
+            analise = executar_consulta_sql(self, self.motor_sql, metricas, por, onde)
+        else:
+            analise = executar_consulta(self, metricas, por, onde)
+        if ordenar_por is not None:
+            analise = selecionar_top(analise, ordenar_por, top).reset_index(drop=True)
+        return analise
+    
+    @property
+    def motor_sql(self) -> MotorSQL:
+        """Conexão DuckDB com as tabelas desta versão dos dados (criada no primeiro uso)"""
+        return self._obter(f"motor_sql:{self.versao_dados}", lambda: MotorSQL(self))
+    
+    def _dimensao_consulta(self, dimensao: str):
+        """(código por item, rótulos) da dimensão, calculados uma vez por versão dos dados"""
+        return self._obter(f"consulta_dimensao:{dimensao}:{self.versao_dados}",
+                           lambda: codificar_dimensao(self, dimensao))
+    
+    def fechar_conexao(self):
+        """Fecha a conexão com o banco de dados (se chegou a ser aberta)"""
+        if self._transformacao is not None:
+            self._transformacao.fechar_conexao()
+    
+    def executar_todas_analises(self, max_workers: int = None) -> Dict[str, Any]:
+        """Executa todas as análises em paralelo, exibe os resultados com o tempo de cada uma e retorna o relatório"""
+        relatorio = executar_relatorio(self, max_workers=max_workers)
+        imprimir_relatorio(relatorio)
+        return relatorio
 
 
 # Exemplo de uso
 if __name__ == "__main__":
     # Criar instância da análise
     analise = AnaliseDados()
+    analise.carregar_tudo()
     
     # Executar todas as análises
     analise.executar_todas_analises()
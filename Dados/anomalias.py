@@ -0,0 +1,156 @@
+"""
+Detecção de anomalias no faturamento diário
+Médias e variâncias móveis exponenciais (EWMA) por canal e forma de pagamento,
+atualizadas em O(1) a cada pedido novo
+"""
+import threading
+import numpy as np
+import pandas as pd
+
+
+# Séries acompanhadas: (dimensão, coluna do pedido); 'total' soma todos os pedidos
+DIMENSOES_ANOMALIA = (('total', None), ('canal', 'canal_venda'), ('forma_pagamento', 'forma_pagamento'))
+
+
+class _EstadoSerie:
+    """Estado EWMA de uma série: dia em aberto e estatísticas dos dias já fechados"""
+
+    __slots__ = ('dia', 'valor', 'media', 'variancia', 'dias_observados')
+
+    def __init__(self):
+        self.dia = None
+        self.valor = 0.0
+        self.media = 0.0
+        self.variancia = 0.0
+        self.dias_observados = 0
+
+
+class DetectorAnomalias:
+    """
+    Detector online de dias com faturamento fora da faixa esperada
+
+    Cada série guarda só o dia em aberto e a média/variância EWMA dos dias fechados. Quando chega
+    um pedido de um dia posterior, o dia em aberto (e os dias sem venda até o novo) é comparado
+    à faixa média ± z·desvio e depois incorporado às estatísticas.
+
+    É o único estado mutável do snapshot compartilhado: registrar_pedido, situacao e
+    listar_alertas passam pela mesma trava, então threads de sessões diferentes podem
+    registrar pedidos e ler alertas da mesma instância.
+    """
+
+    def __init__(self, alpha: float = 0.1, z: float = 3.0, dias_aquecimento: int = 14,
+                 max_dias_lacuna: int = 90):
+        self.alpha = alpha
+        self.z = z
+        self.dias_aquecimento = dias_aquecimento
+        self.max_dias_lacuna = max_dias_lacuna
+        self.series = {}
+        self.alertas = []
+        self.pedidos_atrasados = 0
+        self._trava = threading.Lock()
+
+    @classmethod
+    def a_partir_de_pedidos(cls, pedidos: pd.DataFrame, **parametros) -> 'DetectorAnomalias':
+        """Inicializa o detector com o histórico de pedidos, somado por dia antes de alimentar as séries"""
+        detector = cls(**parametros)
+        datados = pedidos[pedidos['data_pedido'].notna()]
+        dias = datados['data_pedido'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        valores = datados['valor_total'].to_numpy(dtype=float)
+
+        for dimensao, coluna in DIMENSOES_ANOMALIA:
+            series = pd.Series('Total', index=datados.index) if coluna is None else datados[coluna]
+            diario = pd.DataFrame({'serie': series.to_numpy(), 'dia': dias, 'valor': valores})
+            diario = diario.dropna(subset=['serie']).groupby(['serie', 'dia'], sort=True)['valor'].sum()
+            for (serie, dia), valor in diario.items():
+                detector._adicionar(dimensao, serie, int(dia), float(valor))
+        return detector
+
+    def registrar_pedido(self, data_pedido, valor_total: float, forma_pagamento: str = None,
+                         canal_venda: str = None):
+        """Alimenta as séries do pedido (total, canal e forma de pagamento) em O(1)"""
+        dia = int(np.datetime64(pd.Timestamp(data_pedido).date(), 'D').astype(np.int64))
+        valores = {'canal_venda': canal_venda, 'forma_pagamento': forma_pagamento}
+        with self._trava:
+            for dimensao, coluna in DIMENSOES_ANOMALIA:
+                serie = 'Total' if coluna is None else valores[coluna]
+                if serie is not None:
+                    self._adicionar(dimensao, serie, dia, float(valor_total))
+
+    def _adicionar(self, dimensao: str, serie: str, dia: int, valor: float):
+        """Soma o valor ao dia em aberto da série, fechando os dias anteriores quando o dia avança"""
+        estado = self.series.setdefault((dimensao, serie), _EstadoSerie())
+        if estado.dia is None:
+            estado.dia = dia
+        elif dia < estado.dia:
+            # Dia já fechado: não reabre as estatísticas
+            self.pedidos_atrasados += 1
+            return
+        elif dia > estado.dia:
+            self._fechar_dia(dimensao, serie, estado, estado.dia, estado.valor)
+            # Dias sem venda entre o fechado e o novo (após max_dias_lacuna a média já decaiu a ~0)
+            lacuna = min(dia - estado.dia - 1, self.max_dias_lacuna)
+            for deslocamento in range(lacuna):
+                self._fechar_dia(dimensao, serie, estado, dia - lacuna + deslocamento, 0.0)
+            estado.dia, estado.valor = dia, 0.0
+        estado.valor += valor
+
+    def _fechar_dia(self, dimensao: str, serie: str, estado: _EstadoSerie, dia: int, valor: float):
+        """Compara o dia com a faixa esperada e o incorpora à média e variância EWMA"""
+        if estado.dias_observados >= self.dias_aquecimento:
+            inferior, superior = self._limites(estado)
+            if valor < inferior or valor > superior:
+                self.alertas.append({
+                    'dimensao': dimensao,
+                    'serie': serie,
+                    'dia': np.datetime64(dia, 'D'),
+                    'valor': valor,
+                    'esperado': estado.media,
+                    'limite_inferior': inferior,
+                    'limite_superior': superior,
+                    'tipo': 'queda' if valor < inferior else 'pico',
+                })
+
+        if estado.dias_observados == 0:
+            estado.media = valor
+        else:
+            diferenca = valor - estado.media
+            incremento = self.alpha * diferenca
+            estado.media += incremento
+            estado.variancia = (1 - self.alpha) * (estado.variancia + diferenca * incremento)
+        estado.dias_observados += 1
+
+    def _limites(self, estado: _EstadoSerie):
+        """Faixa esperada média ± z·desvio (o faturamento não fica abaixo de zero)"""
+        margem = self.z * np.sqrt(estado.variancia)
+        return max(estado.media - margem, 0.0), estado.media + margem
+
+    def situacao(self) -> pd.DataFrame:
+        """Dia em aberto de cada série com o valor parcial e a faixa esperada"""
+        with self._trava:
+            linhas = []
+            for (dimensao, serie), estado in self.series.items():
+                inferior, superior = self._limites(estado)
+                aquecido = estado.dias_observados >= self.dias_aquecimento
+                linhas.append({
+                    'dimensao': dimensao,
+                    'serie': serie,
+                    'dia': np.datetime64(estado.dia, 'D'),
+                    'valor_dia': estado.valor,
+                    'esperado': estado.media,
+                    'limite_inferior': inferior,
+                    'limite_superior': superior,
+                    'status': 'pico' if aquecido and estado.valor > superior else
+                              ('normal' if aquecido else 'aquecendo'),
+                })
+        return pd.DataFrame(linhas, columns=['dimensao', 'serie', 'dia', 'valor_dia', 'esperado',
+                                             'limite_inferior', 'limite_superior', 'status'])
+
+    def listar_alertas(self, desde=None) -> pd.DataFrame:
+        """Dias fechados fora da faixa esperada (opcionalmente a partir de uma data)"""
+        with self._trava:
+            alertas = pd.DataFrame(list(self.alertas), columns=['dimensao', 'serie', 'dia', 'valor', 'esperado',
+                                                                'limite_inferior', 'limite_superior', 'tipo'])
+        alertas['dia'] = pd.to_datetime(alertas['dia'])
+        if desde is not None:
+            alertas = alertas[alertas['dia'] >= pd.Timestamp(desde)]
+        return alertas.sort_values('dia', ascending=False, kind='mergesort').reset_index(drop=True)
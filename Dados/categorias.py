@@ -0,0 +1,63 @@
+"""
+Grupos de categorias de produto
+Agrupamentos configuráveis (arquivo JSON) resolvidos uma vez por categoria distinta
+e guardados como coluna categórica
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict
+import numpy as np
+import pandas as pd
+from .texto import chave_texto
+
+
+# Arquivo padrão; CONECTA_GRUPOS_CATEGORIA aponta para outro sem alterar o código
+ARQUIVO_GRUPOS_CATEGORIA = Path(__file__).with_name('grupos_categoria.json')
+GRUPO_SEM_GRUPO = 'outros'
+
+
+def carregar_grupos(caminho=None) -> Dict[str, Dict]:
+    """
+    Lê os grupos de categoria do arquivo JSON
+
+    Formato: {"chave_do_grupo": {"nome": "Nome exibido", "padroes": ["trecho", ...]}, ...}.
+    Uma categoria entra no primeiro grupo (na ordem do arquivo) com algum padrão contido no nome,
+    sem diferenciar acentos nem maiúsculas.
+    """
+    caminho = caminho or os.getenv('CONECTA_GRUPOS_CATEGORIA') or ARQUIVO_GRUPOS_CATEGORIA
+    with open(caminho, encoding='utf-8') as arquivo:
+        grupos = json.load(arquivo)
+
+    for chave, grupo in grupos.items():
+        if chave == GRUPO_SEM_GRUPO:
+            raise ValueError(f"'{GRUPO_SEM_GRUPO}' é reservado para categorias fora dos grupos")
+        if not grupo.get('padroes'):
+            raise ValueError(f"Grupo '{chave}' sem padrões")
+    return grupos
+
+
+def resolver_grupos(categorias: pd.Series, grupos: Dict[str, Dict]) -> pd.Categorical:
+    """Grupo de cada linha como categórico (categorias: chaves dos grupos + 'outros')"""
+    expressoes = {
+        chave: re.compile('|'.join(chave_texto(padrao) for padrao in grupo['padroes']))
+        for chave, grupo in grupos.items()
+    }
+    codigos, distintas = pd.factorize(categorias)
+
+    # Uma busca por categoria distinta; o último código é o de 'outros'
+    resolvidos = []
+    for categoria in distintas:
+        texto = chave_texto(categoria)
+        resolvidos.append(next(
+            (posicao for posicao, expressao in enumerate(expressoes.values()) if texto and expressao.search(texto)),
+            len(expressoes)
+        ))
+    mapa = np.array(resolvidos + [len(expressoes)], dtype=np.int64)
+    return pd.Categorical.from_codes(mapa[codigos], categories=list(grupos) + [GRUPO_SEM_GRUPO])
+
+
+def nomes_grupos(grupos: Dict[str, Dict]) -> Dict[str, str]:
+    """Nome exibido de cada grupo"""
+    return {chave: grupo.get('nome', chave) for chave, grupo in grupos.items()}
@@ -0,0 +1,65 @@
+"""
+Cesta de compras (market basket)
+Co-ocorrência de produtos nos pedidos calculada com produto de matrizes esparsas
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def matriz_pedido_produto(id_pedido, id_produto):
+    """
+    Monta a matriz esparsa binária pedido × produto
+
+    Returns:
+        (matriz CSR com 1 onde o produto aparece no pedido, id_produto de cada coluna)
+    """
+    codigos_pedido, pedidos = pd.factorize(pd.Series(id_pedido), sort=False)
+    codigos_produto, produtos = pd.factorize(pd.Series(id_produto), sort=True)
+    validos = (codigos_pedido >= 0) & (codigos_produto >= 0)
+
+    matriz = sparse.csr_matrix(
+        (np.ones(int(validos.sum()), dtype=np.int32), (codigos_pedido[validos], codigos_produto[validos])),
+        shape=(len(pedidos), len(produtos))
+    )
+    # O mesmo produto em várias linhas do pedido conta uma vez
+    matriz.sum_duplicates()
+    matriz.data[:] = 1
+    return matriz, np.asarray(produtos)
+
+
+def coocorrencia(matriz: sparse.csr_matrix) -> sparse.coo_matrix:
+    """Matriz produto × produto com o número de pedidos em que cada par aparece junto"""
+    return (matriz.T @ matriz).tocoo()
+
+
+def pares_de_produtos(id_pedido, id_produto, suporte_minimo: int = 2) -> pd.DataFrame:
+    """
+    Pares de produtos comprados juntos com suporte, confiança e lift
+
+    Args:
+        id_pedido: Pedido de cada linha de item
+        id_produto: Produto de cada linha de item
+        suporte_minimo: Mínimo de pedidos em comum para o par ser considerado
+
+    Returns:
+        DataFrame com um par por linha (produto_a < produto_b)
+    """
+    matriz, produtos = matriz_pedido_produto(id_pedido, id_produto)
+    n_pedidos = matriz.shape[0]
+    pedidos_produto = np.asarray(matriz.sum(axis=0)).ravel()
+
+    # Triângulo superior da co-ocorrência: cada par uma vez, sem a diagonal
+    co = coocorrencia(matriz)
+    manter = (co.row < co.col) & (co.data >= suporte_minimo)
+    a, b, juntos = co.row[manter], co.col[manter], co.data[manter].astype(float)
+
+    return pd.DataFrame({
+        'id_produto_a': produtos[a],
+        'id_produto_b': produtos[b],
+        'pedidos_juntos': juntos.astype(np.int64),
+        'suporte': juntos / n_pedidos if n_pedidos else juntos,
+        'confianca_a_b': juntos / pedidos_produto[a],
+        'confianca_b_a': juntos / pedidos_produto[b],
+        'lift': juntos * n_pedidos / (pedidos_produto[a] * pedidos_produto[b]),
+    })
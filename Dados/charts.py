@@ -7,7 +7,7 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
 import streamlit as st
-from .analises import AnaliseDados
+from .snapshot import obter_snapshot
 
 
 # Paleta de cores harmônica (azul escuro, azul claro, laranja)
@@ -61,7 +61,7 @@ def _extrair_percentual(percentual_str: str) -> float:
 @st.cache_data
 def grafico_clientes_sexo():
     """Gráfico de Pizza - Distribuição de clientes por sexo"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_clientes_por_sexo()
     
     fig = go.Figure(data=[go.Pie(
@@ -82,9 +82,9 @@ def grafico_clientes_sexo():
 @st.cache_data
 def grafico_clientes_regiao(top_n=15):
     """Gráfico de Barras Horizontais - Clientes por região"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_clientes_por_regiao().head(top_n)
-    df['regiao'] = df['cidade'] + ', ' + df['estado2']
+    df['regiao'] = df['cidade'] + ', ' + df['uf']
     df = df.sort_values('quantidade', ascending=True)
     
     fig = go.Figure()
@@ -107,7 +107,7 @@ def grafico_clientes_regiao(top_n=15):
 @st.cache_data
 def grafico_clientes_valiosos(top_n=20):
     """Gráfico de Barras - Top clientes mais valiosos"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_clientes_mais_valiosos(top_n)
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df = df.sort_values('valor_num', ascending=True)
@@ -130,12 +130,40 @@ def grafico_clientes_valiosos(top_n=20):
     return fig
 
 
+@st.cache_data
+def grafico_coortes_retencao(max_meses=12, df=None):
+    """Heatmap - Retenção de clientes por coorte (df: resultado já calculado no pool de processos)"""
+    if df is None:
+        df = obter_snapshot().analise_coortes_retencao()
+    offsets = [c for c in df.columns if c != 'clientes'][:max_meses + 1]
+    matriz = df[offsets]
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=matriz.values,
+        x=[f"Mês {m}" for m in offsets],
+        y=matriz.index,
+        colorscale=[[0, CORES['primaria']], [0.5, CORES['secundaria']], [1, CORES['accent']]],
+        zmin=0, zmax=100,
+        text=[[f"{v:.0f}%" if pd.notna(v) else "" for v in row] for row in matriz.values],
+        texttemplate='%{text}',
+        textfont={"size": 9, "color": "white"},
+        colorbar=dict(title=dict(text="Retenção (%)", font=dict(color='white')), tickfont=dict(color='white')),
+        customdata=[[n] * len(offsets) for n in df['clientes']],
+        hovertemplate='<b>Coorte %{y} - %{x}</b><br>Retenção: %{z:.1f}%<br>Clientes na coorte: %{customdata}<extra></extra>'
+    ))
+    
+    fig.update_layout(**LAYOUT_CONFIG, height=650, title_text='Retenção por Coorte',
+                      xaxis_title='Meses desde a primeira compra', yaxis_title='Coorte')
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
+
 # ==================== GRÁFICOS DE PRODUTOS ====================
 
 @st.cache_data
 def grafico_top_produtos(top_n=10):
     """Gráfico de Barras - Top produtos mais vendidos"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_top_produtos_mais_vendidos(top_n)
     df = df.sort_values('qtd_vendida', ascending=True)
     
@@ -160,7 +188,7 @@ def grafico_top_produtos(top_n=10):
 @st.cache_data
 def grafico_vendas_segmento():
     """Gráfico de Barras - Vendas por segmento"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_vendas_por_segmento()
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df = df.sort_values('valor_num', ascending=True)
@@ -187,7 +215,7 @@ def grafico_vendas_segmento():
 @st.cache_data
 def grafico_cores_vendidas(top_n=10):
     """Gráfico de Barras Horizontais - Cores mais vendidas"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_cores_mais_vendidas().head(top_n)
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df = df.sort_values('qtd_vendida', ascending=True)
@@ -218,7 +246,7 @@ def grafico_cores_vendidas(top_n=10):
 @st.cache_data
 def grafico_top_cosmeticos(top_n=5):
     """Gráfico de Barras - Top cosméticos"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_top_cosmeticos(top_n)
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df = df.sort_values('valor_num', ascending=True)
@@ -244,7 +272,7 @@ def grafico_top_cosmeticos(top_n=5):
 @st.cache_data
 def grafico_top_cadeiras_lavatorios(top_n=5):
     """Gráfico de Colunas - Top cadeiras e lavatórios"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_top_cadeiras_lavatorios(top_n)
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df = df.sort_values('valor_num', ascending=False)
@@ -269,10 +297,10 @@ def grafico_top_cadeiras_lavatorios(top_n=5):
 
 
 @st.cache_data
-def grafico_top3_segmento():
-    """Gráfico de Barras - Top 3 por segmento"""
-    analise = AnaliseDados()
-    df = analise.analise_top3_por_segmento()
+def grafico_top3_segmento(df=None):
+    """Gráfico de Barras - Top 3 por segmento (df: resultado já calculado no pool de processos)"""
+    # O resultado do pool é compartilhado entre sessões: as colunas auxiliares vão numa cópia
+    df = obter_snapshot().analise_top3_por_segmento() if df is None else df.copy()
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df['produto_cat'] = df['categoria'] + ' - ' + df['nome_produto'].str[:30]
     df = df.sort_values(['categoria', 'valor_num'], ascending=[True, False])
@@ -305,7 +333,7 @@ def grafico_top3_segmento():
 @st.cache_data
 def grafico_vendas_ano():
     """Gráfico de Linha - Vendas por ano"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_vendas_por_ano()
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     
@@ -341,7 +369,7 @@ def grafico_vendas_ano():
 @st.cache_data
 def grafico_vendas_canal():
     """Gráfico de Barras - Vendas por canal"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_vendas_por_canal()
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df = df.sort_values('valor_num', ascending=True)
@@ -367,7 +395,7 @@ def grafico_vendas_canal():
 @st.cache_data
 def grafico_vendas_forma_pagamento():
     """Gráfico de Barras - Vendas por forma de pagamento"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     df = analise.analise_vendas_por_forma_pagamento().head(10)
     df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
     df = df.sort_values('valor_num', ascending=False)
@@ -394,25 +422,21 @@ def grafico_vendas_forma_pagamento():
 @st.cache_data
 def grafico_sazonalidade_heatmap():
     """Heatmap - Sazonalidade por ano e mês"""
-    analise = AnaliseDados()
-    df = analise.analise_sazonalidade()
-    df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
-    
-    pivot = df.pivot_table(values='valor_num', index='mes_nome', columns='ano', aggfunc='sum', fill_value=0)
-    ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                   'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-    pivot = pivot.reindex([m for m in ordem_meses if m in pivot.index])
+    analise = obter_snapshot()
+    pivot = analise.matriz_sazonal('receita')
+    indices = analise.matriz_sazonal('indice')
     
     fig = go.Figure(data=go.Heatmap(
         z=pivot.values,
-        x=[f"{int(ano)}" if pd.notna(ano) else "" for ano in pivot.columns],
+        x=[str(ano) for ano in pivot.columns],
         y=pivot.index,
         colorscale=[[0, CORES['primaria']], [0.5, CORES['secundaria']], [1, CORES['accent']]],
         text=[[f"R$ {val:,.0f}" if val > 0 else "" for val in row] for row in pivot.values],
         texttemplate='%{text}',
         textfont={"size": 10, "color": "white"},
         colorbar=dict(title=dict(text="Valor (R$)", font=dict(color='white')), tickfont=dict(color='white')),
-        hovertemplate='<b>%{y} - %{x}</b><br>Valor: R$ %{z:,.2f}<extra></extra>'
+        customdata=indices.values,
+        hovertemplate='<b>%{y} - %{x}</b><br>Valor: R$ %{z:,.2f}<br>Índice: %{customdata:.1f}<extra></extra>'
     ))
     
     fig.update_layout(**LAYOUT_CONFIG, height=600, title_text='Sazonalidade de Vendas',
@@ -420,22 +444,51 @@ def grafico_sazonalidade_heatmap():
     return fig
 
 
+@st.cache_data
+def grafico_previsao_vendas(horizonte=6, meses_historico=24):
+    """Linha - Faturamento mensal recente e previsão dos próximos meses com faixa de confiança"""
+    analise = obter_snapshot()
+    historico = analise.analise_vendas_periodo(formatar=False).tail(meses_historico)
+    previsao = analise.analise_previsao_vendas(horizonte, dimensao='total', formatar=False)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=historico['periodo'], y=historico['receita'], name='Realizado',
+        mode='lines+markers', line=dict(width=3, color=CORES['secundaria']),
+        hovertemplate='<b>%{x|%m/%Y}</b><br>Realizado: R$ %{y:,.2f}<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=list(previsao['periodo']) + list(previsao['periodo'][::-1]),
+        y=list(previsao['limite_superior']) + list(previsao['limite_inferior'][::-1]),
+        fill='toself', fillcolor='rgba(243, 156, 18, 0.2)', line=dict(width=0),
+        name='Faixa de 95%', hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=previsao['periodo'], y=previsao['previsao'], name='Previsão',
+        mode='lines+markers', line=dict(width=3, color=CORES['accent'], dash='dash'),
+        hovertemplate='<b>%{x|%m/%Y}</b><br>Previsão: R$ %{y:,.2f}<extra></extra>'
+    ))
+    
+    fig.update_layout(**LAYOUT_CONFIG, height=500, title_text=f'Previsão de Vendas - Próximos {horizonte} Meses',
+                      xaxis_title='Mês', yaxis_title='Faturamento (R$)', hovermode='x unified')
+    return fig
+
+
 @st.cache_data
 def grafico_canal_venda_pareto(top_n=15):
-    """Gráfico Pareto - Canal de venda por cliente"""
-    analise = AnaliseDados()
-    df = analise.analise_compras_por_canal_cliente().head(top_n)
-    df['valor_num'] = df['valor_total'].apply(_extrair_valor_monetario)
-    df = df.sort_values('valor_num', ascending=False)
-    df['percentual_acumulado'] = (df['valor_num'].cumsum() / df['valor_num'].sum() * 100)
+    """Gráfico Pareto - Top clientes com % acumulado sobre toda a base (curva ABC)"""
+    analise = obter_snapshot()
+    df = analise.analise_curva_abc('clientes', formatar=False).head(top_n)
+    cores_classe = {'A': CORES['secundaria'], 'B': CORES['accent'], 'C': CORES['primaria']}
     
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     
     fig.add_trace(
         go.Bar(
-            x=df['nome'], y=df['valor_num'], name='Valor Total',
-            marker=dict(color=CORES['secundaria']),
-            hovertemplate='<b>%{x}</b><br>Valor: R$ %{y:,.2f}<extra></extra>'
+            x=df['nome'], y=df['valor_total'], name='Valor Total',
+            marker=dict(color=df['classe'].map(cores_classe)),
+            customdata=df['classe'],
+            hovertemplate='<b>%{x}</b><br>Valor: R$ %{y:,.2f}<br>Classe: %{customdata}<extra></extra>'
         ),
         secondary_y=False
     )
@@ -451,9 +504,10 @@ def grafico_canal_venda_pareto(top_n=15):
     )
     
     fig.add_hline(y=80, line_dash="dash", line_color="red", annotation_text="80%", secondary_y=True)
+    fig.add_hline(y=95, line_dash="dot", line_color="orange", annotation_text="95%", secondary_y=True)
     
     layout_config = {k: v for k, v in LAYOUT_CONFIG.items() if k != 'xaxis'}
-    fig.update_layout(**layout_config, height=500, title_text=f'Análise de Pareto - Top {top_n} Clientes',
+    fig.update_layout(**layout_config, height=500, title_text=f'Análise de Pareto - Top {top_n} Clientes (Curva ABC)',
                       hovermode='x unified')
     fig.update_xaxes(tickangle=-45, gridcolor='rgba(74, 144, 226, 0.2)', color='#FFFFFF')
     fig.update_yaxes(title_text="Valor Total (R$)", secondary_y=False, color='white')
@@ -464,7 +518,7 @@ def grafico_canal_venda_pareto(top_n=15):
 @st.cache_data
 def grafico_kpi_totais():
     """KPI Cards - Totais gerais"""
-    analise = AnaliseDados()
+    analise = obter_snapshot()
     dados = analise.analise_total_vendas_geral()
     valor_total = _extrair_valor_monetario(dados['valor_total_vendas'])
     ticket_medio = _extrair_valor_monetario(dados['ticket_medio'])
@@ -0,0 +1,262 @@
+"""
+Consultas declarativas
+consulta(metricas, por, onde, top) compilada em filtros, agrupamento e agregações vetorizadas
+sobre os itens do snapshot: cada dimensão vira um código inteiro por item (calculado uma vez
+por snapshot), filtros de data viram fatias do índice de pedidos e as métricas saem de
+np.bincount sobre a chave combinada dos grupos
+"""
+import json
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from .kernels import codificar
+
+
+# Métricas disponíveis: nome -> descrição
+METRICAS_CONSULTA = {
+    'receita': 'Soma do subtotal dos itens',
+    'quantidade': 'Unidades vendidas',
+    'itens': 'Linhas de item de pedido',
+    'pedidos': 'Pedidos distintos',
+    'clientes': 'Clientes distintos',
+    'produtos': 'Produtos distintos',
+    'ticket_medio': 'Receita por pedido',
+    'preco_medio': 'Receita por unidade vendida',
+}
+
+# Dimensões disponíveis: nome -> (tabela de origem, coluna)
+DIMENSOES_CONSULTA = {
+    'ano': ('pedidos', 'ano'),
+    'mes': ('pedidos', 'mes'),
+    'canal_venda': ('pedidos', 'canal_venda'),
+    'forma_pagamento': ('pedidos', 'forma_pagamento'),
+    'id_pedido': ('pedidos', 'id_pedido'),
+    'id_cliente': ('pedidos', 'id_cliente'),
+    'nome_cliente': ('clientes', 'nome'),
+    'sexo': ('clientes', 'sexo'),
+    'uf': ('geografia', 'uf'),
+    'estado': ('geografia', 'estado'),
+    'cidade': ('geografia', 'cidade'),
+    'id_produto': ('produtos', 'id_produto'),
+    'nome_produto': ('produtos', 'nome_produto'),
+    'categoria': ('produtos', 'categoria'),
+    'grupo_categoria': ('produtos', 'grupo_categoria'),
+    'fornecedor': ('produtos', 'fornecedor'),
+    'nome_cor': ('cor_produto', 'nome_cor'),
+}
+
+# Filtro por data do pedido (compilado em fatia contígua dos pedidos ordenados)
+DIMENSAO_DATA = 'data_pedido'
+OPERADORES_CONSULTA = ('==', '!=', '>', '>=', '<', '<=', 'em', 'fora')
+OPERADORES_DATA = ('>=', '>', '<', '<=')
+METRICAS_MOEDA = ('receita', 'ticket_medio', 'preco_medio')
+
+
+def validar_consulta(metricas: List[str], por: List[str], onde: Dict) -> None:
+    """Valida nomes de métricas, dimensões e operadores antes de qualquer cálculo"""
+    if not metricas:
+        raise ValueError(f"Informe ao menos uma métrica. Use: {', '.join(METRICAS_CONSULTA)}")
+    for metrica in metricas:
+        if metrica not in METRICAS_CONSULTA:
+            raise ValueError(f"Métrica '{metrica}' inválida. Use: {', '.join(METRICAS_CONSULTA)}")
+    for dimensao in list(por) + [d for d in onde if d != DIMENSAO_DATA]:
+        if dimensao not in DIMENSOES_CONSULTA:
+            raise ValueError(f"Dimensão '{dimensao}' inválida. Use: {', '.join(DIMENSOES_CONSULTA)}")
+    for condicao in onde.values():
+        if isinstance(condicao, dict):
+            for operador in condicao:
+                if operador not in OPERADORES_CONSULTA:
+                    raise ValueError(f"Operador '{operador}' inválido. Use: {', '.join(OPERADORES_CONSULTA)}")
+
+
+def assinatura_consulta(metricas: List[str], por: List[str], onde: Dict, top, ordenar_por) -> str:
+    """Chave de cache da consulta normalizada (filtros em ordem alfabética)"""
+    return json.dumps([metricas, por, onde, top, ordenar_por], sort_keys=True, default=str)
+
+
+def codificar_dimensao(analise, dimensao: str):
+    """
+    Código de cada item de df_vendas na dimensão (-1 quando o item não tem valor)
+
+    Returns:
+        (códigos int64 alinhados a df_vendas, rótulo de cada código)
+    """
+    tabela, coluna = DIMENSOES_CONSULTA[dimensao]
+    posicao_pedido = analise._posicao_pedido_item
+
+    if tabela == 'pedidos':
+        codigos, rotulos = codificar(analise.df_pedidos[coluna])
+        return np.append(codigos, -1)[posicao_pedido], _rotulos_inteiros(rotulos)
+
+    if tabela == 'geografia':
+        # UF e cidade já normalizadas; clientes fora do cadastro ficam como não informados
+        geografia = analise.geografia
+        codigo_uf, codigo_cidade = geografia.codigos(analise.df_pedidos['id_cliente'])
+        if coluna == 'cidade':
+            codigos, rotulos = codigo_cidade, geografia.cidades['cidade'].to_numpy()
+        else:
+            codigos, rotulos = codigo_uf, geografia.ufs[coluna].to_numpy()
+        return np.append(codigos, -1)[posicao_pedido], rotulos
+
+    # Cadastros (clientes, produtos, cores): chave duplicada usa o primeiro registro
+    chave, chave_item = {
+        'clientes': ('id_cliente', None),
+        'produtos': ('id_produto', 'id_produto'),
+        'cor_produto': ('id_cor', 'id_cor'),
+    }[tabela]
+    cadastro = getattr(analise, f"df_{tabela}").drop_duplicates(chave)
+    codigos_cadastro, rotulos = codificar(cadastro[coluna])
+    indice = pd.Index(cadastro[chave].to_numpy())
+    if chave_item is None:
+        por_pedido = np.append(codigos_cadastro, -1)[indice.get_indexer(analise.df_pedidos[chave].to_numpy())]
+        return np.append(por_pedido, -1)[posicao_pedido], rotulos
+    posicao = indice.get_indexer(analise.df_vendas[chave_item].to_numpy())
+    return np.append(codigos_cadastro, -1)[posicao], rotulos
+
+
+def _rotulos_inteiros(rotulos: np.ndarray) -> np.ndarray:
+    """Ano e mês vêm como float (pedidos sem data); rótulos inteiros voltam a int"""
+    if rotulos.dtype.kind == 'f' and len(rotulos) and np.array_equal(rotulos, np.floor(rotulos)):
+        return rotulos.astype(np.int64)
+    return rotulos
+
+
+def normalizar_filtro_data(condicao) -> Dict[str, pd.Timestamp]:
+    """Filtro de data_pedido como {operador: Timestamp}; data única ou [início, fim] valem por dia inteiro"""
+    if not isinstance(condicao, dict):
+        inicio, fim = condicao if isinstance(condicao, (list, tuple)) and len(condicao) == 2 else (condicao, condicao)
+        condicao = {'>=': inicio, '<': pd.Timestamp(fim) + pd.Timedelta(days=1)}
+    for operador in condicao:
+        if operador not in OPERADORES_DATA:
+            raise ValueError(f"Operador '{operador}' inválido para {DIMENSAO_DATA}. Use: {', '.join(OPERADORES_DATA)}")
+    return {operador: pd.Timestamp(valor) for operador, valor in condicao.items()}
+
+
+def fatia_itens(analise, condicao) -> slice:
+    """Converte um filtro de data_pedido na fatia de itens dos pedidos datados correspondentes"""
+    datas = analise._datas_pedidos
+    i, j = 0, len(datas)
+    lados = {'>=': ('left', True), '>': ('right', True), '<': ('left', False), '<=': ('right', False)}
+    for operador, valor in normalizar_filtro_data(condicao).items():
+        lado, inferior = lados[operador]
+        posicao = int(datas.searchsorted(valor.to_datetime64(), side=lado))
+        i, j = (max(i, posicao), j) if inferior else (i, min(j, posicao))
+    j = max(i, j)
+    inicio_itens = analise._inicio_itens
+    return slice(int(inicio_itens[i]), int(inicio_itens[j]))
+
+
+def rotulos_aceitos(rotulos: np.ndarray, condicao) -> np.ndarray:
+    """Máscara dos rótulos que satisfazem a condição (valor, lista de valores ou {operador: valor})"""
+    if not isinstance(condicao, dict):
+        condicao = {'em': condicao} if isinstance(condicao, (list, tuple, set)) else {'==': condicao}
+
+    aceitos = np.ones(len(rotulos), dtype=bool)
+    for operador, valor in condicao.items():
+        if operador in ('em', 'fora'):
+            dentro = pd.Index(rotulos).isin([converter_valor(rotulos, v) for v in valor])
+            aceitos &= dentro if operador == 'em' else ~dentro
+            continue
+        valor = converter_valor(rotulos, valor)
+        comparacao = {
+            '==': np.equal, '!=': np.not_equal, '>': np.greater,
+            '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+        }[operador]
+        if rotulos.dtype.kind in 'iuf':
+            aceitos &= comparacao(rotulos, valor)
+        else:
+            aceitos &= comparacao(rotulos.astype(str), str(valor))
+    return aceitos
+
+
+def converter_valor(rotulos: np.ndarray, valor):
+    """Converte o valor do filtro para o tipo dos rótulos ('2024' vira 2024 em dimensões numéricas)"""
+    if rotulos.dtype.kind in 'iuf' and isinstance(valor, str):
+        try:
+            return float(valor)
+        except ValueError:
+            raise ValueError(f"Valor '{valor}' inválido para dimensão numérica")
+    return valor
+
+
+def executar_consulta(analise, metricas: List[str], por: List[str], onde: Dict) -> pd.DataFrame:
+    """
+    Executa a consulta sobre os itens do snapshot (sem formatação nem ordenação por métrica)
+
+    Returns:
+        DataFrame com uma linha por combinação das dimensões de por presente nos itens filtrados
+        (em ordem crescente das dimensões) e uma coluna por métrica
+    """
+    itens = analise.df_vendas
+    fatia = fatia_itens(analise, onde[DIMENSAO_DATA]) if DIMENSAO_DATA in onde else slice(0, len(itens))
+    n_itens = fatia.stop - fatia.start
+
+    # Filtros: máscara sobre os rótulos distintos, aplicada aos códigos dos itens da fatia
+    selecionados = np.ones(n_itens, dtype=bool)
+    for dimensao, condicao in onde.items():
+        if dimensao == DIMENSAO_DATA:
+            continue
+        codigos, rotulos = analise._dimensao_consulta(dimensao)
+        aceitos = np.append(rotulos_aceitos(rotulos, condicao), False)
+        selecionados &= aceitos[codigos[fatia]]
+
+    # Agrupamento: chave mista (cada dimensão é um dígito na base da sua cardinalidade)
+    dimensoes = [analise._dimensao_consulta(dimensao) for dimensao in por]
+    for codigos, _ in dimensoes:
+        selecionados &= codigos[fatia] >= 0
+    linhas = np.flatnonzero(selecionados) + fatia.start
+
+    cardinalidades = [max(len(rotulos), 1) for _, rotulos in dimensoes]
+    if np.prod(np.array(cardinalidades, dtype=float)) >= 2 ** 62:
+        raise ValueError("Agrupamento com combinações demais; use menos dimensões em 'por'")
+    chave = np.zeros(len(linhas), dtype=np.int64)
+    for (codigos, _), cardinalidade in zip(dimensoes, cardinalidades):
+        chave = chave * cardinalidade + codigos[linhas]
+    if por:
+        grupos, grupo = np.unique(chave, return_inverse=True)
+    else:
+        grupos, grupo = np.zeros(1, dtype=np.int64), chave
+    n_grupos = len(grupos)
+
+    resultado = {}
+    restante = grupos
+    for dimensao, (_, rotulos), cardinalidade in reversed(list(zip(por, dimensoes, cardinalidades))):
+        restante, codigo = np.divmod(restante, cardinalidade)
+        resultado[dimensao] = rotulos[codigo]
+    resultado = {dimensao: resultado[dimensao] for dimensao in por}
+
+    # astype(float): sem nenhum item selecionado o bincount devolve int mesmo com pesos
+    receita = np.bincount(grupo, weights=np.nan_to_num(itens['subtotal'].to_numpy(dtype=float)[linhas]),
+                          minlength=n_grupos).astype(float)
+    quantidade = np.bincount(grupo, weights=np.nan_to_num(itens['quantidade'].to_numpy(dtype=float)[linhas]),
+                             minlength=n_grupos).astype(float)
+    posicao_pedido = analise._posicao_pedido_item[linhas]
+    pedidos = _distintos(grupo, n_grupos, posicao_pedido, len(analise.df_pedidos))
+    calculos = {
+        'receita': lambda: receita,
+        'quantidade': lambda: quantidade.astype(np.int64),
+        'itens': lambda: np.bincount(grupo, minlength=n_grupos),
+        'pedidos': lambda: pedidos,
+        'clientes': lambda: _distintos(
+            grupo, n_grupos, np.append(analise._codigo_cliente_pedido, -1)[posicao_pedido],
+            analise._n_clientes_pedidos),
+        'produtos': lambda: _distintos(grupo, n_grupos, *_codigos_produto(itens['id_produto'].to_numpy()[linhas])),
+        'ticket_medio': lambda: np.divide(receita, pedidos, out=np.zeros(n_grupos), where=pedidos > 0),
+        'preco_medio': lambda: np.divide(receita, quantidade, out=np.zeros(n_grupos), where=quantidade > 0),
+    }
+    for metrica in metricas:
+        resultado[metrica] = calculos[metrica]()
+    return pd.DataFrame(resultado)
+
+
+def _distintos(grupo: np.ndarray, n_grupos: int, valores: np.ndarray, largura: int) -> np.ndarray:
+    """Valores distintos (códigos 0..largura-1; negativos e o código largura são ignorados) por grupo"""
+    validos = (valores >= 0) & (valores < largura)
+    pares = np.unique(grupo[validos].astype(np.int64) * largura + valores[validos])
+    return np.bincount(pares // largura, minlength=n_grupos)
+
+
+def _codigos_produto(id_produto: np.ndarray):
+    """Códigos densos dos produtos dos itens selecionados"""
+    codigos, unicos = pd.factorize(id_produto)
+    return codigos, max(len(unicos), 1)
@@ -0,0 +1,211 @@
+"""
+Execução de análises pesadas em processos separados
+Exporta o snapshot publicado para arquivos mapeados em memória e executa métodos de
+AnaliseDados em um pool de processos, devolvendo futures (quem chama decide quando esperar
+pelo resultado)
+"""
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from .analises import AnaliseDados
+
+
+# Tabelas exportadas (atributo df_<tabela> do snapshot)
+TABELAS_SNAPSHOT = ('clientes', 'produtos', 'cor_produto', 'pedidos', 'vendas')
+
+# Índices do agrupamento dos itens por pedido (df_vendas já é exportado nessa ordem)
+INDICES_SNAPSHOT = ('posicao_pedido_item', 'inicio_itens')
+
+
+def exportar_snapshot(analise: AnaliseDados, diretorio: str):
+    """
+    Grava as tabelas do snapshot: colunas numéricas e de data em .npy (mapeáveis em memória),
+    as demais em um pickle por tabela
+    """
+    for tabela in TABELAS_SNAPSHOT:
+        df = getattr(analise, f"df_{tabela}")
+        outras = {}
+        for posicao, coluna in enumerate(df.columns):
+            valores = df[coluna]
+            if valores.dtype.kind in 'biufM' and not isinstance(valores.dtype, pd.DatetimeTZDtype):
+                np.save(os.path.join(diretorio, f"{tabela}.{posicao}.npy"), valores.to_numpy())
+            else:
+                outras[posicao] = valores
+        with open(os.path.join(diretorio, f"{tabela}.pkl"), 'wb') as arquivo:
+            pickle.dump({'colunas': list(df.columns), 'outras': outras}, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+    for indice in INDICES_SNAPSHOT:
+        np.save(os.path.join(diretorio, f"{indice}.npy"), getattr(analise, f"_{indice}"))
+
+
+def carregar_snapshot(diretorio: str) -> AnaliseDados:
+    """
+    Reconstrói o snapshot exportado; colunas numéricas e índices dos itens ficam mapeados
+    (somente leitura, sem cópia: os itens não são reagrupados no worker)
+    """
+    tabelas = {}
+    for tabela in TABELAS_SNAPSHOT:
+        with open(os.path.join(diretorio, f"{tabela}.pkl"), 'rb') as arquivo:
+            conteudo = pickle.load(arquivo)
+        colunas = {}
+        for posicao, coluna in enumerate(conteudo['colunas']):
+            if posicao in conteudo['outras']:
+                colunas[coluna] = conteudo['outras'][posicao]
+            else:
+                colunas[coluna] = np.load(os.path.join(diretorio, f"{tabela}.{posicao}.npy"), mmap_mode='r')
+        tabelas[tabela] = pd.DataFrame(colunas, copy=False)
+    for indice in INDICES_SNAPSHOT:
+        tabelas[indice] = np.load(os.path.join(diretorio, f"{indice}.npy"), mmap_mode='r')
+    return AnaliseDados.de_dataframes(**tabelas)
+
+
+# Snapshot carregado em cada processo do pool (só o mais recente fica em memória)
+_snapshot_worker = {}
+
+
+def _executar_no_worker(diretorio: str, metodo: str, args: tuple, kwargs: dict):
+    """Executa analise.<metodo>(*args, **kwargs) no snapshot do diretório (carregado uma vez por processo)"""
+    analise = _snapshot_worker.get(diretorio)
+    if analise is None:
+        _snapshot_worker.clear()
+        analise = _snapshot_worker[diretorio] = carregar_snapshot(diretorio)
+    return getattr(analise, metodo)(*args, **kwargs)
+
+
+class ExecutorAnalises:
+    """Pool de processos que executa métodos de AnaliseDados sobre o snapshot exportado"""
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers
+        self._pool = None
+        self._exportado = None  # (versao_dados, diretório)
+        self._pendentes = {}  # diretório exportado → jobs ainda não concluídos
+        self._futuros = {}  # (método, args, kwargs) → future da versão exportada atual
+        self._trava = threading.Lock()
+        # Trava da contagem e dos futures compartilhados: os done-callbacks rodam na thread do pool
+        # e nunca esperam por self._trava
+        self._trava_pendentes = threading.Lock()
+
+    def submeter(self, analise: AnaliseDados, metodo: str, *args, **kwargs) -> Future:
+        """
+        Agenda analise.<metodo>(*args, **kwargs) em um processo do pool
+
+        A mesma chamada sobre a mesma versão dos dados devolve o mesmo future (sessões diferentes
+        compartilham o job e o resultado); um job que falhou é esquecido e o próximo pedido o refaz.
+
+        Returns:
+            Future com o resultado (DataFrame, dicionário, ...). O resultado é compartilhado:
+            quem precisar alterá-lo trabalha numa cópia. Se o pool não puder ser usado,
+            a análise roda no próprio processo e o future já volta concluído.
+        """
+        if not callable(getattr(AnaliseDados, metodo, None)) or metodo.startswith('_'):
+            raise ValueError(f"Método '{metodo}' não é uma análise pública de AnaliseDados")
+        chamada = (metodo, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(chamada)
+        except TypeError:
+            chamada = None  # Argumentos não hasheáveis (listas, dicionários): job não compartilhado
+        try:
+            with self._trava:
+                diretorio = self._exportar(analise)
+                with self._trava_pendentes:
+                    futuro = self._futuros.get(chamada) if chamada is not None else None
+                if futuro is not None:
+                    return futuro
+                futuro = self._obter_pool().submit(_executar_no_worker, diretorio, metodo, args, kwargs)
+                with self._trava_pendentes:
+                    self._pendentes[diretorio] += 1
+                    if chamada is not None:
+                        self._futuros[chamada] = futuro
+            futuro.add_done_callback(lambda concluido: self._concluir(diretorio, chamada, concluido))
+            return futuro
+        except (OSError, BrokenProcessPool, RuntimeError) as e:
+            print(f"Pool de processos indisponível ({e}); executando no processo atual")
+            self._descartar_pool()
+            futuro = Future()
+            try:
+                futuro.set_result(getattr(analise, metodo)(*args, **kwargs))
+            except Exception as erro:
+                futuro.set_exception(erro)
+            return futuro
+
+    def _exportar(self, analise: AnaliseDados) -> str:
+        """
+        Exporta o snapshot uma vez por versão dos dados
+
+        A exportação anterior só é apagada quando não há mais jobs dela na fila ou em execução
+        (ver _concluir); workers que ainda mapeiam os arquivos antigos continuam lendo-os.
+        """
+        if self._exportado is not None and self._exportado[0] == analise.versao_dados:
+            return self._exportado[1]
+        diretorio = tempfile.mkdtemp(prefix=f"conecta_snapshot_{analise.versao_dados}_")
+        exportar_snapshot(analise, diretorio)
+        with self._trava_pendentes:
+            anterior = self._exportado
+            self._exportado = (analise.versao_dados, diretorio)
+            self._pendentes[diretorio] = 0
+            self._futuros = {}
+            obsoleto = self._liberar(anterior[1]) if anterior is not None else None
+        if obsoleto is not None:
+            shutil.rmtree(obsoleto, ignore_errors=True)
+        return diretorio
+
+    def _concluir(self, diretorio: str, chamada: tuple, futuro: Future):
+        """Done-callback de cada job: desconta-o, esquece-o se falhou e apaga a exportação obsoleta quando era o último"""
+        with self._trava_pendentes:
+            self._pendentes[diretorio] -= 1
+            falhou = futuro.cancelled() or futuro.exception() is not None
+            if falhou and chamada is not None and self._futuros.get(chamada) is futuro:
+                del self._futuros[chamada]
+            obsoleto = self._liberar(diretorio)
+        if obsoleto is not None:
+            shutil.rmtree(obsoleto, ignore_errors=True)
+
+    def _liberar(self, diretorio: str):
+        """Diretório a apagar se já não é a exportação atual e não tem jobs pendentes (chamar com _trava_pendentes)"""
+        atual = self._exportado[1] if self._exportado is not None else None
+        if diretorio == atual or self._pendentes.get(diretorio, 0) > 0:
+            return None
+        self._pendentes.pop(diretorio, None)
+        return diretorio
+
+    def _obter_pool(self) -> ProcessPoolExecutor:
+        """Cria o pool sob demanda (spawn: o servidor tem threads, fork não é seguro)"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _descartar_pool(self):
+        """Descarta um pool quebrado; o próximo submeter cria outro"""
+        with self._trava:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def encerrar(self):
+        """Encerra o pool e apaga a exportação do snapshot (na hora ou ao fim dos jobs que ainda a usam)"""
+        self._descartar_pool()
+        with self._trava, self._trava_pendentes:
+            anterior = self._exportado
+            self._exportado = None
+            self._futuros = {}
+            obsoleto = self._liberar(anterior[1]) if anterior is not None else None
+        if obsoleto is not None:
+            shutil.rmtree(obsoleto, ignore_errors=True)
+
+
+# Executor compartilhado pelo processo (páginas Streamlit e gráficos)
+_executor = ExecutorAnalises()
+
+
+def submeter_analise(metodo: str, *args, **kwargs) -> Future:
+    """Agenda uma análise do snapshot atual em processo separado e devolve o future"""
+    from .snapshot import obter_snapshot
+    return _executor.submeter(obter_snapshot(), metodo, *args, **kwargs)
@@ -0,0 +1,112 @@
+"""
+Dimensão geográfica dos clientes
+Normaliza UF e cidade uma única vez (siglas, nomes de estado sem acento ou caixa, espaços extras)
+e atribui códigos inteiros estáveis para agregar por estado e cidade com np.bincount
+"""
+import numpy as np
+import pandas as pd
+from .texto import chave_texto
+
+
+# Unidades federativas na ordem dos códigos; o último código é o de UF não informada
+UFS = (
+    ('AC', 'Acre'), ('AL', 'Alagoas'), ('AM', 'Amazonas'), ('AP', 'Amapá'), ('BA', 'Bahia'),
+    ('CE', 'Ceará'), ('DF', 'Distrito Federal'), ('ES', 'Espírito Santo'), ('GO', 'Goiás'),
+    ('MA', 'Maranhão'), ('MG', 'Minas Gerais'), ('MS', 'Mato Grosso do Sul'), ('MT', 'Mato Grosso'),
+    ('PA', 'Pará'), ('PB', 'Paraíba'), ('PE', 'Pernambuco'), ('PI', 'Piauí'), ('PR', 'Paraná'),
+    ('RJ', 'Rio de Janeiro'), ('RN', 'Rio Grande do Norte'), ('RO', 'Rondônia'), ('RR', 'Roraima'),
+    ('RS', 'Rio Grande do Sul'), ('SC', 'Santa Catarina'), ('SE', 'Sergipe'), ('SP', 'São Paulo'),
+    ('TO', 'Tocantins'),
+)
+UF_NAO_INFORMADA = ('--', 'Não informado')
+CIDADE_NAO_INFORMADA = 'Não informada'
+CODIGO_UF_NAO_INFORMADA = len(UFS)
+
+
+# Sigla ou nome do estado (já canônicos) → código da UF
+_CODIGO_POR_CHAVE = {}
+for _codigo, (_sigla, _nome) in enumerate(UFS):
+    _CODIGO_POR_CHAVE[chave_texto(_sigla)] = _codigo
+    _CODIGO_POR_CHAVE[chave_texto(_nome)] = _codigo
+
+
+def resolver_uf(*candidatos) -> int:
+    """Código da primeira UF reconhecida entre os candidatos (sigla ou nome), ou o de não informada"""
+    for candidato in candidatos:
+        codigo = _CODIGO_POR_CHAVE.get(chave_texto(candidato))
+        if codigo is not None:
+            return codigo
+    return CODIGO_UF_NAO_INFORMADA
+
+
+def _grafia_cidade(valor) -> str:
+    """Grafia exibida da cidade: espaços simples ou o rótulo de não informada"""
+    return ' '.join(valor.split()) if chave_texto(valor) else CIDADE_NAO_INFORMADA
+
+
+class DimensaoGeografica:
+    """
+    UF e cidade normalizadas de cada cliente, com códigos inteiros
+
+    A UF vem da coluna estado (sigla) e, se ela não for reconhecida, de estado2 (sigla ou nome);
+    cada combinação distinta é resolvida uma única vez. Cidades são agrupadas pela forma canônica
+    dentro da UF e exibidas com a grafia mais frequente.
+    """
+
+    def __init__(self, clientes: pd.DataFrame):
+        vazia = pd.Series(None, index=clientes.index, dtype=object)
+        estado = clientes.get('estado', vazia).astype(object)
+        estado2 = clientes.get('estado2', vazia).astype(object)
+        cidade = clientes.get('cidade', vazia).astype(object)
+
+        # UF: uma resolução por par (estado, estado2) distinto
+        codigos_par, pares = pd.MultiIndex.from_arrays([estado, estado2]).factorize()
+        resolvidos = np.array([resolver_uf(a, b) for a, b in pares] + [CODIGO_UF_NAO_INFORMADA], dtype=np.int64)
+        codigo_uf = resolvidos[codigos_par]
+
+        # Cidade: grafia e chave canônica calculadas uma vez por valor distinto
+        codigos_grafia, grafias_unicas = pd.factorize(cidade, use_na_sentinel=False)
+        grafias_unicas = [_grafia_cidade(valor) for valor in grafias_unicas]
+        grafias = np.array(grafias_unicas + [CIDADE_NAO_INFORMADA], dtype=object)[codigos_grafia]
+        chaves = np.array([chave_texto(g) for g in grafias_unicas] + [''], dtype=object)[codigos_grafia]
+
+        # Grafia mais frequente de cada (UF, chave); inclui a linha dos clientes fora do cadastro
+        ocorrencias = pd.DataFrame({
+            'codigo_uf': np.append(codigo_uf, CODIGO_UF_NAO_INFORMADA),
+            'chave': np.append(chaves, ''),
+            'cidade': np.append(grafias, CIDADE_NAO_INFORMADA),
+        })
+        contagem = ocorrencias.groupby(['codigo_uf', 'chave', 'cidade'], sort=False).size().reset_index(name='n')
+        contagem = contagem.sort_values(['codigo_uf', 'chave', 'n'], ascending=[True, True, False], kind='mergesort')
+        cidades = contagem.drop_duplicates(['codigo_uf', 'chave']).reset_index(drop=True)
+
+        posicao_cidade = pd.MultiIndex.from_frame(cidades[['codigo_uf', 'chave']])
+        codigo_cidade = posicao_cidade.get_indexer(pd.MultiIndex.from_arrays([codigo_uf, chaves])).astype(np.int64)
+
+        siglas, nomes = (np.array(valores, dtype=object) for valores in zip(*(UFS + (UF_NAO_INFORMADA,))))
+        self.ufs = pd.DataFrame({'codigo_uf': np.arange(len(siglas), dtype=np.int64), 'uf': siglas, 'estado': nomes})
+        self.cidades = pd.DataFrame({
+            'codigo_cidade': np.arange(len(cidades), dtype=np.int64),
+            'codigo_uf': cidades['codigo_uf'].to_numpy(),
+            'uf': siglas[cidades['codigo_uf']],
+            'estado': nomes[cidades['codigo_uf']],
+            'cidade': cidades['cidade'].to_numpy(),
+        })
+        self.codigo_uf_cliente = codigo_uf
+        self.codigo_cidade_cliente = codigo_cidade
+
+        # Busca por id_cliente (cadastros duplicados usam o primeiro, como nas demais análises)
+        primeiros = ~clientes['id_cliente'].duplicated().to_numpy()
+        self._indice_clientes = pd.Index(clientes['id_cliente'].to_numpy()[primeiros])
+        self._uf_indice = codigo_uf[primeiros]
+        self._cidade_indice = codigo_cidade[primeiros]
+        self._cidade_nao_informada = int(posicao_cidade.get_loc((CODIGO_UF_NAO_INFORMADA, '')))
+
+    def codigos(self, id_cliente):
+        """(código da UF, código da cidade) de cada id_cliente; clientes fora do cadastro ficam como não informados"""
+        posicao = self._indice_clientes.get_indexer(np.asarray(id_cliente))
+        encontrado = posicao >= 0
+        return (
+            np.where(encontrado, self._uf_indice[posicao], CODIGO_UF_NAO_INFORMADA),
+            np.where(encontrado, self._cidade_indice[posicao], self._cidade_nao_informada),
+        )
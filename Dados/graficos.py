@@ -109,7 +109,7 @@ class GraficosVendas:
         df = self.analise.analise_clientes_por_regiao().head(top_n)
         
         # Criar label combinado
-        df['regiao_completa'] = df['cidade'] + ', ' + df['estado2']
+        df['regiao_completa'] = df['cidade'] + ', ' + df['uf']
         df = df.sort_values('quantidade', ascending=True)
         
         fig = go.Figure()
@@ -149,14 +149,9 @@ class GraficosVendas:
     
     def grafico_canal_venda_cliente(self, top_n: int = 15) -> go.Figure:
         """3. Gráfico Pareto - Canal de venda por cliente"""
-        df = self.analise.analise_compras_por_canal_cliente().head(top_n)
-        
-        # Extrair valores monetários
-        df['valor_num'] = df['valor_total'].apply(self._extrair_valor_monetario)
-        df = df.sort_values('valor_num', ascending=False)
-        
-        # Calcular percentual acumulado
-        df['percentual_acumulado'] = (df['valor_num'].cumsum() / df['valor_num'].sum() * 100)
+        # Curva ABC já traz o percentual acumulado sobre toda a base de clientes
+        df = self.analise.analise_curva_abc('clientes', formatar=False).head(top_n)
+        df['valor_num'] = df['valor_total']
         
         # Criar subplot com eixos secundários
         fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -803,37 +798,23 @@ class GraficosVendas:
     
     def grafico_sazonalidade_heatmap(self) -> go.Figure:
         """15. Heatmap - Sazonalidade por ano e mês"""
-        df = self.analise.analise_sazonalidade()
-        
-        # Extrair valores
-        df['valor_num'] = df['valor_total'].apply(self._extrair_valor_monetario)
-        df['indice_num'] = df['indice_sazonalidade'].apply(lambda x: float(str(x).replace(',', '.')))
-        
-        # Criar pivot table para o heatmap
-        pivot_valor = df.pivot_table(
-            values='valor_num',
-            index='mes_nome',
-            columns='ano',
-            aggfunc='sum',
-            fill_value=0
-        )
-        
-        # Ordenar meses corretamente
-        ordem_meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                      'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-        pivot_valor = pivot_valor.reindex([m for m in ordem_meses if m in pivot_valor.index])
+        # Matrizes mês × ano do perfil sazonal (sem reconverter textos formatados)
+        pivot_valor = self.analise.matriz_sazonal('receita')
+        pivot_indice = self.analise.matriz_sazonal('indice')
         
         fig = go.Figure(data=go.Heatmap(
             z=pivot_valor.values,
-            x=[f"{int(ano)}" if pd.notna(ano) else "" for ano in pivot_valor.columns],
+            x=[str(ano) for ano in pivot_valor.columns],
             y=pivot_valor.index,
             colorscale='RdYlGn',
             text=[[f"R$ {val:,.0f}" if val > 0 else "" for val in row] for row in pivot_valor.values],
             texttemplate='%{text}',
             textfont={"size": 10},
             colorbar=dict(title="Valor (R$)"),
+            customdata=pivot_indice.values,
             hovertemplate='<b>%{y} - %{x}</b><br>' +
                          'Valor: R$ %{z:,.2f}<br>' +
+                         'Índice: %{customdata:.1f}<br>' +
                          '<extra></extra>'
         ))
         
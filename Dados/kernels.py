@@ -0,0 +1,124 @@
+"""
+Kernels de agregação
+Somas, contagens e contagens distintas por chave com np.bincount sobre códigos inteiros densos,
+no lugar de DataFrame.groupby().agg() (com fallback para o groupby do pandas)
+"""
+from typing import Dict
+import numpy as np
+import pandas as pd
+
+
+# Chaves inteiras usam deslocamento direto quando a faixa (max - min) não passa de
+# FATOR_FAIXA_DENSA × quantidade de linhas + FOLGA_FAIXA_DENSA; acima disso, pd.factorize
+FATOR_FAIXA_DENSA = 4
+FOLGA_FAIXA_DENSA = 1024
+
+
+def codificar(chaves):
+    """
+    Converte chaves em códigos densos 0..n-1 na ordem crescente das chaves (como o groupby)
+
+    Returns:
+        (códigos int64 com -1 para chaves nulas, chaves distintas de cada código)
+    """
+    valores = np.asarray(chaves)
+    if valores.dtype.kind in 'iuf' and len(valores):
+        nulos = np.isnan(valores) if valores.dtype.kind == 'f' else None
+        presentes = valores if nulos is None or not nulos.any() else valores[~nulos]
+        inteiros = valores.dtype.kind != 'f' or np.array_equal(presentes, np.floor(presentes))
+        if len(presentes) and inteiros:
+            minimo, maximo = int(presentes.min()), int(presentes.max())
+            if maximo - minimo <= FATOR_FAIXA_DENSA * len(valores) + FOLGA_FAIXA_DENSA:
+                return _codificar_faixa(valores, nulos, minimo, maximo)
+
+    codigos, unicos = pd.factorize(pd.Series(chaves), sort=True)
+    return codigos.astype(np.int64), np.asarray(unicos)
+
+
+def _codificar_faixa(valores: np.ndarray, nulos, minimo: int, maximo: int):
+    """Códigos por deslocamento (chave - mínimo), compactados só se houver chaves ausentes na faixa"""
+    tem_nulos = nulos is not None and nulos.any()
+    deslocamento = (np.where(nulos, minimo, valores) if tem_nulos else valores).astype(np.int64) - minimo
+    presentes = np.bincount(deslocamento, minlength=maximo - minimo + 1) > 0
+    if tem_nulos:
+        presentes[0] = presentes[0] and bool((valores[~nulos] == minimo).any())
+
+    unicos = (np.arange(maximo - minimo + 1) + minimo)[presentes].astype(valores.dtype)
+    codigos = deslocamento if presentes.all() else (np.cumsum(presentes) - 1)[deslocamento]
+    if tem_nulos:
+        codigos[nulos] = -1
+    return codigos, unicos
+
+
+def somar(codigos: np.ndarray, n: int, valores) -> np.ndarray:
+    """Soma dos valores por código (códigos -1 e valores nulos são ignorados, como no groupby)"""
+    pesos = np.asarray(valores, dtype=float)
+    if np.isnan(pesos).any():
+        pesos = np.nan_to_num(pesos)
+    if len(codigos) and codigos.min() < 0:
+        validos = codigos >= 0
+        codigos, pesos = codigos[validos], pesos[validos]
+    return np.bincount(codigos, weights=pesos, minlength=n)
+
+
+def contar(codigos: np.ndarray, n: int) -> np.ndarray:
+    """Quantidade de linhas por código"""
+    if len(codigos) and codigos.min() < 0:
+        codigos = codigos[codigos >= 0]
+    return np.bincount(codigos, minlength=n)
+
+
+def contar_distintos(codigos: np.ndarray, n: int, outros) -> np.ndarray:
+    """Quantidade de valores distintos de outros por código (nunique)"""
+    outros_codigos, outros_unicos = codificar(outros)
+    validos = (codigos >= 0) & (outros_codigos >= 0)
+    largura = max(len(outros_unicos), 1)
+    pares = np.unique(codigos[validos] * largura + outros_codigos[validos])
+    return np.bincount(pares // largura, minlength=n)
+
+
+def agregar(chaves, nome_chave: str, somas: Dict[str, object] = None, contagem: str = None,
+            distintos: Dict[str, object] = None) -> pd.DataFrame:
+    """
+    Agregação por uma chave, equivalente a groupby(chave).agg(...).reset_index()
+
+    Args:
+        chaves: Chave de cada linha
+        nome_chave: Nome da coluna da chave no resultado
+        somas: {coluna do resultado: valores a somar}
+        contagem: Nome da coluna com a quantidade de linhas (opcional)
+        distintos: {coluna do resultado: valores cujos distintos são contados}
+
+    Returns:
+        DataFrame com uma linha por chave não nula, em ordem crescente de chave
+    """
+    somas, distintos = somas or {}, distintos or {}
+    if any(np.asarray(valores).dtype.kind not in 'biuf' for valores in somas.values()):
+        return _agregar_pandas(chaves, nome_chave, somas, contagem, distintos)
+
+    codigos, unicos = codificar(chaves)
+    n = len(unicos)
+    colunas = {nome_chave: unicos}
+    for nome, valores in somas.items():
+        colunas[nome] = somar(codigos, n, valores)
+    if contagem is not None:
+        colunas[contagem] = contar(codigos, n)
+    for nome, valores in distintos.items():
+        colunas[nome] = contar_distintos(codigos, n, valores)
+    return pd.DataFrame(colunas)
+
+
+def _agregar_pandas(chaves, nome_chave: str, somas: Dict[str, object], contagem: str,
+                    distintos: Dict[str, object]) -> pd.DataFrame:
+    """Fallback com groupby do pandas para valores que o bincount não soma (ex.: não numéricos)"""
+    df = pd.DataFrame({nome_chave: np.asarray(chaves)})
+    especificacao = {}
+    for nome, valores in somas.items():
+        df[nome] = np.asarray(valores)
+        especificacao[nome] = (nome, 'sum')
+    if contagem is not None:
+        especificacao[contagem] = (nome_chave, 'size')
+    for nome, valores in distintos.items():
+        df[f"_{nome}"] = np.asarray(valores)
+        especificacao[nome] = (f"_{nome}", 'nunique')
+    return df.groupby(nome_chave).agg(**especificacao).reset_index()
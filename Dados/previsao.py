@@ -0,0 +1,83 @@
+"""
+Previsão de vendas
+Holt-Winters aditivo (tendência amortecida) ajustado de uma vez para várias séries empilhadas
+"""
+import numpy as np
+
+
+def holt_winters(series: np.ndarray, horizonte: int, periodo: int = 12, alpha: float = 0.3,
+                 beta: float = 0.1, gama: float = 0.3, phi: float = 0.9):
+    """
+    Ajusta Holt-Winters aditivo a cada linha da matriz e projeta os próximos períodos
+
+    O laço percorre o tempo; cada passo atualiza todas as séries em operações vetorizadas.
+    Com menos de dois ciclos sazonais de histórico usa sazonal ingênuo com tendência.
+
+    Args:
+        series: Matriz séries × períodos (todas na mesma linha do tempo, sem lacunas)
+        horizonte: Quantidade de períodos a prever
+        periodo: Tamanho do ciclo sazonal (12 para dados mensais)
+        alpha, beta, gama: Suavização do nível, da tendência e da sazonalidade
+        phi: Amortecimento da tendência (1 = tendência linear)
+
+    Returns:
+        (previsão séries × horizonte, desvio-padrão do erro um passo à frente de cada série)
+    """
+    series = np.asarray(series, dtype=float)
+    n_series, n_periodos = series.shape
+    passos = np.arange(1, horizonte + 1)
+
+    if n_periodos < 2 * periodo:
+        return _sazonal_ingenuo(series, horizonte, periodo)
+
+    # Inicialização pelos dois primeiros ciclos
+    media_1 = series[:, :periodo].mean(axis=1)
+    media_2 = series[:, periodo:2 * periodo].mean(axis=1)
+    nivel = media_1
+    tendencia = (media_2 - media_1) / periodo
+    sazonal = series[:, :periodo] - media_1[:, None]
+
+    erros = np.empty((n_series, n_periodos))
+    for t in range(n_periodos):
+        s = sazonal[:, t % periodo]
+        y = series[:, t]
+        erros[:, t] = y - (nivel + phi * tendencia + s)
+        nivel_anterior = nivel
+        nivel = alpha * (y - s) + (1 - alpha) * (nivel + phi * tendencia)
+        tendencia = beta * (nivel - nivel_anterior) + (1 - beta) * phi * tendencia
+        sazonal[:, t % periodo] = gama * (y - nivel) + (1 - gama) * s
+
+    # Tendência amortecida acumulada: phi + phi² + ... + phi^h
+    amortecimento = np.cumsum(phi ** passos)
+    indices_sazonais = (n_periodos + passos - 1) % periodo
+    previsao = nivel[:, None] + amortecimento[None, :] * tendencia[:, None] + sazonal[:, indices_sazonais]
+
+    # O primeiro ciclo serviu de inicialização: fica fora do erro
+    desvio = erros[:, periodo:].std(axis=1)
+    return previsao, desvio
+
+
+def _sazonal_ingenuo(series: np.ndarray, horizonte: int, periodo: int):
+    """Repete o último ciclo somando a tendência média do histórico (ou a média, se não há um ciclo)"""
+    n_series, n_periodos = series.shape
+    passos = np.arange(1, horizonte + 1)
+
+    if n_periodos < periodo:
+        media = series.mean(axis=1) if n_periodos else np.zeros(n_series)
+        desvio = series.std(axis=1) if n_periodos else np.zeros(n_series)
+        return np.repeat(media[:, None], horizonte, axis=1), desvio
+
+    ultimo_ciclo = series[:, n_periodos - periodo:]
+    tendencia = (series[:, -1] - series[:, 0]) / max(n_periodos - 1, 1)
+    indices = (passos - 1) % periodo
+    previsao = ultimo_ciclo[:, indices] + tendencia[:, None] * passos[None, :]
+
+    # Erro do próprio método nos períodos em que há um ciclo anterior
+    erros = series[:, periodo:] - series[:, :-periodo] if n_periodos > periodo else series - series.mean(axis=1, keepdims=True)
+    return previsao, erros.std(axis=1)
+
+
+def intervalo_previsao(previsao: np.ndarray, desvio: np.ndarray, z: float = 1.96):
+    """Faixa de confiança aproximada que se alarga com a raiz do horizonte (limitada a zero embaixo)"""
+    margem = z * desvio[:, None] * np.sqrt(np.arange(1, previsao.shape[1] + 1))[None, :]
+    return np.maximum(previsao - margem, 0), previsao + margem
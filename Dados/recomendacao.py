@@ -0,0 +1,133 @@
+"""
+Índice "comprados juntos"
+Vizinhos de co-compra pré-calculados por produto, consultados em O(k)
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from .cesta import matriz_pedido_produto
+
+
+def _assinatura(id_pedido, id_produto) -> int:
+    """Soma de hashes das linhas (pedido, produto): detecta alteração em pedidos já indexados"""
+    linhas = pd.DataFrame({'id_pedido': np.asarray(id_pedido), 'id_produto': np.asarray(id_produto)})
+    return int(pd.util.hash_pandas_object(linhas, index=False).to_numpy().sum(dtype=np.uint64))
+
+
+class IndiceRecomendacao:
+    """Top-k produtos mais comprados junto com cada produto (imutável; atualizações geram novo índice)"""
+
+    def __init__(self, produtos: np.ndarray, coocorrencia: sparse.csr_matrix, n_pedidos: int,
+                 pedidos: np.ndarray, n_linhas: int, assinatura: int, k: int = 10):
+        self.produtos = produtos
+        self.posicao = pd.Index(produtos)
+        self.coocorrencia = coocorrencia
+        self.pedidos_produto = coocorrencia.diagonal()
+        self.n_pedidos = n_pedidos
+        self.pedidos = pedidos
+        self.n_linhas = n_linhas
+        self.assinatura = assinatura
+        self.k = k
+        self.vizinhos = np.full((len(produtos), k), -1, dtype=np.int64)
+        self.juntos = np.zeros((len(produtos), k), dtype=np.int64)
+        self._calcular_vizinhos(np.arange(len(produtos)))
+
+    @classmethod
+    def construir(cls, id_pedido, id_produto, k: int = 10) -> 'IndiceRecomendacao':
+        """Constrói o índice a partir das linhas de item (pedido, produto)"""
+        id_pedido, id_produto = np.asarray(id_pedido), np.asarray(id_produto)
+        matriz, produtos = matriz_pedido_produto(id_pedido, id_produto)
+        return cls(
+            produtos, (matriz.T @ matriz).tocsr(), matriz.shape[0],
+            np.unique(id_pedido), len(id_pedido), _assinatura(id_pedido, id_produto), k
+        )
+
+    def cobre(self, id_pedido, id_produto) -> bool:
+        """Indica se as linhas (pedido, produto) são exatamente as já indexadas (mesma contagem e assinatura)"""
+        return len(id_pedido) == self.n_linhas and _assinatura(id_pedido, id_produto) == self.assinatura
+
+    def atualizar(self, id_pedido, id_produto) -> 'IndiceRecomendacao':
+        """
+        Retorna um novo índice somando as linhas de pedidos novos (este índice não é alterado)
+
+        Só os produtos presentes nos pedidos novos têm seus vizinhos recalculados.
+        """
+        id_pedido, id_produto = np.asarray(id_pedido), np.asarray(id_produto)
+        if len(id_pedido) == 0:
+            return self
+
+        # Produtos inéditos ganham colunas no final, preservando os códigos existentes
+        ineditos = pd.unique(id_produto[self.posicao.get_indexer(id_produto) < 0])
+        produtos = np.concatenate([self.produtos, ineditos]) if len(ineditos) else self.produtos
+        n = len(produtos)
+        codigos = pd.Index(produtos).get_indexer(id_produto)
+        codigos_pedido, pedidos_novos = pd.factorize(pd.Series(id_pedido))
+
+        matriz = sparse.csr_matrix(
+            (np.ones(len(codigos), dtype=np.int32), (codigos_pedido, codigos)),
+            shape=(len(pedidos_novos), n)
+        )
+        matriz.sum_duplicates()
+        matriz.data[:] = 1
+
+        # Co-ocorrência anterior redimensionada (linhas novas vazias) + contribuição dos pedidos novos
+        anterior = self.coocorrencia
+        indptr = np.concatenate([anterior.indptr, np.full(n - anterior.shape[0], anterior.indptr[-1])])
+        anterior = sparse.csr_matrix((anterior.data, anterior.indices, indptr), shape=(n, n))
+
+        novo = IndiceRecomendacao.__new__(IndiceRecomendacao)
+        novo.produtos = produtos
+        novo.posicao = pd.Index(produtos)
+        novo.coocorrencia = (anterior + (matriz.T @ matriz)).tocsr()
+        novo.pedidos_produto = novo.coocorrencia.diagonal()
+        novo.n_pedidos = self.n_pedidos + len(pedidos_novos)
+        novo.pedidos = np.union1d(self.pedidos, np.asarray(pedidos_novos))
+        novo.n_linhas = self.n_linhas + len(id_pedido)
+        novo.assinatura = (self.assinatura + _assinatura(id_pedido, id_produto)) % (1 << 64)
+        novo.k = self.k
+        novo.vizinhos = np.full((n, self.k), -1, dtype=np.int64)
+        novo.juntos = np.zeros((n, self.k), dtype=np.int64)
+        novo.vizinhos[:len(self.produtos)] = self.vizinhos
+        novo.juntos[:len(self.produtos)] = self.juntos
+        novo._calcular_vizinhos(np.unique(codigos))
+        return novo
+
+    def _calcular_vizinhos(self, linhas: np.ndarray):
+        """Recalcula os top-k vizinhos das linhas informadas (mais pedidos em comum, depois menor código)"""
+        if len(linhas) == 0:
+            return
+        sub = self.coocorrencia[linhas].tocoo()
+        manter = sub.col != linhas[sub.row]
+        linha, coluna, juntos = sub.row[manter], sub.col[manter], sub.data[manter]
+
+        ordem = np.lexsort((coluna, -juntos, linha))
+        linha, coluna, juntos = linha[ordem], coluna[ordem], juntos[ordem]
+
+        # Posição de cada entrada dentro da sua linha; mantém as k primeiras
+        rank = np.arange(len(linha)) - np.searchsorted(linha, linha, side='left')
+        topo = rank < self.k
+
+        self.vizinhos[linhas] = -1
+        self.juntos[linhas] = 0
+        self.vizinhos[linhas[linha[topo]], rank[topo]] = coluna[topo]
+        self.juntos[linhas[linha[topo]], rank[topo]] = juntos[topo]
+
+    def consultar(self, id_produto, k: int = None) -> pd.DataFrame:
+        """Vizinhos de co-compra de um produto, com pedidos em comum, confiança e lift (O(k))"""
+        colunas = ['id_produto', 'pedidos_juntos', 'confianca', 'lift']
+        if id_produto not in self.posicao:
+            return pd.DataFrame(columns=colunas)
+
+        linha = self.posicao.get_loc(id_produto)
+        k = self.k if k is None else min(k, self.k)
+        vizinhos = self.vizinhos[linha, :k]
+        vizinhos = vizinhos[vizinhos >= 0]
+        juntos = self.juntos[linha, :len(vizinhos)]
+
+        base = self.pedidos_produto[linha]
+        return pd.DataFrame({
+            'id_produto': self.produtos[vizinhos],
+            'pedidos_juntos': juntos,
+            'confianca': juntos / base,
+            'lift': juntos * self.n_pedidos / (base * self.pedidos_produto[vizinhos]),
+        })
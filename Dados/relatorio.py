@@ -0,0 +1,136 @@
+"""
+Relatório consolidado das análises
+Executa as análises independentes em paralelo sobre um mesmo snapshot
+(somente leitura) e registra o tempo de execução de cada uma
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any
+import pandas as pd
+
+
+# (seção, chave, título, função que recebe o snapshot)
+ANALISES_RELATORIO = [
+    ('ANÁLISES DE CLIENTES', 'clientes_por_sexo', 'Distribuição por Sexo',
+     lambda a: a.analise_clientes_por_sexo()),
+    ('ANÁLISES DE CLIENTES', 'clientes_por_regiao', 'Distribuição por Região (Top 10)',
+     lambda a: a.analise_clientes_por_regiao().head(10)),
+    ('ANÁLISES DE CLIENTES', 'compras_por_canal', 'Compras por Canal',
+     lambda a: a.analise_compras_por_canal_cliente().head(10)),
+    ('ANÁLISES DE CLIENTES', 'clientes_mais_valiosos', 'Top 20 Clientes Mais Valiosos',
+     lambda a: a.analise_clientes_mais_valiosos(20)),
+    ('ANÁLISES DE PRODUTOS', 'top_produtos', 'Top 10 Produtos Mais Vendidos',
+     lambda a: a.analise_top_produtos_mais_vendidos(10)),
+    ('ANÁLISES DE PRODUTOS', 'vendas_por_segmento', 'Vendas por Segmento',
+     lambda a: a.analise_vendas_por_segmento()),
+    ('ANÁLISES DE PRODUTOS', 'cores_mais_vendidas', 'Cores Mais Vendidas',
+     lambda a: a.analise_cores_mais_vendidas()),
+    ('ANÁLISES DE PRODUTOS', 'top_cosmeticos', 'Top 5 Cosméticos',
+     lambda a: a.analise_top_cosmeticos(5)),
+    ('ANÁLISES DE PRODUTOS', 'top_cadeiras_lavatorios', 'Top 5 Cadeiras e Lavatórios',
+     lambda a: a.analise_top_cadeiras_lavatorios(5)),
+    ('ANÁLISES DE VENDAS', 'vendas_por_ano', 'Vendas por Ano',
+     lambda a: a.analise_vendas_por_ano()),
+    ('ANÁLISES DE VENDAS', 'vendas_por_canal', 'Vendas por Canal',
+     lambda a: a.analise_vendas_por_canal()),
+    ('ANÁLISES DE VENDAS', 'vendas_por_forma_pagamento', 'Vendas por Forma de Pagamento',
+     lambda a: a.analise_vendas_por_forma_pagamento()),
+    ('ANÁLISES DE VENDAS', 'totais_gerais', 'Totais Gerais',
+     lambda a: a.analise_total_vendas_geral()),
+    ('ANÁLISES DE VENDAS', 'top3_por_segmento', 'Top 3 por Segmento',
+     lambda a: a.analise_top3_por_segmento()),
+    ('ANÁLISES DE VENDAS', 'sazonalidade', 'Sazonalidade por Ano e Mês',
+     lambda a: a.analise_sazonalidade()),
+]
+
+
+def _executar_analise(analise, chave: str, funcao) -> Dict[str, Any]:
+    """Executa uma análise e mede o tempo de parede; erros ficam registrados no resultado"""
+    inicio = time.perf_counter()
+    try:
+        resultado, erro = funcao(analise), None
+    except Exception as e:
+        resultado, erro = None, str(e)
+    return {
+        'chave': chave,
+        'resultado': resultado,
+        'erro': erro,
+        'tempo_s': time.perf_counter() - inicio
+    }
+
+
+def executar_relatorio(analise, max_workers: int = None) -> Dict[str, Any]:
+    """
+    Executa todas as análises do relatório em um pool de threads
+
+    Args:
+        analise: Snapshot de AnaliseDados compartilhado (somente leitura) entre os workers
+        max_workers: Tamanho do pool (padrão do ThreadPoolExecutor; 1 executa em sequência)
+
+    Returns:
+        Dicionário com data de geração, tempo total e a lista de análises
+        (seção, chave, título, resultado, erro e tempo em segundos), na ordem do relatório
+    """
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='relatorio') as pool:
+        futuros = [
+            (secao, titulo, pool.submit(_executar_analise, analise, chave, funcao))
+            for secao, chave, titulo, funcao in ANALISES_RELATORIO
+        ]
+        analises = [dict(futuro.result(), secao=secao, titulo=titulo) for secao, titulo, futuro in futuros]
+
+    return {
+        'gerado_em': datetime.now(),
+        'versao_dados': getattr(analise, 'versao_dados', None),
+        'tempo_total_s': time.perf_counter() - inicio,
+        'analises': analises
+    }
+
+
+def imprimir_relatorio(relatorio: Dict[str, Any]):
+    """Exibe o relatório no formato do executar_todas_analises, com o tempo de cada análise"""
+    secao_atual = None
+    for numero, item in enumerate(relatorio['analises'], start=1):
+        if item['secao'] != secao_atual:
+            secao_atual = item['secao']
+            print("\n" + "=" * 80)
+            print(secao_atual.center(80))
+            print("=" * 80)
+
+        print(f"\n{numero}. {item['titulo']}: ({item['tempo_s']:.3f}s)")
+        resultado = item['resultado']
+
+        if item['erro'] is not None:
+            print(f"Erro: {item['erro']}")
+        elif isinstance(resultado, dict):
+            for key, value in resultado.items():
+                print(f"{key}: {value}")
+        elif item['chave'] == 'sazonalidade':
+            # Exibir de forma organizada por ano
+            for ano in sorted(resultado['ano'].dropna().unique()):
+                print(f"\n--- Ano {int(ano)} ---")
+                print(resultado[resultado['ano'] == ano].to_string(index=False))
+        else:
+            print(resultado)
+
+    print("\n" + "=" * 80)
+    print(resumo_tempos(relatorio).to_string(index=False))
+    print(f"\nTempo total: {relatorio['tempo_total_s']:.3f}s")
+
+
+def resumo_tempos(relatorio: Dict[str, Any]) -> pd.DataFrame:
+    """Tempo de parede de cada análise, da mais lenta para a mais rápida"""
+    tempos = pd.DataFrame(
+        [(item['chave'], item['tempo_s'], item['erro'] is None) for item in relatorio['analises']],
+        columns=['analise', 'tempo_s', 'sucesso']
+    )
+    tempos['tempo_s'] = tempos['tempo_s'].round(4)
+    return tempos.sort_values('tempo_s', ascending=False)
+
+
+# Execução em lote (relatório noturno)
+if __name__ == "__main__":
+    from .snapshot import obter_snapshot
+
+    imprimir_relatorio(executar_relatorio(obter_snapshot()))
@@ -0,0 +1,180 @@
+"""
+Sketches para o modo aproximado
+HyperLogLog (contagem de distintos) e DDSketch (quantis com erro relativo garantido).
+Ambos são mergeáveis: sketches de partições ou períodos diferentes se unem sem rever os dados.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _hash64(valores) -> np.ndarray:
+    """Hash de 64 bits de cada valor (estável entre execuções)"""
+    return pd.util.hash_array(np.asarray(valores))
+
+
+# ==================== HYPERLOGLOG ====================
+
+def _indices_e_postos(valores, p: int):
+    """Registrador (p bits mais altos do hash) e posto do primeiro bit 1 nos 32 bits seguintes"""
+    h = _hash64(valores)
+    indices = (h >> np.uint64(64 - p)).astype(np.int64)
+    resto = ((h >> np.uint64(32 - p)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # frexp devolve o número de bits significativos (exato para inteiros de 32 bits); resto 0 → posto 33
+    postos = (33 - np.frexp(resto)[1]).astype(np.uint8)
+    return indices, postos
+
+
+def estimar_registros(registros: np.ndarray) -> np.ndarray:
+    """Estimativa HyperLogLog de cada linha de uma matriz de registradores (com correção para poucos itens)"""
+    registros = np.atleast_2d(registros)
+    m = registros.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimativa = alpha * m * m / np.sum(np.ldexp(1.0, -registros.astype(np.int64)), axis=1)
+
+    vazios = np.count_nonzero(registros == 0, axis=1)
+    contagem_linear = m * np.log(m / np.maximum(vazios, 1))
+    return np.where((estimativa <= 2.5 * m) & (vazios > 0), contagem_linear, estimativa)
+
+
+class HyperLogLog:
+    """Contagem aproximada de distintos com erro relativo típico de 1,04/√(2^p)"""
+
+    def __init__(self, p: int = 12, registros: np.ndarray = None):
+        if not 4 <= p <= 18:
+            raise ValueError("p deve estar entre 4 e 18")
+        self.p = p
+        self.registros = np.zeros(1 << p, dtype=np.uint8) if registros is None else registros
+
+    @property
+    def erro_relativo(self) -> float:
+        """Erro padrão relativo da estimativa"""
+        return 1.04 / np.sqrt(1 << self.p)
+
+    def adicionar(self, valores) -> 'HyperLogLog':
+        """Inclui os valores no sketch (vetorizado)"""
+        indices, postos = _indices_e_postos(valores, self.p)
+        np.maximum.at(self.registros, indices, postos)
+        return self
+
+    def unir(self, outro: 'HyperLogLog') -> 'HyperLogLog':
+        """Sketch da união dos dois conjuntos (máximo dos registradores)"""
+        if outro.p != self.p:
+            raise ValueError("Só é possível unir sketches com o mesmo p")
+        return HyperLogLog(self.p, np.maximum(self.registros, outro.registros))
+
+    def estimar(self) -> float:
+        """Quantidade aproximada de valores distintos"""
+        return float(estimar_registros(self.registros)[0])
+
+    @staticmethod
+    def por_grupo(codigos: np.ndarray, n: int, valores, p: int = 12) -> np.ndarray:
+        """Registradores de um sketch por grupo (matriz n × 2^p); linhas se unem com np.maximum"""
+        registros = np.zeros((n, 1 << p), dtype=np.uint8)
+        validos = codigos >= 0
+        indices, postos = _indices_e_postos(np.asarray(valores)[validos], p)
+        np.maximum.at(registros, (codigos[validos], indices), postos)
+        return registros
+
+
+# ==================== DDSKETCH ====================
+
+class DDSketch:
+    """
+    Quantis aproximados com erro relativo máximo alpha (DDSketch)
+
+    Cada valor positivo cai no balde ceil(log_γ(x)), γ = (1 + α) / (1 - α); baldes são contagens
+    em um vetor denso, então inserir é um bincount e unir é uma soma de vetores.
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self.gama = (1 + alpha) / (1 - alpha)
+        self._log_gama = np.log(self.gama)
+        self.zeros = 0
+        # (chave do primeiro balde, contagens) para os valores positivos e para |x| dos negativos
+        self.positivos = (0, np.zeros(0, dtype=np.int64))
+        self.negativos = (0, np.zeros(0, dtype=np.int64))
+
+    @property
+    def erro_relativo(self) -> float:
+        """Erro relativo máximo de qualquer quantil"""
+        return self.alpha
+
+    @property
+    def quantidade(self) -> int:
+        """Total de valores no sketch"""
+        return int(self.zeros + self.positivos[1].sum() + self.negativos[1].sum())
+
+    def adicionar(self, valores) -> 'DDSketch':
+        """Inclui os valores no sketch (valores nulos são ignorados)"""
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        self.zeros += int(np.count_nonzero(valores == 0))
+        self.positivos = self._somar_baldes(self.positivos, self._baldes(valores[valores > 0]))
+        self.negativos = self._somar_baldes(self.negativos, self._baldes(-valores[valores < 0]))
+        return self
+
+    def unir(self, outro: 'DDSketch') -> 'DDSketch':
+        """Sketch com os valores dos dois (soma das contagens de cada balde)"""
+        if outro.alpha != self.alpha:
+            raise ValueError("Só é possível unir sketches com o mesmo alpha")
+        unido = DDSketch(self.alpha)
+        unido.zeros = self.zeros + outro.zeros
+        unido.positivos = self._somar_baldes(self.positivos, outro.positivos)
+        unido.negativos = self._somar_baldes(self.negativos, outro.negativos)
+        return unido
+
+    def quantil(self, q: float) -> float:
+        """Valor aproximado do quantil q (0 a 1)"""
+        n = self.quantidade
+        if n == 0:
+            return float('nan')
+        posto = q * (n - 1)
+
+        # Ordem crescente: negativos (do maior |x| ao menor), zeros, positivos
+        inicio_neg, contagens_neg = self.negativos
+        acumulado = np.cumsum(contagens_neg[::-1])
+        if len(acumulado) and posto < acumulado[-1]:
+            chave = inicio_neg + len(contagens_neg) - 1 - int(np.searchsorted(acumulado, posto, side='right'))
+            return -self._valor_balde(chave)
+        posto -= acumulado[-1] if len(acumulado) else 0
+
+        if posto < self.zeros:
+            return 0.0
+        posto -= self.zeros
+
+        inicio_pos, contagens_pos = self.positivos
+        acumulado = np.cumsum(contagens_pos)
+        indice = min(int(np.searchsorted(acumulado, posto, side='right')), len(contagens_pos) - 1)
+        return self._valor_balde(inicio_pos + indice)
+
+    def mediana(self) -> float:
+        """Mediana aproximada"""
+        return self.quantil(0.5)
+
+    def _baldes(self, valores: np.ndarray):
+        """Contagem por balde logarítmico dos valores positivos"""
+        if len(valores) == 0:
+            return 0, np.zeros(0, dtype=np.int64)
+        chaves = np.ceil(np.log(valores) / self._log_gama).astype(np.int64)
+        inicio = int(chaves.min())
+        return inicio, np.bincount(chaves - inicio)
+
+    def _valor_balde(self, chave: int) -> float:
+        """Representante do balde com erro relativo ≤ alpha para todo valor do balde"""
+        return 2 * self.gama ** chave / (self.gama + 1)
+
+    @staticmethod
+    def _somar_baldes(a, b):
+        """Soma dois vetores de baldes alinhando as chaves iniciais"""
+        (inicio_a, contagens_a), (inicio_b, contagens_b) = a, b
+        if len(contagens_a) == 0:
+            return b
+        if len(contagens_b) == 0:
+            return a
+        inicio = min(inicio_a, inicio_b)
+        fim = max(inicio_a + len(contagens_a), inicio_b + len(contagens_b))
+        soma = np.zeros(fim - inicio, dtype=np.int64)
+        soma[inicio_a - inicio:inicio_a - inicio + len(contagens_a)] += contagens_a
+        soma[inicio_b - inicio:inicio_b - inicio + len(contagens_b)] += contagens_b
+        return inicio, soma
@@ -0,0 +1,75 @@
+"""
+Snapshots imutáveis das análises
+Compartilha uma instância de AnaliseDados entre sessões e threads e publica
+versões atualizadas trocando a referência atomicamente. Os frames do snapshot e os
+resultados em cache nunca são alterados: quem precisa alterar um deles trabalha numa cópia.
+A única exceção é o detector de anomalias, alimentado por registrar_pedido entre duas
+publicações; ele serializa escritas e leituras com a própria trava
+"""
+import threading
+from .analises import AnaliseDados
+from .transformacao import Transformacao
+
+
+class GerenciadorSnapshots:
+    """Mantém o snapshot publicado e o substitui por um novo a cada atualização"""
+
+    def __init__(self):
+        self._transformacao = None
+        self._atual = None
+        self._trava_publicacao = threading.Lock()
+
+    def atual(self) -> AnaliseDados:
+        """
+        Retorna o snapshot publicado (leitura sem trava)
+
+        O leitor deve guardar a referência e usá-la durante toda a requisição:
+        uma atualização concorrente publica outro objeto e nunca altera este.
+        """
+        snapshot = self._atual
+        if snapshot is None:
+            with self._trava_publicacao:
+                if self._atual is None:
+                    self._atual = self._criar_snapshot()
+                snapshot = self._atual
+        return snapshot
+
+    def atualizar(self) -> AnaliseDados:
+        """Constrói um snapshot novo a partir do banco e o publica com uma troca atômica de referência"""
+        with self._trava_publicacao:
+            novo = self._criar_snapshot()
+            if self._atual is not None:
+                novo.herdar_indices(self._atual)
+            # Materializa os dados principais antes de publicar: leitores nunca veem carga parcial
+            novo.df_pedidos
+            novo.df_vendas
+            self._atual = novo
+        return novo
+
+    def _criar_snapshot(self) -> AnaliseDados:
+        """Cria uma instância de AnaliseDados reutilizando a mesma conexão com o MongoDB"""
+        if self._transformacao is None:
+            self._transformacao = Transformacao()
+        return AnaliseDados(transformacao=self._transformacao)
+
+
+# Gerenciador compartilhado pelo processo (páginas Streamlit e ferramentas do agente)
+_gerenciador = GerenciadorSnapshots()
+
+
+def obter_snapshot() -> AnaliseDados:
+    """Snapshot atual das análises"""
+    return _gerenciador.atual()
+
+
+def atualizar_snapshot() -> AnaliseDados:
+    """Recarrega os dados do banco e publica um novo snapshot"""
+    return _gerenciador.atualizar()
+
+
+def registrar_pedido(data_pedido, valor_total: float, forma_pagamento: str = None, canal_venda: str = None):
+    """Alimenta o detector de anomalias do snapshot publicado com um pedido recém-gravado"""
+    # Sem snapshot publicado não há o que atualizar: o próximo já lerá o pedido do banco
+    snapshot = _gerenciador._atual
+    if snapshot is not None:
+        snapshot.registrar_pedido(data_pedido, valor_total, forma_pagamento, canal_venda)
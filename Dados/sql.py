@@ -0,0 +1,266 @@
+"""
+Motor SQL embutido (DuckDB, opcional)
+Registra as tabelas preparadas do snapshot em uma conexão DuckDB em processo e executa as
+consultas declarativas (Dados.consulta) como SQL: execução vetorizada em vários núcleos e
+com transbordo para disco quando a memória configurada acaba, sem servidor de banco separado
+"""
+import os
+import tempfile
+import threading
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from .consulta import (DIMENSAO_DATA, DIMENSOES_CONSULTA, METRICAS_CONSULTA, normalizar_filtro_data,
+                       converter_valor)
+
+
+# Configuração: CONECTA_DUCKDB_THREADS (padrão: todos os núcleos), CONECTA_DUCKDB_MEMORIA (ex.: '2GB')
+# e CONECTA_DUCKDB_TEMP (diretório de transbordo)
+DIRETORIO_TRANSBORDO = os.path.join(tempfile.gettempdir(), 'conecta_duckdb')
+
+# Dimensão -> (expressão do rótulo, expressão de agrupamento/ordem); a ordem reproduz a do pandas
+# (rótulos em ordem crescente; UF e cidade na ordem da dimensão geográfica)
+EXPRESSOES_DIMENSAO = {
+    'ano': ('CAST(p.ano AS BIGINT)', 'CAST(p.ano AS BIGINT)'),
+    'mes': ('CAST(p.mes AS BIGINT)', 'CAST(p.mes AS BIGINT)'),
+    'canal_venda': ('p.canal_venda', 'p.canal_venda'),
+    'forma_pagamento': ('p.forma_pagamento', 'p.forma_pagamento'),
+    'id_pedido': ('p.id_pedido', 'p.id_pedido'),
+    'id_cliente': ('p.id_cliente', 'p.id_cliente'),
+    'nome_cliente': ('c.nome', 'c.nome'),
+    'sexo': ('c.sexo', 'c.sexo'),
+    'uf': ('u.uf', 'p.codigo_uf'),
+    'estado': ('u.estado', 'p.codigo_uf'),
+    'cidade': ('g.cidade', 'p.codigo_cidade'),
+    'id_produto': ('pr.id_produto', 'pr.id_produto'),
+    'nome_produto': ('pr.nome_produto', 'pr.nome_produto'),
+    'categoria': ('pr.categoria', 'pr.categoria'),
+    'grupo_categoria': ('pr.grupo_categoria', 'pr.grupo_categoria'),
+    'fornecedor': ('pr.fornecedor', 'pr.fornecedor'),
+    'nome_cor': ('co.nome_cor', 'co.nome_cor'),
+}
+
+# Junções a partir dos itens (v), incluídas só quando a consulta usa o alias
+JUNCOES = {
+    'p': "LEFT JOIN pedidos p ON p.id_pedido = v.id_pedido",
+    'c': "LEFT JOIN clientes c ON c.id_cliente = p.id_cliente",
+    'u': "LEFT JOIN ufs u ON u.codigo_uf = p.codigo_uf",
+    'g': "LEFT JOIN cidades g ON g.codigo_cidade = p.codigo_cidade",
+    'pr': "LEFT JOIN produtos pr ON pr.id_produto = v.id_produto",
+    'co': "LEFT JOIN cores co ON co.id_cor = v.id_cor",
+}
+DEPENDENCIAS_JUNCAO = {'c': 'p', 'u': 'p', 'g': 'p'}
+
+# Métricas base calculadas no SQL; ticket_medio e preco_medio saem delas como no pandas
+EXPRESSOES_METRICA = {
+    'receita': 'COALESCE(SUM(v.subtotal), 0)',
+    'quantidade': 'CAST(COALESCE(SUM(v.quantidade), 0) AS BIGINT)',
+    'itens': 'COUNT(*)',
+    'pedidos': 'COUNT(DISTINCT p.id_pedido)',
+    'clientes': 'COUNT(DISTINCT p.id_cliente)',
+    'produtos': 'COUNT(DISTINCT v.id_produto)',
+}
+
+OPERADORES_SQL = {'==': '=', '!=': '<>', '>': '>', '>=': '>=', '<': '<', '<=': '<='}
+
+# Consultas conferidas por verificar_equivalencia (todas as métricas, dimensões e tipos de filtro)
+CONSULTAS_EQUIVALENCIA = (
+    {'metricas': list(METRICAS_CONSULTA)},
+    {'metricas': list(METRICAS_CONSULTA), 'por': ['canal_venda', 'ano']},
+    {'metricas': ['receita', 'pedidos', 'clientes'], 'por': ['ano', 'mes']},
+    {'metricas': ['receita', 'quantidade', 'produtos'], 'por': ['grupo_categoria', 'categoria']},
+    {'metricas': ['receita', 'ticket_medio'], 'por': ['uf', 'cidade']},
+    {'metricas': ['receita', 'clientes'], 'por': ['estado', 'sexo']},
+    {'metricas': ['pedidos', 'receita'], 'por': ['id_cliente', 'nome_cliente', 'sexo', 'canal_venda'],
+     'ordenar_por': 'receita'},
+    {'metricas': ['quantidade', 'receita'], 'por': ['id_cliente', 'nome_cliente', 'sexo', 'categoria']},
+    {'metricas': ['quantidade', 'preco_medio'], 'por': ['nome_cor', 'forma_pagamento']},
+    {'metricas': ['receita', 'itens'], 'por': ['id_produto', 'nome_produto', 'fornecedor'], 'top': 10},
+    {'metricas': ['receita', 'pedidos'], 'por': ['mes'],
+     'onde': {DIMENSAO_DATA: {'>=': '2023-01-01', '<': '2023-07-01'}, 'ano': {'>=': '2023'}}},
+    {'metricas': ['receita'], 'por': ['forma_pagamento'],
+     'onde': {'canal_venda': {'fora': ['Instagram']}, 'mes': [1, 2, 3], 'sexo': {'!=': 'M'}}},
+)
+
+
+def importar_duckdb():
+    """Importa o duckdb (dependência opcional, em requirements.txt) com erro claro se faltar"""
+    try:
+        import duckdb
+    except ImportError as erro:
+        raise ImportError(
+            "O motor 'duckdb' (motor='duckdb' ou CONECTA_MOTOR_CONSULTA=duckdb) precisa do pacote duckdb: "
+            "pip install -r requirements.txt (ou pip install duckdb)"
+        ) from erro
+    return duckdb
+
+
+class MotorSQL:
+    """Conexão DuckDB com as tabelas de um snapshot registradas (sem cópia, lidas do pandas)"""
+
+    def __init__(self, analise, threads: int = None, memoria: str = None, diretorio_transbordo: str = None):
+        duckdb = importar_duckdb()
+        configuracao = {
+            'threads': threads or int(os.getenv('CONECTA_DUCKDB_THREADS', os.cpu_count() or 1)),
+            'temp_directory': diretorio_transbordo or os.getenv('CONECTA_DUCKDB_TEMP', DIRETORIO_TRANSBORDO),
+        }
+        memoria = memoria or os.getenv('CONECTA_DUCKDB_MEMORIA')
+        if memoria:
+            configuracao['memory_limit'] = memoria
+        self._conexao = duckdb.connect(config=configuracao)
+        self._trava = threading.Lock()
+        for nome, df in self._tabelas(analise).items():
+            self._conexao.register(nome, df)
+
+    @staticmethod
+    def _tabelas(analise) -> Dict[str, pd.DataFrame]:
+        """Tabelas registradas; cadastros duplicados usam o primeiro registro, como no pandas"""
+        pedidos = analise.df_pedidos[['id_pedido', 'id_cliente', 'data_pedido', 'ano', 'mes',
+                                      'canal_venda', 'forma_pagamento']]
+        # UF e cidade de cada pedido vêm da dimensão geográfica (a normalização não é refeita em SQL)
+        codigo_uf, codigo_cidade = analise.geografia.codigos(pedidos['id_cliente'])
+        pedidos = pedidos.assign(codigo_uf=codigo_uf, codigo_cidade=codigo_cidade)
+        return {
+            'vendas': analise.df_vendas[['id_pedido', 'id_produto', 'id_cor', 'quantidade', 'subtotal']],
+            'pedidos': pedidos,
+            'clientes': analise.df_clientes.drop_duplicates('id_cliente')[['id_cliente', 'nome', 'sexo']],
+            'ufs': analise.geografia.ufs,
+            'cidades': analise.geografia.cidades,
+            'produtos': analise.df_produtos.drop_duplicates('id_produto')[
+                ['id_produto', 'nome_produto', 'categoria', 'grupo_categoria', 'fornecedor']],
+            'cores': analise.df_cor_produto.drop_duplicates('id_cor')[['id_cor', 'nome_cor']],
+        }
+
+    def executar(self, sql: str, parametros: list = None) -> pd.DataFrame:
+        """Executa o SQL e devolve o resultado como DataFrame (uma consulta por vez na conexão)"""
+        with self._trava:
+            return self._conexao.execute(sql, parametros or []).df()
+
+    def fechar(self):
+        """Fecha a conexão"""
+        self._conexao.close()
+
+
+def compilar_consulta(metricas: List[str], por: List[str], onde: Dict, numericas: Dict[str, bool]):
+    """
+    Traduz a consulta declarativa em SQL parametrizado
+
+    Args:
+        numericas: {dimensão: True se os rótulos são numéricos} para converter os valores dos filtros
+
+    Returns:
+        (sql, parâmetros)
+    """
+    base = [m for m in EXPRESSOES_METRICA if m in metricas or
+            (m in ('receita', 'pedidos') and 'ticket_medio' in metricas) or
+            (m in ('receita', 'quantidade') and 'preco_medio' in metricas)]
+    selecao = [f"{EXPRESSOES_DIMENSAO[d][0]} AS {d}" for d in por]
+    selecao += [f"{EXPRESSOES_METRICA[m]} AS {m}" for m in base]
+
+    condicoes, parametros = [], []
+    for dimensao, condicao in onde.items():
+        if dimensao == DIMENSAO_DATA:
+            for operador, valor in normalizar_filtro_data(condicao).items():
+                condicoes.append(f"p.data_pedido {operador} ?")
+                parametros.append(valor.to_pydatetime())
+            continue
+        novas, valores = _condicoes_dimensao(EXPRESSOES_DIMENSAO[dimensao][0], condicao, numericas[dimensao])
+        condicoes += novas
+        parametros += valores
+    # Grupos com dimensão sem valor ficam de fora (como os códigos -1 no pandas)
+    condicoes += [f"{EXPRESSOES_DIMENSAO[d][1]} IS NOT NULL" for d in por]
+
+    expressoes = ' '.join(selecao + condicoes)
+    aliases = {alias for alias in JUNCOES if f"{alias}." in expressoes}
+    aliases |= {DEPENDENCIAS_JUNCAO[alias] for alias in aliases if alias in DEPENDENCIAS_JUNCAO}
+    sql = f"SELECT {', '.join(selecao)} FROM vendas v "
+    sql += ' '.join(juncao for alias, juncao in JUNCOES.items() if alias in aliases)
+    if condicoes:
+        sql += f" WHERE {' AND '.join(condicoes)}"
+    if por:
+        chaves = list(dict.fromkeys(e for d in por for e in EXPRESSOES_DIMENSAO[d]))
+        sql += f" GROUP BY {', '.join(chaves)}"
+        sql += f" ORDER BY {', '.join(EXPRESSOES_DIMENSAO[d][1] for d in por)}"
+    return sql, parametros
+
+
+def _condicoes_dimensao(expressao: str, condicao, numerica: bool):
+    """Condições SQL de um filtro de dimensão (valor, lista de valores ou {operador: valor})"""
+    if not isinstance(condicao, dict):
+        condicao = {'em': condicao} if isinstance(condicao, (list, tuple, set)) else {'==': condicao}
+    tipo = np.array([0.0]) if numerica else np.array([''], dtype=object)
+
+    condicoes, parametros = [], []
+    for operador, valor in condicao.items():
+        if operador in ('em', 'fora'):
+            valores = [converter_valor(tipo, v) for v in valor]
+            if not valores:
+                condicoes.append('FALSE' if operador == 'em' else f"{expressao} IS NOT NULL")
+                continue
+            negacao = 'NOT ' if operador == 'fora' else ''
+            condicoes.append(f"{negacao}{expressao} IN ({', '.join('?' * len(valores))})")
+            parametros += valores
+        else:
+            valor = converter_valor(tipo, valor)
+            # Dimensões de texto comparam como texto (mesma regra do pandas)
+            condicoes.append(f"{expressao} {OPERADORES_SQL[operador]} ?" if numerica
+                             else f"CAST({expressao} AS VARCHAR) {OPERADORES_SQL[operador]} ?")
+            parametros.append(valor if numerica else str(valor))
+    return condicoes, parametros
+
+
+def executar_consulta_sql(analise, motor: MotorSQL, metricas: List[str], por: List[str], onde: Dict) -> pd.DataFrame:
+    """Executa a consulta no DuckDB; mesmo formato e ordem de executar_consulta (motor pandas)"""
+    numericas = {dimensao: _dimensao_numerica(analise, dimensao) for dimensao in onde if dimensao != DIMENSAO_DATA}
+    sql, parametros = compilar_consulta(metricas, por, onde, numericas)
+    df = motor.executar(sql, parametros)
+
+    for dimensao in por:
+        if isinstance(df[dimensao].dtype, pd.CategoricalDtype):
+            df[dimensao] = df[dimensao].astype(object)
+    if 'ticket_medio' in metricas:
+        df['ticket_medio'] = np.divide(df['receita'], df['pedidos'], out=np.zeros(len(df)), where=df['pedidos'] > 0)
+    if 'preco_medio' in metricas:
+        df['preco_medio'] = np.divide(df['receita'], df['quantidade'], out=np.zeros(len(df)),
+                                      where=df['quantidade'] > 0)
+    return df[list(por) + list(metricas)]
+
+
+def _dimensao_numerica(analise, dimensao: str) -> bool:
+    """Se os rótulos da dimensão são numéricos (pela coluna de origem)"""
+    tabela, coluna = DIMENSOES_CONSULTA[dimensao]
+    if tabela == 'geografia':
+        return False
+    return getattr(analise, f"df_{tabela}")[coluna].dtype.kind in 'iuf'
+
+
+def verificar_equivalencia(analise, consultas=CONSULTAS_EQUIVALENCIA) -> pd.DataFrame:
+    """
+    Executa as consultas nos motores pandas e duckdb e compara os resultados
+
+    Rótulos, tipos, contagens e ordem devem ser idênticos; somas em ponto flutuante podem diferir
+    só no arredondamento da ordem de soma (tolerância relativa de 1e-9).
+
+    Returns:
+        DataFrame com uma linha por consulta (linhas de cada motor e se os resultados coincidem)
+    """
+    linhas = []
+    for consulta in consultas:
+        pandas_ = analise.consulta(**consulta, motor='pandas', formatar=False)
+        duckdb_ = analise.consulta(**consulta, motor='duckdb', formatar=False)
+        linhas.append({
+            'consulta': str(consulta),
+            'linhas_pandas': len(pandas_),
+            'linhas_duckdb': len(duckdb_),
+            'iguais': _resultados_iguais(pandas_, duckdb_),
+        })
+    return pd.DataFrame(linhas)
+
+
+def _resultados_iguais(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    """Compara dois resultados: colunas, tipos, ordem e valores (floats com tolerância relativa)"""
+    try:
+        pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-9)
+    except AssertionError:
+        return False
+    return True
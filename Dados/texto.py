@@ -0,0 +1,14 @@
+"""
+Normalização de texto
+Chave canônica usada para comparar nomes vindos do cadastro (estados, cidades, categorias)
+"""
+import unicodedata
+
+
+def chave_texto(valor) -> str:
+    """Forma canônica para comparação: sem acentos, minúsculas e espaços simples ('' para vazio ou '-')"""
+    if not isinstance(valor, str):
+        return ''
+    sem_acento = unicodedata.normalize('NFKD', valor).encode('ascii', 'ignore').decode('ascii')
+    chave = ' '.join(sem_acento.casefold().split())
+    return '' if chave.strip('-') == '' else chave
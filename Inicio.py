@@ -11,7 +11,7 @@ sys.path.append(str(Path(__file__).parent))
 
 from utils.styles import apply_custom_style, get_page_header, get_kpi_card
 from utils.chart_loader import load_chart
-from Dados.analises import AnaliseDados
+from Dados.snapshot import obter_snapshot, atualizar_snapshot
 
 # Configuração da página
 st.set_page_config(
@@ -45,6 +45,12 @@ with st.sidebar:
         <p style='margin: 0.5rem 0;'>• Chat de Analises</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    if st.button("🔄 Atualizar dados", use_container_width=True, help="Recarregar os dados do banco para todas as sessões"):
+        with st.spinner("Atualizando dados..."):
+            atualizar_snapshot()
+        st.cache_data.clear()
+        st.rerun()
 
 # Header
 st.markdown(get_page_header(
@@ -52,14 +58,10 @@ st.markdown(get_page_header(
     "Análise completa de vendas, produtos e clientes"
 ), unsafe_allow_html=True)
 
-# Carregar dados
-@st.cache_resource
-def carregar_analises():
-    return AnaliseDados()
-
+# Carregar dados (snapshot compartilhado entre sessões)
 try:
     with st.spinner("Carregando dados..."):
-        analise = carregar_analises()
+        analise = obter_snapshot()
         totais = analise.analise_total_vendas_geral()
     
     # KPIs principais
@@ -12,7 +12,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from utils.styles import apply_custom_style, get_page_header
 from utils.crud_operations import CRUDOperations
-from utils.chart_loader import load_chart
+from utils.chart_loader import load_chart, submit_analysis, wait_analysis
 
 # Configuração da página
 st.set_page_config(
@@ -222,6 +222,9 @@ with tab_tabela:
 
 # ==================== TAB: DASHBOARD ====================
 with tab_dashboard:
+    # Coortes rodam no pool de processos enquanto os demais gráficos são renderizados
+    futuro_coortes = submit_analysis('analise_coortes_retencao')
+    
     st.markdown("### Análises de Clientes")
     st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
     col1, col2 = st.columns(2)
@@ -242,3 +245,13 @@ with tab_dashboard:
     st.markdown("### Clientes Mais Valiosos")
     load_chart("clientes_valiosos.html", height=500)
     st.markdown("</div>", unsafe_allow_html=True)
+    
+    # Retenção por coorte
+    st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+    st.markdown("### Retenção por Coorte")
+    try:
+        coortes = wait_analysis(futuro_coortes, "Calculando coortes de retenção...")
+        load_chart("coortes_retencao.html", height=650, df=coortes)
+    except Exception as e:
+        st.error(f"❌ Erro ao calcular coortes de retenção: {str(e)}")
+    st.markdown("</div>", unsafe_allow_html=True)
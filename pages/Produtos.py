@@ -12,7 +12,8 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from utils.styles import apply_custom_style, get_page_header
 from utils.crud_operations import CRUDOperations
-from utils.chart_loader import load_chart
+from utils.chart_loader import load_chart, submit_analysis, wait_analysis
+from Dados.snapshot import obter_snapshot
 
 # Configuração da página
 st.set_page_config(
@@ -267,6 +268,9 @@ with tab_dashboard:
     st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
 
     try:
+        # Top 3 por segmento roda no pool de processos enquanto os demais gráficos são renderizados
+        futuro_top3 = submit_analysis('analise_top3_por_segmento')
+        
         # Top produtos
         
         st.markdown("#### Top Produtos Mais Vendidos")
@@ -304,7 +308,30 @@ with tab_dashboard:
         # Top 3 por segmento
         st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
         st.markdown("### Top 3 por Segmento")
-        load_chart("top3_segmento.html", height=500)
+        top3 = wait_analysis(futuro_top3, "Calculando top 3 por segmento...")
+        load_chart("top3_segmento.html", height=500, df=top3)
+        st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Comprados juntos (índice de co-compra construído e consultado no pool de processos)
+        st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+        st.markdown("### Comprados Juntos")
+        analise = obter_snapshot()
+        catalogo = analise.df_produtos.drop_duplicates('id_produto').sort_values('nome_produto')
+        id_escolhido = st.selectbox(
+            "Produto",
+            catalogo['id_produto'].tolist(),
+            format_func=dict(zip(catalogo['id_produto'], catalogo['nome_produto'])).get,
+            key="produto_recomendacao"
+        )
+        if id_escolhido is not None:
+            recomendados = wait_analysis(submit_analysis('recomendar_produtos', id_escolhido, top_n=10),
+                                         "Buscando produtos comprados juntos...")
+            if recomendados.empty:
+                st.info("ℹ️ Este produto ainda não foi vendido junto com outros.")
+            else:
+                recomendados = recomendados.drop(columns=['id_produto'])
+                recomendados.columns = ['Produto', 'Categoria', 'Pedidos Juntos', 'Confiança', 'Lift']
+                st.dataframe(recomendados, use_container_width=True, hide_index=True)
         st.markdown("</div>", unsafe_allow_html=True)
     
     except Exception as e:
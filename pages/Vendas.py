@@ -315,8 +315,8 @@ with tab_dashboard:
 
     try:
         # Buscar dados para KPIs
-        from Dados.analises import AnaliseDados
-        analise = AnaliseDados()
+        from Dados.snapshot import obter_snapshot
+        analise = obter_snapshot()
         totais = analise.analise_total_vendas_geral()
         
         # KPIs Totais em cards individuais
@@ -347,6 +347,18 @@ with tab_dashboard:
                 f"{totais['total_itens_vendidos']:,}"
             ), unsafe_allow_html=True)
         
+        # Alerta de anomalias no faturamento diário (últimos 7 dias com dados)
+        alertas = analise.analise_anomalias_vendas(dias=7)
+        if alertas.empty:
+            st.success("✅ Faturamento diário dentro do esperado nos últimos 7 dias")
+        else:
+            quedas = int((alertas['tipo'] == 'queda').sum())
+            picos = len(alertas) - quedas
+            st.warning(f"⚠️ {len(alertas)} anomalia(s) no faturamento diário nos últimos 7 dias "
+                       f"({quedas} queda(s), {picos} pico(s))")
+            with st.expander("Ver anomalias"):
+                st.dataframe(alertas, use_container_width=True, hide_index=True)
+        
         st.markdown("<br>", unsafe_allow_html=True)
         
         # Vendas por ano
@@ -375,6 +387,12 @@ with tab_dashboard:
         st.markdown("#### Heatmap de Sazonalidade")
         load_chart("sazonalidade_heatmap.html", height=500)
         st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Previsão dos próximos meses
+        st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+        st.markdown("#### Previsão de Vendas")
+        load_chart("previsao_vendas.html", height=500)
+        st.markdown("</div>", unsafe_allow_html=True)
     
     except Exception as e:
         st.error(f"❌ Erro ao carregar dashboard de vendas: {str(e)}")
@@ -0,0 +1,87 @@
+"""Fixtures dos testes: snapshot pequeno montado em memória (sem MongoDB)"""
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+# Adiciona a raiz do projeto ao path (como em ChatBot/tools.py)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Dados.analises import AnaliseDados
+from Dados.categorias import resolver_grupos, carregar_grupos
+
+
+def _tabelas_exemplo(semente: int = 7):
+    """
+    Tabelas já preparadas (mesmo formato de df_clientes, df_pedidos, ...) com os casos de borda
+    das consultas: pedidos sem data, itens sem pedido, clientes fora do cadastro, cadastros
+    duplicados e valores ausentes
+    """
+    aleatorio = np.random.default_rng(semente)
+
+    clientes = pd.DataFrame({
+        'id_cliente': np.arange(1, 41),
+        'nome': [f"Cliente {i % 35}" for i in range(1, 41)],
+        'sexo': aleatorio.choice(['F', 'M', ''], 40),
+        'endereco': '',
+        'estado': aleatorio.choice(['SP', 'RJ', 'BA', 'sp', ''], 40),
+        'cidade': aleatorio.choice(['São Paulo', 'Sao Paulo', 'Salvador', 'Niterói', ''], 40),
+        'estado2': aleatorio.choice(['', 'Minas Gerais'], 40),
+        'telefone': '',
+    })
+    # Cadastro duplicado: vale o primeiro registro
+    clientes = pd.concat([clientes, clientes.iloc[:2].assign(nome='Duplicado', sexo='X')], ignore_index=True)
+
+    produtos = pd.DataFrame({
+        'id_produto': np.arange(1, 16),
+        'nome_produto': [f"Produto {i}" for i in range(1, 16)],
+        'categoria': aleatorio.choice(['Cosméticos', 'Cadeiras', 'Lavatórios', 'Acessórios', None], 15),
+        'fornecedor': aleatorio.choice(['Fornecedor A', 'Fornecedor B'], 15),
+        'valor_unitario': aleatorio.uniform(10, 500, 15).round(2),
+    })
+    produtos = pd.concat([produtos, produtos.iloc[:1].assign(nome_produto='Duplicado')], ignore_index=True)
+    produtos['grupo_categoria'] = resolver_grupos(produtos['categoria'], carregar_grupos())
+
+    cor_produto = pd.DataFrame({'id_cor': np.arange(1, 6), 'nome_cor': ['Preto', 'Branco', 'Rosa', 'Azul', 'Vermelho']})
+
+    n_pedidos = 300
+    datas = pd.Series(pd.Timestamp('2022-01-01') + pd.to_timedelta(aleatorio.integers(0, 900, n_pedidos), unit='D'))
+    datas[aleatorio.random(n_pedidos) < 0.05] = pd.NaT
+    pedidos = pd.DataFrame({
+        'id_pedido': np.arange(1, n_pedidos + 1),
+        # Clientes 41 a 45 não estão no cadastro
+        'id_cliente': aleatorio.integers(1, 46, n_pedidos),
+        'data_pedido': datas,
+        'valor_total': 0.0,
+        'forma_pagamento': aleatorio.choice(['Pix', 'Cartão', 'Dinheiro', None], n_pedidos),
+        'canal_venda': aleatorio.choice(['Loja Física', 'Instagram'], n_pedidos),
+    })
+    pedidos['ano'] = pedidos['data_pedido'].dt.year
+    pedidos['mes'] = pedidos['data_pedido'].dt.month
+    pedidos['mes_nome'] = pedidos['data_pedido'].dt.strftime('%B')
+    pedidos['ano_mes'] = pedidos['data_pedido'].dt.to_period('M')
+    pedidos = pedidos.sort_values('data_pedido', kind='mergesort', na_position='last').reset_index(drop=True)
+
+    n_itens = 900
+    quantidade = aleatorio.integers(1, 5, n_itens)
+    preco = aleatorio.uniform(10, 500, n_itens).round(2)
+    vendas = pd.DataFrame({
+        'id_item': np.arange(1, n_itens + 1),
+        # Pedidos 301 a 310 não existem (itens sem pedido); produto 16 e cor 6 fora do cadastro
+        'id_pedido': aleatorio.integers(1, n_pedidos + 11, n_itens),
+        'id_produto': aleatorio.integers(1, 17, n_itens),
+        'id_cor': aleatorio.integers(1, 7, n_itens),
+        'quantidade': quantidade,
+        'preco_unitario': preco,
+        'desconto': 0.0,
+        'subtotal': (quantidade * preco).round(2),
+    })
+    return clientes, produtos, cor_produto, pedidos, vendas
+
+
+@pytest.fixture(scope='session')
+def analise() -> AnaliseDados:
+    """Snapshot de exemplo compartilhado pelos testes (somente leitura)"""
+    clientes, produtos, cor_produto, pedidos, vendas = _tabelas_exemplo()
+    return AnaliseDados.de_dataframes(clientes, produtos, cor_produto, pedidos, vendas)
@@ -0,0 +1,44 @@
+"""Equivalência entre os motores pandas e DuckDB das consultas declarativas"""
+import pandas as pd
+import pytest
+
+pytest.importorskip('duckdb')
+
+from Dados.consulta import METRICAS_CONSULTA
+from Dados.sql import CONSULTAS_EQUIVALENCIA, verificar_equivalencia
+
+
+# Casos de borda além das consultas de referência
+CONSULTAS_BORDA = (
+    {'metricas': ['receita'], 'onde': {'sexo': []}},
+    {'metricas': list(METRICAS_CONSULTA), 'onde': {'data_pedido': {'>=': '2090-01-01'}}},
+    {'metricas': ['receita', 'pedidos'], 'por': ['ano'], 'onde': {'data_pedido': {'>=': '2090-01-01'}}},
+    {'metricas': ['receita', 'clientes'], 'por': ['nome_cliente'], 'onde': {'nome_cliente': {'>': 'Cliente 2'}}},
+    {'metricas': ['itens', 'produtos'], 'por': ['grupo_categoria'], 'onde': {'grupo_categoria': {'fora': ['outros']}}},
+    {'metricas': ['receita'], 'por': ['id_pedido'], 'onde': {'data_pedido': ['2022-03-01', '2022-03-31']}},
+    {'metricas': ['quantidade', 'preco_medio'], 'por': ['cidade'], 'onde': {'uf': ['SP', '--']}},
+    {'metricas': ['ticket_medio'], 'por': ['forma_pagamento'], 'top': 2},
+)
+
+
+@pytest.mark.parametrize('consulta', CONSULTAS_EQUIVALENCIA + CONSULTAS_BORDA, ids=str)
+def test_motores_identicos(analise, consulta):
+    """Rótulos, ordem, valores e tipos iguais nos dois motores (somas com tolerância de arredondamento)"""
+    resultado_pandas = analise.consulta(**consulta, motor='pandas', formatar=False)
+    resultado_duckdb = analise.consulta(**consulta, motor='duckdb', formatar=False)
+    pd.testing.assert_frame_equal(resultado_pandas, resultado_duckdb, check_exact=False, rtol=1e-9)
+
+
+def test_receita_sempre_float(analise):
+    """Totais sem nenhum item selecionado continuam com receita float nos dois motores"""
+    for motor in ('pandas', 'duckdb'):
+        resultado = analise.consulta(['receita'], onde={'sexo': []}, motor=motor, formatar=False)
+        assert resultado['receita'].dtype == 'float64'
+        assert resultado['receita'].tolist() == [0.0]
+
+
+def test_verificar_equivalencia(analise):
+    """O relatório de equivalência aprova todas as consultas de referência"""
+    relatorio = verificar_equivalencia(analise)
+    assert len(relatorio) == len(CONSULTAS_EQUIVALENCIA)
+    assert relatorio['iguais'].all(), relatorio[~relatorio['iguais']]
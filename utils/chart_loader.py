@@ -4,12 +4,15 @@ Renderiza gráficos Plotly diretamente no Streamlit
 """
 import streamlit as st
 import sys
+from concurrent.futures import wait
 from pathlib import Path
 
 # Adicionar pasta principal ao path
 sys.path.append(str(Path(__file__).parent.parent))
 
 import Dados.charts as charts
+from Dados.executor import submeter_analise
+from Dados.snapshot import obter_snapshot
 
 
 # Mapeamento de nomes de gráficos para funções
@@ -18,6 +21,7 @@ GRAFICOS_DISPONIVEIS = {
     'clientes_sexo': charts.grafico_clientes_sexo,
     'clientes_regiao': charts.grafico_clientes_regiao,
     'clientes_valiosos': charts.grafico_clientes_valiosos,
+    'coortes_retencao': charts.grafico_coortes_retencao,
     
     # Produtos
     'top_produtos': charts.grafico_top_produtos,
@@ -32,18 +36,20 @@ GRAFICOS_DISPONIVEIS = {
     'vendas_canal': charts.grafico_vendas_canal,
     'vendas_forma_pagamento': charts.grafico_vendas_forma_pagamento,
     'sazonalidade_heatmap': charts.grafico_sazonalidade_heatmap,
+    'previsao_vendas': charts.grafico_previsao_vendas,
     'canal_venda_pareto': charts.grafico_canal_venda_pareto,
     'kpi_totais': charts.grafico_kpi_totais
 }
 
 
-def load_chart(chart_name, height=600):
+def load_chart(chart_name, height=600, **params):
     """
     Carrega e renderiza um gráfico Plotly diretamente
     
     Args:
         chart_name: Nome do gráfico (com ou sem extensão .html)
         height: Altura do gráfico em pixels (não usado, mantido para compatibilidade)
+        **params: Parâmetros repassados à função do gráfico (ex.: df já calculado no pool)
     
     Returns:
         True se o gráfico foi carregado com sucesso, False caso contrário
@@ -54,7 +60,7 @@ def load_chart(chart_name, height=600):
         
         if chart_name in GRAFICOS_DISPONIVEIS:
             # Gerar gráfico usando a função correspondente
-            fig = GRAFICOS_DISPONIVEIS[chart_name]()
+            fig = GRAFICOS_DISPONIVEIS[chart_name](**params)
             
             # Renderizar no Streamlit
             st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
@@ -85,6 +91,41 @@ def load_multiple_charts(chart_names, columns=2, height=600):
             load_chart(chart_name, height=height)
 
 
+def submit_analysis(metodo, *args, **kwargs):
+    """
+    Agenda uma análise pesada no pool de processos e guarda o future na sessão
+    
+    Chamar no início da página: a análise roda em outro processo enquanto os demais
+    gráficos são renderizados. Reexecuções da página reaproveitam o future enquanto a
+    versão dos dados não muda; um future que falhou é submetido de novo.
+    
+    Returns:
+        Future com o resultado compacto da análise (aguardar com wait_analysis)
+    """
+    versao = obter_snapshot().versao_dados
+    futuros = st.session_state.setdefault('analises_pool', {})
+    chave = (metodo, args, tuple(sorted(kwargs.items())))
+    versao_futuro, futuro = futuros.get(chave, (None, None))
+    falhou = futuro is not None and futuro.done() and (futuro.cancelled() or futuro.exception() is not None)
+    if futuro is None or versao_futuro != versao or falhou:
+        futuro = submeter_analise(metodo, *args, **kwargs)
+        futuros[chave] = (versao, futuro)
+    return futuro
+
+
+def wait_analysis(futuro, mensagem="Calculando..."):
+    """
+    Aguarda o future com spinner e devolve o resultado
+    
+    Só a sessão que espera fica parada: o cálculo roda no pool de processos e o servidor
+    continua atendendo as outras sessões.
+    """
+    if not futuro.done():
+        with st.spinner(mensagem):
+            wait([futuro])
+    return futuro.result()
+
+
 def list_available_charts():
     """Lista todos os gráficos disponíveis"""
     return list(GRAFICOS_DISPONIVEIS.keys())
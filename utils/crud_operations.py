@@ -3,6 +3,7 @@ Operações CRUD para MongoDB
 Gerencia inserção, atualização, exclusão e busca de dados
 """
 from Dados.mongo import db
+from Dados.snapshot import registrar_pedido
 from datetime import datetime
 import pandas as pd
 
@@ -220,9 +221,15 @@ class CRUDOperations:
                 "Canal de Venda": canal_venda
             }
             result = self.db.Pedidos.insert_one(pedido)
-            return {"success": True, "id": proximo_id}
         except Exception as e:
             return {"success": False, "error": str(e)}
+        
+        # O pedido já está gravado: falha no detector de anomalias não invalida a inserção
+        try:
+            registrar_pedido(data_pedido, valor_total, forma_pagamento, canal_venda)
+        except Exception as e:
+            print(f"Erro ao registrar pedido no detector de anomalias: {e}")
+        return {"success": True, "id": proximo_id}
     
     def atualizar_pedido(self, id_pedido, dados):
         """Atualiza dados de um pedido"""